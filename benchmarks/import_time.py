@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Measure how long `import spectrometer_reading_plugin` takes in a fresh interpreter.
+
+Pioreactor imports every plugin on every `pio` command, so this cost lands on each CLI invocation.
+
+    python benchmarks/import_time.py --runs 20
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parents[1]
+
+
+def import_time_us(module: str) -> int:
+    # -X importtime writes "import time: self [us] | cumulative | imported package" lines to stderr
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    for line in reversed(result.stderr.splitlines()):
+        _, _, cumulative, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        if name == module:
+            return int(cumulative)
+    raise RuntimeError(f"{module} not found in -X importtime output.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", default="spectrometer_reading_plugin")
+    args = parser.parse_args()
+
+    timings = sorted(import_time_us(args.module) for _ in range(args.runs))
+    print(f"{args.module}: median {statistics.median(timings) / 1000:.1f} ms, min {timings[0] / 1000:.1f} ms ({args.runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
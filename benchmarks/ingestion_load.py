@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Load-test the leader's ingestion of spectrometer readings, as if a cluster of `--units` units were publishing.
+
+    python benchmarks/ingestion_load.py --units 100 --interval 5 --duration 60
+    python benchmarks/ingestion_load.py --units 100 --interval 0 --duration 10   # as fast as possible
+
+Messages go through an in-process stand-in for the broker, to the plugin's registered sinks, through
+`MqttToDBStreamer`'s own callback (parse, then one INSERT per row) and a `Sqlite3Worker` configured like the
+leader's, into a temporary database with `additional_sql.sql` applied. Every unit publishes on the same scan slot,
+like the job does, so each interval starts with a burst of `--units` spectra.
+
+Reports sustained messages per second, latency percentiles of delivering a message (parsing, and queueing its
+inserts, which blocks when the worker falls behind), of each INSERT and of each COMMIT, and the database's growth.
+Compare runs before and after a schema or parser change.
+
+Off a Pioreactor, set GLOBAL_CONFIG to a config.ini, since importing the streaming module reads the config.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sqlite3
+import statistics
+import sys
+import tempfile
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+from time import perf_counter
+from time import sleep
+from types import SimpleNamespace
+from typing import Callable
+
+REPO_ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from msgspec.json import encode as msgspec_dumps
+from paho.mqtt.client import topic_matches_sub
+from pioreactor.background_jobs.leader.mqtt_to_db_streaming import MqttToDBStreamer
+from pioreactor.utils.sqlite_worker import Sqlite3Worker
+
+from spectrometer_reading_plugin import BANDS
+from spectrometer_reading_plugin import streaming
+from spectrometer_reading_plugin.structs import Spectrum
+
+SQL = (REPO_ROOT / "spectrometer_reading_plugin" / "additional_sql.sql").read_text(encoding="utf-8")
+# Pioreactor's own table, which the plugin's triggers read on the leader
+OD_READINGS_SQL = """
+CREATE TABLE IF NOT EXISTS od_readings (
+    experiment TEXT NOT NULL, pioreactor_unit TEXT NOT NULL, timestamp TEXT NOT NULL, od_reading REAL NOT NULL, angle INTEGER NOT NULL, channel INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS od_readings_ix ON od_readings (experiment, pioreactor_unit, channel, timestamp);
+"""
+
+
+class TimedSqlite3Worker(Sqlite3Worker):
+    def __init__(self, *args, **kwargs) -> None:
+        # set before the thread starts, in super().__init__
+        self.query_seconds: list[float] = []
+        self.commit_seconds: list[float] = []
+        super().__init__(*args, **kwargs)
+
+    def run_query(self, query, values) -> None:
+        start = perf_counter()
+        super().run_query(query, values)
+        self.query_seconds.append(perf_counter() - start)
+
+    def commit_pending_writes(self) -> None:
+        start = perf_counter()
+        super().commit_pending_writes()
+        self.commit_seconds.append(perf_counter() - start)
+
+
+class FakeBroker:
+    # delivers each message to the callbacks whose subscription matches, synchronously, like paho's network thread.
+
+    def __init__(self) -> None:
+        self.subscriptions: list[tuple[str, Callable[..., None]]] = []
+
+    def subscribe(self, topics: str | list[str], callback: Callable[..., None]) -> None:
+        for topic in [topics] if isinstance(topics, str) else topics:
+            self.subscriptions.append((topic, callback))
+
+    def publish(self, topic: str, payload: bytes) -> None:
+        message = SimpleNamespace(topic=topic, payload=payload)
+        for subscription, callback in self.subscriptions:
+            if topic_matches_sub(subscription, topic):
+                callback(message)
+
+
+def database_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.parent.glob(path.name + "*"))
+
+
+def percentiles_ms(seconds: list[float]) -> str:
+    if len(seconds) < 2:
+        return "n/a"
+    cuts = statistics.quantiles(seconds, n=100, method="inclusive")
+    return f"p50 {cuts[49] * 1000:.3f} ms, p95 {cuts[94] * 1000:.3f} ms, p99 {cuts[98] * 1000:.3f} ms, max {max(seconds) * 1000:.3f} ms"
+
+
+def spectrum_payload() -> bytes:
+    # one payload per burst: all units share the scan slot, and the unit is in the topic.
+    return msgspec_dumps(
+        Spectrum(timestamp=datetime.now(timezone.utc), bands={band: 0.01 * i for i, band in enumerate(BANDS, start=1)})
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--units", type=int, default=100)
+    parser.add_argument(
+        "--interval", type=float, default=5.0, help="Seconds between each unit's spectra. 0 publishes as fast as possible."
+    )
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to publish for.")
+    parser.add_argument("--absorbance", action="store_true", help="Also publish absorbance, as units with a blank do.")
+    args = parser.parse_args()
+
+    sinks = [sink for sink in streaming.register_sinks() if "spectrometer_reading" in str(sink.topic)]
+    suffixes = ["spectrum", "absorbance"] if args.absorbance else ["spectrum"]
+    topics = [f"pioreactor/unit{i:03d}/exp1/spectrometer_reading/{suffix}" for i in range(args.units) for suffix in suffixes]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / "pioreactor.sqlite"
+        with sqlite3.connect(database) as db:
+            db.executescript(OD_READINGS_SQL)
+            db.executescript(SQL)
+        db.close()
+        initial_bytes = database_bytes(database)
+
+        write_errors = []
+        # as the leader's mqtt_to_db_streaming configures it
+        worker = TimedSqlite3Worker(
+            str(database),
+            max_queue_size=250,
+            max_batch_delay_s=0.1,
+            raise_on_error=False,
+            on_error=lambda error, query, values: write_errors.append(error),
+        )
+        streamer = MqttToDBStreamer.__new__(MqttToDBStreamer)
+        streamer.logger = logging.getLogger("ingestion_load")  # type: ignore[assignment]
+        streamer.sqliteworker = worker
+        streamer._inserts_in_last_60s = 0
+
+        broker = FakeBroker()
+        for sink in sinks:
+            broker.subscribe(sink.topic, streamer.create_on_message_callback(sink.parser, sink.table))
+
+        delivery_seconds: list[float] = []
+        late_bursts = 0
+        started_at = perf_counter()
+        burst = 0
+        while (now := perf_counter()) - started_at < args.duration:
+            scheduled_at = started_at + burst * args.interval
+            if now < scheduled_at:
+                sleep(scheduled_at - now)
+            elif args.interval and now - scheduled_at > args.interval:
+                late_bursts += 1
+
+            payload = spectrum_payload()
+            for topic in topics:
+                start = perf_counter()
+                broker.publish(topic, payload)
+                delivery_seconds.append(perf_counter() - start)
+            burst += 1
+
+        published_at = perf_counter()
+        worker.close()  # drains the queue and commits
+        drained_at = perf_counter()
+
+        db = sqlite3.connect(database)
+        (readings,) = db.execute("SELECT count(*) FROM as7341_spectrum_readings_compact").fetchone()
+        db.close()
+        growth = database_bytes(database) - initial_bytes
+
+    messages = len(delivery_seconds)
+    print(f"{args.units} units, {len(topics) // args.units} topic(s) each, {burst} bursts in {published_at - started_at:.1f} s")
+    print(
+        f"messages:        {messages:,} ({messages / (drained_at - started_at):,.0f} msg/s sustained, including the final drain)"
+    )
+    print(f"rows inserted:   {streamer._inserts_in_last_60s:,} ({len(write_errors)} write errors)")
+    print(f"delivery:        {percentiles_ms(delivery_seconds)}")
+    print(f"insert:          {percentiles_ms(worker.query_seconds)}")
+    print(f"commit:          {percentiles_ms(worker.commit_seconds)}")
+    print(f"final drain:     {(drained_at - published_at) * 1000:.0f} ms")
+    print(f"database growth: {growth / 1024:,.0f} KiB ({growth / max(readings, 1):.1f} bytes per reading)")
+    if late_bursts:
+        print(f"fell behind:     {late_bursts} bursts started more than an interval late")
+
+
+if __name__ == "__main__":
+    main()
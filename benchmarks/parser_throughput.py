@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Measure how many spectra per second the leader-side parser stores, against the parser at the baseline commit
+(55adc7b), copied below. The baseline published one MQTT message per band, so a spectrum took eight parser calls.
+It returned a datetime, which sqlite's adapter formatted at insert; that formatting isn't timed here, which favors
+the baseline.
+
+    python benchmarks/parser_throughput.py --spectra 20000
+
+Off a Pioreactor, set GLOBAL_CONFIG to a config.ini, since importing the streaming module reads the config.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from time import perf_counter
+
+REPO_ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from msgspec.json import decode as msgspec_loads
+from pioreactor.background_jobs.leader.mqtt_to_db_streaming import produce_metadata
+from pioreactor.utils.timing import current_utc_datetime
+
+from spectrometer_reading_plugin import streaming
+from spectrometer_reading_plugin.structs import Spectrum
+
+PAYLOAD = (
+    b'{"timestamp": "2026-01-01T00:00:00.500000Z", "bands": {"415": 0.0123, "445": 0.0234, "480": 0.0345, '
+    b'"515": 0.0456, "555": 0.0567, "590": 0.0678, "630": 0.0789, "680": 0.0890}}'
+)
+
+
+def baseline_parser(topic: str, payload: bytes) -> dict:
+    # the body is verbatim from 55adc7b, where each band was its own topic: pioreactor/<unit>/<experiment>/spectrometer_reading/band_415
+    metadata = produce_metadata(topic)
+
+    return {
+        "experiment": metadata.experiment,
+        "pioreactor_unit": metadata.pioreactor_unit,
+        "timestamp": current_utc_datetime(),
+        "reading": float(payload),
+        "band": int(metadata.rest_of_topic[-1].removeprefix("band_")),
+    }
+
+
+def spectra_per_second(parser, spectra_messages: list[list[tuple[str, bytes]]], spectra: int) -> float:
+    # spectra_messages: for each unit, the (topic, payload) messages that carry one spectrum
+    start = perf_counter()
+    for i in range(spectra):
+        for topic, payload in spectra_messages[i % len(spectra_messages)]:
+            parser(topic, payload)
+    return spectra / (perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectra", type=int, default=20_000)
+    parser.add_argument("--units", type=int, default=16)
+    args = parser.parse_args()
+
+    bands = msgspec_loads(PAYLOAD, type=Spectrum).bands
+    band_messages = [
+        [(f"pioreactor/unit{i}/exp1/spectrometer_reading/band_{band}", str(reading).encode()) for band, reading in bands.items()]
+        for i in range(args.units)
+    ]
+    spectrum_messages = [[(f"pioreactor/unit{i}/exp1/spectrometer_reading/spectrum", PAYLOAD)] for i in range(args.units)]
+
+    before = spectra_per_second(baseline_parser, band_messages, args.spectra)
+    after = spectra_per_second(streaming.parser, spectrum_messages, args.spectra)
+    print(f"baseline parser (a message per band):    {before:,.0f} spectra/s")
+    print(f"parser (a message per spectrum):         {after:,.0f} spectra/s ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
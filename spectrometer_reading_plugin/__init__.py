@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import sys
+import typing as t
+from contextlib import closing
 from contextlib import suppress
+from datetime import datetime
+from datetime import timedelta
+from time import time
 
-import board
-import pioreactor.actions.led_intensity as led_utils
+import click
+from msgspec import DecodeError
+from msgspec.json import decode as msgspec_loads
+from msgspec.json import encode as msgspec_dumps
 from pioreactor import types as pt
 from pioreactor.background_jobs.base import BackgroundJobWithDodgingContrib
-from pioreactor.background_jobs.leader.mqtt_to_db_streaming import produce_metadata
-from pioreactor.background_jobs.leader.mqtt_to_db_streaming import register_source_to_sink
-from pioreactor.background_jobs.leader.mqtt_to_db_streaming import TopicToParserToTable
 from pioreactor.cli.run import run
 from pioreactor.config import config
 from pioreactor.exc import HardwareNotFoundError
@@ -18,70 +23,116 @@ from pioreactor.utils.timing import RepeatedTimer
 from pioreactor.whoami import get_assigned_experiment_name
 from pioreactor.whoami import get_unit_name
 
-from spectrometer_reading_plugin._vendor import adafruit_as7341
+from spectrometer_reading_plugin.absorbance import absorbance
+from spectrometer_reading_plugin.absorbance import load_blank
+from spectrometer_reading_plugin.absorbance import save_blank
+from spectrometer_reading_plugin.buffer import SpectrumBuffer
+from spectrometer_reading_plugin.dark_frames import dark_frame_key
+from spectrometer_reading_plugin.dark_frames import load_dark_frame
+from spectrometer_reading_plugin.dark_frames import save_dark_frame
+from spectrometer_reading_plugin.excitation import excitation_label
+from spectrometer_reading_plugin.excitation import full_led_state
+from spectrometer_reading_plugin.excitation import parse_excitation_states
+from spectrometer_reading_plugin.filtering import KalmanFilter1D
+from spectrometer_reading_plugin.filtering import robust_mean
+from spectrometer_reading_plugin.flicker import detect_mains_flicker
+from spectrometer_reading_plugin.flicker import flicker_astep
+from spectrometer_reading_plugin.planning import available_window
+from spectrometer_reading_plugin.planning import DEFAULT_ASTEP
+from spectrometer_reading_plugin.planning import IntegrationBudgetError
+from spectrometer_reading_plugin.planning import IntegrationPlan
+from spectrometer_reading_plugin.planning import plan_integration
+from spectrometer_reading_plugin.planning import scan_seconds
+from spectrometer_reading_plugin.profiling import profiling_enabled
+from spectrometer_reading_plugin.sensor import band_flags
+from spectrometer_reading_plugin.sensor import INVALID
+from spectrometer_reading_plugin.sensor import read_bands
+from spectrometer_reading_plugin.sensor import read_scan
+from spectrometer_reading_plugin.sensor import ResilientSensor
+from spectrometer_reading_plugin.sensor import SATURATED
+from spectrometer_reading_plugin.sensor import Scan
+from spectrometer_reading_plugin.sensor import smux_halves
+from spectrometer_reading_plugin.sensor import TRANSIENT_ERRORS
+from spectrometer_reading_plugin.structs import ExcitationScan
+from spectrometer_reading_plugin.structs import ExcitationSweep
+from spectrometer_reading_plugin.structs import RecentSpectra
+from spectrometer_reading_plugin.structs import RecentSpectraRequest
+from spectrometer_reading_plugin.structs import Spectrum
 
+if t.TYPE_CHECKING:
+    from spectrometer_reading_plugin.aio import AcquisitionLoop
+    from spectrometer_reading_plugin.aio import AsyncAS7341
+    from spectrometer_reading_plugin.profiling import JobProfiler
+    from spectrometer_reading_plugin.replay import ReplayAS7341
 
-def parser(topic: str, payload: pt.MQTTMessagePayload) -> dict:
-    metadata = produce_metadata(topic)
+BANDS = (415, 445, 480, 515, 555, 590, 630, 680)
 
-    return {
-        "experiment": metadata.experiment,
-        "pioreactor_unit": metadata.pioreactor_unit,
-        "timestamp": current_utc_datetime(),
-        "reading": float(payload),
-        "band": int(metadata.rest_of_topic[-1].removeprefix("band_")),
-    }
 
+def parse_bands(value: str) -> tuple[int, ...]:
+    """
+    Parse a comma-separated band mask, ex: `630,680`, into bands in wavelength order. Empty means every band.
+    """
+    if not value.strip():
+        return BANDS
+    try:
+        bands = {int(band) for band in value.split(",")}
+    except ValueError:
+        raise ValueError(f"bands must be comma-separated wavelengths from {BANDS}, not `{value}`.")
+    if not bands <= set(BANDS):
+        raise ValueError(f"Unknown bands {sorted(bands - set(BANDS))}. Choose from {BANDS}.")
+    return tuple(band for band in BANDS if band in bands)
+
+
+def seconds_until_next_scan_slot(interval: float, now: float) -> float:
+    # scan slots are multiples of `interval` since the unix epoch, so every unit (with a synced clock) shares them.
+    return (-now) % interval
+
+
+def scan_slot_skew(interval: float, now: float) -> float:
+    # signed distance, in seconds, from `now` to the closest scan slot.
+    offset = now % interval
+    return offset if offset <= interval / 2 else offset - interval
+
+
+def normalize_by_gain_time(band_recordings: t.Sequence[float], gain: int, atime: int, astep: int) -> list[float]:
+    # we normalize by the gain and integration time
+    # https://ams.com/documents/20143/36005/AS7341_AN000633_1-00.pdf/fc552673-9800-8d60-372d-fc67cf075740
+    # section 2.1
+    # the integration time is scaled so it equals the historical divisor, atime=100, at the default astep=999.
+    integration_time = (atime + 1) * (astep + 1) / 1010
+    return [x / 2 ** (gain - 1) / integration_time for x in band_recordings]
+
+
+def is_mqtt_to_db_streaming_process() -> bool:
+    # Pioreactor imports plugins on every `pio` command, but only the leader's `pio run mqtt_to_db_streaming` needs our sinks.
+    return "mqtt_to_db_streaming" in sys.argv
 
-register_source_to_sink(
-    [
-        TopicToParserToTable(
-            "pioreactor/+/+/spectrometer_reading/band_415",
-            parser,
-            "as7341_spectrum_readings",
-        ),
-        TopicToParserToTable(
-            "pioreactor/+/+/spectrometer_reading/band_445",
-            parser,
-            "as7341_spectrum_readings",
-        ),
-        TopicToParserToTable(
-            "pioreactor/+/+/spectrometer_reading/band_480",
-            parser,
-            "as7341_spectrum_readings",
-        ),
-        TopicToParserToTable(
-            "pioreactor/+/+/spectrometer_reading/band_515",
-            parser,
-            "as7341_spectrum_readings",
-        ),
-        TopicToParserToTable(
-            "pioreactor/+/+/spectrometer_reading/band_555",
-            parser,
-            "as7341_spectrum_readings",
-        ),
-        TopicToParserToTable(
-            "pioreactor/+/+/spectrometer_reading/band_590",
-            parser,
-            "as7341_spectrum_readings",
-        ),
-        TopicToParserToTable(
-            "pioreactor/+/+/spectrometer_reading/band_630",
-            parser,
-            "as7341_spectrum_readings",
-        ),
-        TopicToParserToTable(
-            "pioreactor/+/+/spectrometer_reading/band_680",
-            parser,
-            "as7341_spectrum_readings",
-        ),
-    ]
-)
+
+def create_sensor(on_error: t.Callable[[ResilientSensor], None] | None = None) -> ResilientSensor:
+    # imported here, and not at the top, so `pio` commands that don't use the sensor don't pay for the driver imports.
+    import board
+
+    from spectrometer_reading_plugin._vendor import adafruit_as7341
+
+    return ResilientSensor(
+        adafruit_as7341.AS7341(board.I2C()),
+        retries=config.getint("spectrometer_reading.config", "i2c_retries", fallback=3),
+        on_error=on_error,
+    )
+
+
+if is_mqtt_to_db_streaming_process():
+    from spectrometer_reading_plugin.streaming import register_sinks
+
+    register_sinks()
 
 
 class SpectrometerReading(BackgroundJobWithDodgingContrib):
 
     job_name = "spectrometer_reading"
+    burst_scans = 1
+    # healthy dodging margins in a row after which a shortened plan is lengthened again.
+    RELAX_WINDOW_CAP_AFTER = 10
 
     published_settings = {
         "band_415": {"datatype": "float", "unit": "AU", "settable": False},
@@ -92,16 +143,33 @@ class SpectrometerReading(BackgroundJobWithDodgingContrib):
         "band_590": {"datatype": "float", "unit": "AU", "settable": False},
         "band_630": {"datatype": "float", "unit": "AU", "settable": False},
         "band_680": {"datatype": "float", "unit": "AU", "settable": False},
+        "spectrum": {"datatype": "json", "settable": False},
+        "i2c_errors": {"datatype": "integer", "settable": False},
+        "i2c_retries": {"datatype": "integer", "settable": False},
+        "i2c_reinitializations": {"datatype": "integer", "settable": False},
+        "dodging_margin_ms": {"datatype": "float", "unit": "ms", "settable": False},
+        "record_blank": {"datatype": "boolean", "settable": True},
+        "rejected_samples": {"datatype": "integer", "settable": False},
     }
 
-    def __init__(self, unit: str, experiment: str, enable_dodging_od: bool = False) -> None:
+    def __init__(
+        self,
+        unit: str,
+        experiment: str,
+        enable_dodging_od: bool = False,
+        sensor: ResilientSensor | ReplayAS7341 | None = None,
+    ) -> None:
         super().__init__(
             unit=unit, experiment=experiment, enable_dodging_od=enable_dodging_od, plugin_name="spectrometer_reading_plugin"
         )
 
+        self.i2c_errors = 0
+        self.i2c_retries = 0
+        self.i2c_reinitializations = 0
+        self.rejected_samples = 0
+
         try:
-            i2c = board.I2C()
-            self.sensor = adafruit_as7341.AS7341(i2c)
+            self.sensor = sensor if sensor is not None else create_sensor(on_error=self.on_sensor_error)
         except Exception:
             self.logger.error("Is the AS7341 board attached to the Pioreactor HAT?")
             self.clean_up()
@@ -111,43 +179,305 @@ class SpectrometerReading(BackgroundJobWithDodgingContrib):
         # there is currently a lower-bound to the current. Ex: if a user provided 0, the current is actually 4. https://github.com/adafruit/Adafruit_CircuitPython_AS7341/blob/main/adafruit_as7341.py#L721-L734
 
         self.sensor.gain = 10  # use max gain - vary the LED current to avoid saturation
+
+        try:
+            self.bands = parse_bands(config.get("spectrometer_reading.config", "bands", fallback=""))
+        except ValueError as e:
+            self.logger.error(e)
+            self.clean_up()
+            raise e
         self.is_setup_done = False
         self._background_noise = [0.0] * 8
+        self._background_recorded_at = 0.0
+        self._background_is_cached = False
+        # an injected sensor (ex: a replay) mustn't share dark frames with the unit's real sensor.
+        self._persist_dark_frames = sensor is None
         self.continuous_sampling_timer: RepeatedTimer | None = None
 
+        self.recent_spectra = SpectrumBuffer(
+            config.getint("spectrometer_reading.config", "recent_spectra_capacity", fallback=720), self.bands
+        )
+
+        # dodging: the OD job's (interval, first_od_obs_time), the window that measured scans showed actually fits,
+        # the healthy margins since, how many OD cycles to sit out after an unavoidable overrun, and when the current
+        # cycle's scans must end by.
+        self._od_schedule: tuple[float, float] | None = None
+        self._dodging_window_cap: float | None = None
+        self._healthy_margins = 0
+        self._cycles_to_skip = 0
+        self._cycle_deadline: float | None = None
+        self._plan: IntegrationPlan | None = None
+
+        # the ambient flicker in Hz (0 for none, None until detected), checked with the LEDs off. A replay can't detect it.
+        self.flicker_hz: int | None = None
+        self._flicker_checked_at: float | None = None
+        self._flicker_aware = sensor is None and config.getboolean("spectrometer_reading.config", "flicker_aware", fallback=False)
+        if self._flicker_aware:
+            self.add_to_published_settings("flicker_hz", {"datatype": "integer", "unit": "Hz", "settable": False})
+
+        self._band_filters: dict[int, KalmanFilter1D] = {}
+        if config.getboolean("spectrometer_reading.config", "filter_readings", fallback=False):
+            self.initialize_band_filters()
+
+        if config.getboolean("spectrometer_reading.config", "synchronize_scans", fallback=False):
+            self.add_to_published_settings("scan_skew_ms", {"datatype": "float", "unit": "ms", "settable": False})
+
+        try:
+            self._excitation_states = parse_excitation_states(
+                config.get("spectrometer_reading.config", "excitation_states", fallback="")
+            )
+        except ValueError as e:
+            self.logger.error(e)
+            self.clean_up()
+            raise e
+        if self._excitation_states:
+            self.add_to_published_settings("excitation_sweep", {"datatype": "json", "settable": False})
+
+        # when set, the next scan is stored as the blank that absorbance is relative to.
+        self.record_blank = False
+        self._blank = load_blank(self.experiment)
+        if self._blank is not None:
+            self.initialize_absorbance()
+
+        self._acquisition: AcquisitionLoop | None = None
+        self._async_sensor: AsyncAS7341 | None = None
+        if config.getboolean("spectrometer_reading.config", "async_acquisition", fallback=False):
+            self.initialize_async_acquisition()
+
+        self._profiler: JobProfiler | None = None
+        if profiling_enabled():
+            self.initialize_profiling()
+
+    def initialize_async_acquisition(self) -> None:
+        from spectrometer_reading_plugin.aio import AcquisitionLoop
+        from spectrometer_reading_plugin.aio import AsyncAS7341
+
+        self._async_sensor = AsyncAS7341(self.sensor)
+        self._acquisition = AcquisitionLoop(name=f"{self.job_name}_acquisition")
+
+    def initialize_profiling(self) -> None:
+        from spectrometer_reading_plugin.profiling import JobProfiler
+        from spectrometer_reading_plugin.profiling import profiling_directory
+
+        self._profiler = JobProfiler(
+            profiling_directory(self.job_name),
+            interval_seconds=60 * config.getfloat("spectrometer_reading.config", "profile_interval_minutes", fallback=60),
+            keep=config.getint("spectrometer_reading.config", "profile_keep_files", fallback=24),
+        )
+        # instance attributes shadow the methods, so the scan cycle and publishing go through the profiler.
+        self._record_once = self._profiler.wrap(self._record_once)  # type: ignore[method-assign]
+        self.publish = self._profiler.wrap(self.publish)  # type: ignore[method-assign]
+        self._publish_setting = self._profiler.wrap(self._publish_setting)  # type: ignore[method-assign]
+        self.logger.info(f"Profiling to {self._profiler.directory}.")
+
+    def initialize_band_filters(self) -> None:
+        process_noise = config.getfloat("spectrometer_reading.config", "filter_process_noise", fallback=1e-9)
+        measurement_noise = config.getfloat("spectrometer_reading.config", "filter_measurement_noise", fallback=1e-8)
+
+        for band in self.bands:
+            self._band_filters[band] = KalmanFilter1D(process_noise, measurement_noise)
+            self.add_to_published_settings(f"band_{band}_filtered", {"datatype": "float", "unit": "AU", "settable": False})
+            self.add_to_published_settings(f"band_{band}_filtered_std", {"datatype": "float", "unit": "AU", "settable": False})
+
+    def initialize_absorbance(self) -> None:
+        self.add_to_published_settings("absorbance", {"datatype": "json", "settable": False})
+        for band in self.bands:
+            self.add_to_published_settings(f"band_{band}_absorbance", {"datatype": "float", "unit": "AU", "settable": False})
+
+    def set_record_blank(self, value: bool) -> None:
+        self.record_blank = value
+        if value:
+            self.logger.info("The next spectrometer scan will be recorded as the blank.")
+
+    def save_spectrum_as_blank(self, spectrum: Spectrum) -> None:
+        if self._blank is None:
+            self.initialize_absorbance()
+        save_blank(self.experiment, spectrum.bands)
+        self._blank = spectrum.bands
+        self.record_blank = False
+        # a blank usually means a new vial, so don't smooth the old sample into the next readings.
+        self.reset_band_filters()
+        self.logger.info(f"Recorded spectrometer blank: {spectrum.bands}.")
+
+    def publish_absorbance(self, spectrum: Spectrum, blank: dict[int, float]) -> None:
+        absorbances = absorbance(spectrum.bands, blank)
+        for band in self.bands:
+            setattr(self, f"band_{band}_absorbance", absorbances.get(band))
+        # absorbance is only as good as the scan it's from.
+        self.absorbance = Spectrum(timestamp=spectrum.timestamp, bands=absorbances, flags=spectrum.flags)
+
+    def on_sensor_error(self, sensor: ResilientSensor) -> None:
+        self.logger.debug(f"I2C error talking to the AS7341 ({sensor.errors} errors so far).", exc_info=True)
+        self.i2c_errors = sensor.errors
+        self.i2c_retries = sensor.retried
+        self.i2c_reinitializations = sensor.reinitializations
+
     def record_all_bands(self) -> list[float]:
-        raw_channels = list(self.sensor.all_channels)
+        started_at = current_utc_datetime()
+        scans = []
+        for _ in range(self.burst_scans):
+            scan_started_at = time()
+            scans.append(self.take_scan())
+            if not self.another_scan_fits(time() - scan_started_at):
+                break
+        ended_at = current_utc_datetime()
+        return self.process_scans(scans, started_at, ended_at)
+
+    def another_scan_fits(self, scan_seconds: float) -> bool:
+        # when dodging, whether another scan as long as the last ends before the cycle's deadline. Cutting a slow cycle
+        # short keeps it inside the time the base class allows, which stops the job when exceeded.
+        if self._cycle_deadline is None or time() + scan_seconds <= self._cycle_deadline:
+            return True
+        self.logger.debug("Out of time between OD readings. Ending this cycle's scans early.")
+        return False
+
+    async def acquire_all_bands(self) -> None:
+        """
+        With async_acquisition, the scans of a cycle: the burst, then the excitation sweep, if any. While the sweep's
+        scans integrate, the burst is processed and published on a worker thread.
+        """
+        import asyncio
+
+        assert self._async_sensor is not None
+        started_at = current_utc_datetime()
+        gain = self.sensor.gain
+        scans = []
+        for _ in range(self.burst_scans):
+            scan_started_at = time()
+            scans.append(await self._async_sensor.read_scan(self.bands, gain, self.retake_gain(gain)))
+            if not self.another_scan_fits(time() - scan_started_at):
+                break
+        ended_at = current_utc_datetime()
+
+        processing = asyncio.create_task(asyncio.to_thread(self.process_scans, scans, started_at, ended_at))
+        if self._excitation_states:
+            self.turn_off_led()
+            await self.acquire_excitation_sweep()
+        await processing
+
+    def process_scans(self, scans: list[Scan], started_at: datetime, ended_at: datetime) -> list[float]:
+        raw_channels = self.combine_scans([list(scan.channels) for scan in scans])
+        # a band is flagged if any scan of the burst was.
+        flags = band_flags(scans, self.bands)
+        # the two halves of the scan are integrated back-to-back, so the midpoint best represents the whole scan.
+        acquired_at = started_at + (ended_at - started_at) / 2
+
         normalized_channels = self.normalize_by_gain_time(raw_channels)
 
-        self.band_415 = self.normalize_by_offset(normalized_channels, 0)
-        self.band_445 = self.normalize_by_offset(normalized_channels, 1)
-        self.band_480 = self.normalize_by_offset(normalized_channels, 2)
-        self.band_515 = self.normalize_by_offset(normalized_channels, 3)
-        self.band_555 = self.normalize_by_offset(normalized_channels, 4)
-        self.band_590 = self.normalize_by_offset(normalized_channels, 5)
-        self.band_630 = self.normalize_by_offset(normalized_channels, 6)
-        self.band_680 = self.normalize_by_offset(normalized_channels, 7)
+        # bands outside the mask aren't set, so they're never published.
+        for i, band in enumerate(BANDS):
+            if band in self.bands:
+                setattr(self, f"band_{band}", self.normalize_by_offset(normalized_channels, i))
 
-        if max(raw_channels) == 2**16 - 1:
+        if any(flag & SATURATED for flag in flags.values()):
             # gain is too high
             self.logger.warning("A color sensor is saturated - reduce the value of [led_current_mA] in your config.")
+        if any(flag & INVALID for flag in flags.values()):
+            self.logger.warning("The AS7341 integrated at a different gain than set. Those bands are flagged invalid.")
+
+        if self._band_filters:
+            self.filter_bands(flags)
+
+        self.spectrum = Spectrum(
+            timestamp=acquired_at,
+            bands={band: getattr(self, f"band_{band}") for band in self.bands},
+            flags=flags,
+        )
+        self.recent_spectra.append(acquired_at, list(self.spectrum.bands.values()))
+
+        if self.record_blank:
+            if any(flag & (SATURATED | INVALID) for flag in flags.values()):
+                # a clipped or mis-scaled blank would skew every absorbance after it, so the request waits for a clean scan.
+                self.logger.warning("Not recording a saturated or invalid scan as the blank. Waiting for a clean scan.")
+            else:
+                self.save_spectrum_as_blank(self.spectrum)
+        if self._blank is not None:
+            self.publish_absorbance(self.spectrum, self._blank)
 
         return normalized_channels
 
+    def read_channels(self) -> tuple[int, ...]:
+        # all eight channels in band order; the SMUX half that no band in the mask needs isn't integrated, and reads zeros.
+        return read_bands(self.sensor, self.bands)
+
+    def take_scan(self) -> Scan:
+        # as read_channels, with each band's quality flags, retaking a saturated half if configured.
+        gain = self.sensor.gain
+        return read_scan(self.sensor, self.bands, gain, self.retake_gain(gain))
+
+    def retake_gain(self, gain: int) -> int | None:
+        steps = config.getint("spectrometer_reading.config", "retake_saturated_gain_steps", fallback=0)
+        if steps <= 0 or gain == 0:
+            return None
+        return max(0, gain - steps)
+
+    def combine_scans(self, raw_scans: list[list[int]]) -> list[float]:
+        # average the burst's scans, per band, rejecting outliers (bubbles, debris) when there are enough scans to spot them.
+        threshold = config.getfloat("spectrometer_reading.config", "outlier_threshold", fallback=3.5)
+        if threshold <= 0 or len(raw_scans) < 3:
+            # nothing is rejected, so don't leave an earlier burst's count published.
+            self.rejected_samples = 0
+            return [sum(readings) / len(readings) for readings in zip(*raw_scans)]
+
+        # counts are integers, so noise is never less than one count.
+        estimates = [robust_mean(readings, threshold, min_scale=1.0) for readings in zip(*raw_scans)]
+        self.rejected_samples = sum(rejected for _, rejected in estimates)
+        return [estimate for estimate, _ in estimates]
+
+    def filter_bands(self, band_flags: dict[int, int]) -> None:
+        # runs after the raw bands are set, so filtered values are published next to them.
+        for band, filter_ in self._band_filters.items():
+            if band_flags.get(band, 0) & (SATURATED | INVALID):
+                # a clipped or mis-scaled reading would pull the estimate off for many scans.
+                continue
+            estimate, std = filter_.update(getattr(self, f"band_{band}"))
+            setattr(self, f"band_{band}_filtered", estimate)
+            setattr(self, f"band_{band}_filtered_std", std)
+
+    def reset_band_filters(self) -> None:
+        # after a step change (new blank, dark frame or integration time), restart from the next reading rather than lag behind it.
+        for filter_ in self._band_filters.values():
+            filter_.reset()
+
     def normalize_by_offset(self, band_recordings: list[float], index: int) -> float:
         return band_recordings[index] - self._background_noise[index]
 
-    def normalize_by_gain_time(self, band_recordings: list[int]) -> list[float]:
-        # we normalize by the gain and integration time
-        # https://ams.com/documents/20143/36005/AS7341_AN000633_1-00.pdf/fc552673-9800-8d60-372d-fc67cf075740
-        # section 2.1
-        return [x / 2 ** (self.sensor.gain - 1) / self.sensor.atime for x in band_recordings]
+    def normalize_by_gain_time(self, band_recordings: t.Sequence[float]) -> list[float]:
+        return normalize_by_gain_time(band_recordings, self.sensor.gain, self.sensor.atime, self.sensor.astep)
+
+    def start_passive_listeners(self) -> None:
+        self.subscribe_and_callback(
+            self.respond_with_recent_spectra,
+            f"pioreactor/{self.unit}/{self.experiment}/{self.job_name}/recent_spectra/request",
+            allow_retained=False,
+        )
+
+    def respond_with_recent_spectra(self, message: pt.MQTTMessage) -> None:
+        try:
+            request = msgspec_loads(message.payload or b"{}", type=RecentSpectraRequest)
+        except DecodeError as e:
+            self.logger.debug(f"Ignoring malformed recent_spectra request: {e}")
+            return
+
+        since = current_utc_datetime() - timedelta(seconds=request.seconds) if request.seconds is not None else None
+        if request.summary:
+            count, summary = self.recent_spectra.summary(since)
+            response = RecentSpectra(request_id=request.request_id, count=count, spectra=[], summary=summary)
+        else:
+            spectra = self.recent_spectra.window(since, request.limit)
+            response = RecentSpectra(request_id=request.request_id, count=len(spectra), spectra=spectra, summary={})
+
+        self.publish(f"pioreactor/{self.unit}/{self.experiment}/{self.job_name}/recent_spectra/response", msgspec_dumps(response))
 
     def on_disconnected(self) -> None:
         super().on_disconnected()
         with suppress(AttributeError):
             self.continuous_sampling_timer.cancel()
         self.turn_off_led()
+        if self._acquisition is not None:
+            self._acquisition.stop()
+        if self._profiler is not None:
+            self._profiler.stop()
 
     def turn_on_led(self) -> None:
         if (
@@ -165,12 +495,86 @@ class SpectrometerReading(BackgroundJobWithDodgingContrib):
     def record_background_noise(self) -> None:
         self.turn_off_led()
         # initially we record all sensors with LED off, to account for dark current, ambient light, etc.
-        self._background_noise = self.normalize_by_gain_time(list(self.sensor.all_channels))
+        self._background_noise = self.normalize_by_gain_time(list(self.read_channels()))
+        if self._persist_dark_frames:
+            self._background_recorded_at = save_dark_frame(self.dark_frame_key(), self._background_noise).recorded_at
+        else:
+            self._background_recorded_at = time()
+        self._background_is_cached = False
 
+        self.reset_band_filters()
         self.logger.debug(f"Setup done, {self._background_noise=}")
 
+    def dark_frame_key(self) -> str:
+        return dark_frame_key(
+            self.unit,
+            self.sensor.gain,
+            self.sensor.atime,
+            self.sensor.astep,
+            config.getfloat("spectrometer_reading.config", "led_current_mA"),
+            self.bands,
+        )
+
+    def load_cached_background(self) -> bool:
+        if not self._persist_dark_frames:
+            return False
+
+        max_age_seconds = config.getfloat("spectrometer_reading.config", "dark_frame_max_age_minutes", fallback=60.0) * 60
+        dark_frame = load_dark_frame(self.dark_frame_key(), max_age_seconds)
+        if dark_frame is None:
+            return False
+
+        self._background_noise = dark_frame.background
+        self._background_recorded_at = dark_frame.recorded_at
+        # good enough for the first cycles, but refreshed at the first chance, since the light around the unit may differ.
+        self._background_is_cached = True
+        self.logger.debug(f"Using dark frame from {time() - dark_frame.recorded_at:.0f}s ago, {self._background_noise=}")
+        return True
+
+    def background_is_stale(self) -> bool:
+        if self._background_is_cached:
+            return True
+        refresh_seconds = config.getfloat("spectrometer_reading.config", "dark_frame_refresh_minutes", fallback=60.0) * 60
+        return refresh_seconds > 0 and time() - self._background_recorded_at > refresh_seconds
+
+    def flicker_check_is_due(self) -> bool:
+        if not self._flicker_aware:
+            return False
+        if self._flicker_checked_at is None:
+            return True
+        check_seconds = config.getfloat("spectrometer_reading.config", "flicker_check_minutes", fallback=60.0) * 60
+        return time() - self._flicker_checked_at > check_seconds
+
+    def check_flicker(self) -> None:
+        # call with the LEDs off. If the flicker changed, re-plan the integration before the dark frame is recorded.
+        self._flicker_checked_at = time()
+        try:
+            flicker_hz = detect_mains_flicker(self.sensor)
+        except TRANSIENT_ERRORS as e:
+            self.logger.debug(f"Flicker detection failed: {e}", exc_info=True)
+            return
+
+        if flicker_hz is None:
+            self.logger.debug("Flicker detection was inconclusive. Keeping the current integration.")
+            return
+        if flicker_hz == self.flicker_hz:
+            return
+
+        self.flicker_hz = flicker_hz
+        if flicker_hz:
+            self.logger.info(f"Detected {flicker_hz} Hz ambient light flicker. Integrating over whole flicker periods.")
+        else:
+            self.logger.info("No ambient light flicker detected.")
+        self.apply_integration_plan()
+
+    def integration_astep(self) -> int:
+        # with flicker, each ATIME step lasts one flicker period, so every integration covers whole periods.
+        return flicker_astep(self.flicker_hz) if self.flicker_hz else DEFAULT_ASTEP
+
     @property
     def led_state_during_spec_reading(self) -> dict:
+        import pioreactor.actions.led_intensity as led_utils
+
         if config.getboolean("spectrometer_reading.config", "turn_off_leds_during_reading", fallback=True):
             return {channel: 0.0 for channel in led_utils.ALL_LED_CHANNELS}
         else:
@@ -180,20 +584,29 @@ class SpectrometerReading(BackgroundJobWithDodgingContrib):
         self.turn_off_led()
 
     def _record_once(self) -> None:
+        import pioreactor.actions.led_intensity as led_utils
+
+        if self.recording_has_ended():
+            self.logger.info("Reached the end of the recording.")
+            self.clean_up()
+            return
+
         if not self.is_setup_done:
-            with led_utils.change_leds_intensities_temporarily(
-                {channel: 0.0 for channel in led_utils.ALL_LED_CHANNELS},
-                unit=self.unit,
-                experiment=self.experiment,
-                source_of_event=self.job_name,
-                pubsub_client=self.pub_client,
-                verbose=False,
-            ):
-                self.turn_off_led()
-                self.record_background_noise()
+            # a recent dark frame from a previous run lets this cycle go straight to a scan.
+            self.is_setup_done = self.load_cached_background()
 
+        if not self.is_setup_done or self.flicker_check_is_due():
+            self.record_dark_frame()
             self.is_setup_done = True
         else:
+            # a stale dark frame is refreshed at the start of a scan cycle, in the time of one of the burst's scans (the
+            # burst ends early to stay in the dodging window), so the cycle still publishes.
+            refresh_dark_frame = self.background_is_stale() and self.dark_frame_fits()
+            if refresh_dark_frame and not self.led_state_during_spec_reading:
+                # the other LEDs stay on during scans, so the dark frame needs them switched off first.
+                self.record_dark_frame()
+                refresh_dark_frame = False
+
             with led_utils.change_leds_intensities_temporarily(
                 self.led_state_during_spec_reading,
                 unit=self.unit,
@@ -202,22 +615,290 @@ class SpectrometerReading(BackgroundJobWithDodgingContrib):
                 pubsub_client=self.pub_client,
                 verbose=False,
             ):
+                if refresh_dark_frame:
+                    # every LED is already off for the scan, except the onboard LED.
+                    self.turn_off_led()
+                    self.record_background_noise()
                 self.turn_on_led()
-                self.record_all_bands()
-                if not config.getboolean("spectrometer_reading.config", "always_keep_led_on", fallback=False):
+                if self._acquisition is not None:
+                    self._acquisition.run(self.acquire_all_bands())
+                else:
+                    self.record_all_bands()
+                    if self._excitation_states:
+                        self.turn_off_led()
+                        self.record_excitation_sweep()
+                if config.getboolean("spectrometer_reading.config", "always_keep_led_on", fallback=False):
+                    self.turn_on_led()
+                else:
                     self.turn_off_led()
 
+    def recording_has_ended(self) -> bool:
+        # only a replay (never wrapped, unlike the hardware sensor) runs out of scans. It says so before the read that
+        # would fail, so the job stops instead of logging an error every cycle.
+        return not isinstance(self.sensor, ResilientSensor) and getattr(self.sensor, "exhausted", False)
+
+    def record_dark_frame(self) -> None:
+        import pioreactor.actions.led_intensity as led_utils
+
+        with led_utils.change_leds_intensities_temporarily(
+            {channel: 0.0 for channel in led_utils.ALL_LED_CHANNELS},
+            unit=self.unit,
+            experiment=self.experiment,
+            source_of_event=self.job_name,
+            pubsub_client=self.pub_client,
+            verbose=False,
+        ):
+            self.turn_off_led()
+            if self.flicker_check_is_due():
+                self.check_flicker()
+            self.record_background_noise()
+
+    def dark_frame_fits(self) -> bool:
+        # when dodging, whether the dark frame and at least one scan, each as long as a scan, fit before the deadline.
+        if self._cycle_deadline is None:
+            return True
+        return time() + 2 * scan_seconds(self.sensor.atime, self.sensor.astep, smux_halves(self.bands)) <= self._cycle_deadline
+
+    def record_excitation_sweep(self) -> None:
+        import pioreactor.actions.led_intensity as led_utils
+
+        led_kwargs: dict[str, t.Any] = dict(
+            unit=self.unit,
+            experiment=self.experiment,
+            source_of_event=self.job_name,
+            pubsub_client=self.pub_client,
+            verbose=False,
+        )
+        scans = []
+        # restores the LEDs to their state before the sweep when done.
+        with led_utils.change_leds_intensities_temporarily(full_led_state(self._excitation_states[0]), **led_kwargs):
+            step_seconds = 0.0
+            for step, state in enumerate(self._excitation_states):
+                if step > 0:
+                    if not self.another_scan_fits(step_seconds):
+                        break
+                    # one change per state, for all channels at once.
+                    led_utils.led_intensity(full_led_state(state), **led_kwargs)
+
+                step_started_at = time()
+                started_at = current_utc_datetime()
+                raw_channels = self.read_channels()
+                scans.append(self.excitation_scan(state, raw_channels, started_at, current_utc_datetime()))
+                step_seconds = time() - step_started_at
+
+        self.excitation_sweep = ExcitationSweep(scans=scans)
+
+    async def acquire_excitation_sweep(self) -> None:
+        # as record_excitation_sweep, awaiting each scan.
+        import pioreactor.actions.led_intensity as led_utils
+
+        assert self._async_sensor is not None
+        led_kwargs: dict[str, t.Any] = dict(
+            unit=self.unit,
+            experiment=self.experiment,
+            source_of_event=self.job_name,
+            pubsub_client=self.pub_client,
+            verbose=False,
+        )
+        scans = []
+        with led_utils.change_leds_intensities_temporarily(full_led_state(self._excitation_states[0]), **led_kwargs):
+            step_seconds = 0.0
+            for step, state in enumerate(self._excitation_states):
+                if step > 0:
+                    if not self.another_scan_fits(step_seconds):
+                        break
+                    led_utils.led_intensity(full_led_state(state), **led_kwargs)
+
+                step_started_at = time()
+                started_at = current_utc_datetime()
+                raw_channels = await self._async_sensor.read_bands(self.bands)
+                scans.append(self.excitation_scan(state, raw_channels, started_at, current_utc_datetime()))
+                step_seconds = time() - step_started_at
+
+        self.excitation_sweep = ExcitationSweep(scans=scans)
+
+    def excitation_scan(
+        self, state: dict[str, float], raw_channels: t.Sequence[int], started_at: datetime, ended_at: datetime
+    ) -> ExcitationScan:
+        normalized_channels = self.normalize_by_gain_time(list(raw_channels))
+        return ExcitationScan(
+            timestamp=started_at + (ended_at - started_at) / 2,
+            excitation=excitation_label(state),
+            bands={band: self.normalize_by_offset(normalized_channels, i) for i, band in enumerate(BANDS) if band in self.bands},
+        )
+
     def action_to_do_after_od_reading(self) -> None:
-        self._record_once()
+        if self._cycles_to_skip > 0:
+            self._cycles_to_skip -= 1
+            return
+
+        started_at = time()
+        self._cycle_deadline = started_at + self.dodging_budget()
+        try:
+            self._record_once()
+        finally:
+            self._cycle_deadline = None
+        self.record_dodging_margin(started_at, time())
+
+    def read_od_schedule(self) -> tuple[float, float]:
+        from pioreactor.utils.job_manager import JobManager
+
+        with JobManager() as jm:
+            interval = float(jm.get_setting_from_running_job("od_reading", "interval", timeout=5))
+            first_od_obs_time = float(jm.get_setting_from_running_job("od_reading", "first_od_obs_time", timeout=5))
+        return interval, first_od_obs_time
+
+    def record_dodging_margin(self, started_at: float, ended_at: float) -> None:
+        """
+        Publish how long before the next OD reading's pre-delay the scan (and its LED changes) finished, and if that's
+        less than min_dodging_margin_ms, shorten future scans. If they can't be shortened, skip the next cycle.
+        """
+        if self._od_schedule is None:
+            self._od_schedule = self.read_od_schedule()
+        interval, first_od_obs_time = self._od_schedule
+        pre_delay = config.getfloat(f"{self.job_name}.config", "pre_delay_duration", fallback=1.5)
+
+        # measured from the start of the scan, so a scan that runs past the OD reading has a negative margin.
+        deadline = started_at + (interval - (started_at - first_od_obs_time) % interval) - pre_delay
+        self.dodging_margin_ms = round((deadline - ended_at) * 1000, 1)
+
+        min_margin_ms = config.getfloat("spectrometer_reading.config", "min_dodging_margin_ms", fallback=100.0)
+        if self.dodging_margin_ms >= min_margin_ms:
+            self._healthy_margins += 1
+            if self._dodging_window_cap is not None and self._healthy_margins >= self.RELAX_WINDOW_CAP_AFTER:
+                self.relax_dodging_window_cap()
+            return
+        self._healthy_margins = 0
+
+        # the scan took longer than planned (ex: slow LED changes), so plan the next ones to be shorter by the shortfall.
+        shortfall = (min_margin_ms - self.dodging_margin_ms) / 1000
+        planned_duration = self._plan.duration_seconds if self._plan is not None else self.scan_window()
+        window = planned_duration - shortfall
+        try:
+            plan = self.plan_for_window(window)
+        except IntegrationBudgetError:
+            self.logger.warning(
+                f"Spectrometer scan ended {self.dodging_margin_ms:.0f}ms before the next OD reading, and can't be shortened further. Skipping the next scan."
+            )
+            self._cycles_to_skip = 1
+            return
+
+        self._dodging_window_cap = min(window, self.dodging_budget())
+        self.logger.warning(
+            f"Spectrometer scan ended {self.dodging_margin_ms:.0f}ms before the next OD reading. Shortening integration to {plan.integration_seconds * 1000:.0f}ms."
+        )
+        self.use_plan(plan)
+
+    def relax_dodging_window_cap(self) -> None:
+        # a slow spell (ex: a busy MQTT broker) shouldn't shorten scans for the rest of the job, so after enough healthy
+        # margins, move the cap halfway back to the full window.
+        self._healthy_margins = 0
+        budget = self.dodging_budget()
+        assert self._dodging_window_cap is not None
+        cap = self._dodging_window_cap + (budget - self._dodging_window_cap) / 2
+        self._dodging_window_cap = cap if budget - cap > 0.01 else None
+        plan = self.plan_for_window(self.scan_window())
+        self.logger.debug(
+            f"Dodging margins are healthy again. Lengthening integration to {plan.integration_seconds * 1000:.0f}ms."
+        )
+        self.use_plan(plan)
 
     def _record_continuously(self) -> None:
         if self.state != self.READY or self.currently_dodging_od:
             return
+        if config.getboolean("spectrometer_reading.config", "synchronize_scans", fallback=False) and self.record_scan_skew():
+            # the realigned timer scans in this slot, or the next. Scanning here too would drive the sensor and LEDs
+            # from two threads at once.
+            return
         self._record_once()
 
+    def record_scan_skew(self) -> bool:
+        # returns whether the timer was restarted.
+        interval = 1.0 / config.getfloat("od_reading.config", "samples_per_second", fallback=0.2)
+        skew = scan_slot_skew(interval, time())
+        self.scan_skew_ms = round(skew * 1000, 1)
+
+        max_skew_ms = config.getfloat("spectrometer_reading.config", "max_scan_skew_ms", fallback=50.0)
+        if abs(self.scan_skew_ms) > max_skew_ms:
+            # our timer has drifted from the wall clock (ex: clock was adjusted by NTP), so restart it on the shared grid.
+            self.logger.debug(f"Scan skew of {self.scan_skew_ms} ms exceeds {max_skew_ms} ms. Realigning scans.")
+            self.initialize_continuous_operation()
+            return True
+        return False
+
+    def scan_window(self) -> float:
+        # seconds available for a scan and its LED changes
+        samples_per_second = config.getfloat("od_reading.config", "samples_per_second", fallback=0.2)
+        if self.currently_dodging_od:
+            window = self.dodging_budget()
+            return window if self._dodging_window_cap is None else min(window, self._dodging_window_cap)
+        else:
+            return 1.0 / samples_per_second
+
+    def dodging_budget(self) -> float:
+        # the time the base class allows action_to_do_after_od_reading before it stops the job, less min_dodging_margin_ms
+        # so a scan that runs a little long still ends before the next OD reading.
+        min_margin_ms = config.getfloat("spectrometer_reading.config", "min_dodging_margin_ms", fallback=100.0)
+        return (
+            available_window(
+                config.getfloat("od_reading.config", "samples_per_second", fallback=0.2),
+                od_duration=self.OD_READING_DURATION,
+                pre_delay=config.getfloat(f"{self.job_name}.config", "pre_delay_duration", fallback=1.5),
+                post_delay=config.getfloat(f"{self.job_name}.config", "post_delay_duration", fallback=0.5),
+            )
+            - min_margin_ms / 1000
+        )
+
+    def plan_for_window(self, window: float) -> IntegrationPlan:
+        # an excitation sweep adds a scan, and an LED change, per state.
+        n_states = len(self._excitation_states)
+        led_switching_seconds = config.getfloat("spectrometer_reading.config", "led_switching_duration", fallback=0.2)
+        return plan_integration(
+            window,
+            led_switching_seconds=led_switching_seconds * (1 + n_states),
+            max_integration_seconds=config.getfloat("spectrometer_reading.config", "max_integration_ms", fallback=270.0) / 1000,
+            max_burst_scans=config.getint("spectrometer_reading.config", "max_burst_scans", fallback=3),
+            extra_scans=n_states,
+            halves=smux_halves(self.bands),
+            astep=self.integration_astep(),
+        )
+
+    def use_plan(self, plan: IntegrationPlan) -> None:
+        if self._plan is not None and self._plan.integration_seconds != plan.integration_seconds:
+            self.reset_band_filters()
+        self.sensor.atime = plan.atime
+        self.sensor.astep = plan.astep
+        self.burst_scans = plan.burst_scans
+        self._plan = plan
+        self.logger.debug(f"Using {plan}.")
+
+    def apply_integration_plan(self) -> IntegrationPlan | None:
+        window = self.scan_window()
+        max_integration_seconds = config.getfloat("spectrometer_reading.config", "max_integration_ms", fallback=270.0) / 1000
+        try:
+            plan = self.plan_for_window(window)
+        except IntegrationBudgetError as e:
+            self.logger.error(f"{e} Decrease pre_delay_duration or post_delay_duration, or decrease samples_per_second.")
+            self.clean_up()
+            return None
+
+        if plan.integration_seconds < max_integration_seconds - 0.003:
+            self.logger.warning(
+                f"Shortened spectrometer integration to {plan.integration_seconds * 1000:.0f}ms to fit in the {window:.2f}s between OD readings."
+            )
+
+        self.use_plan(plan)
+        return plan
+
     def initialize_dodging_operation(self) -> None:
         with suppress(AttributeError):
             self.continuous_sampling_timer.cancel()
+        # the OD job may have restarted with a new schedule, so measure again.
+        self._od_schedule = None
+        self._dodging_window_cap = None
+        self._healthy_margins = 0
+        self._cycles_to_skip = 0
+        self.apply_integration_plan()
 
     def initialize_continuous_operation(self) -> None:
         with suppress(AttributeError):
@@ -229,22 +910,168 @@ class SpectrometerReading(BackgroundJobWithDodgingContrib):
             self.clean_up()
             return
 
+        if self.apply_integration_plan() is None:
+            return
+
+        interval = 1.0 / samples_per_second
+        if config.getboolean("spectrometer_reading.config", "synchronize_scans", fallback=False):
+            # start on the next slot of the cluster-wide grid
+            run_after = seconds_until_next_scan_slot(interval, time())
+        else:
+            run_after = None
+
         self.continuous_sampling_timer = RepeatedTimer(
-            1.0 / samples_per_second,
+            interval,
             self._record_continuously,
             job_name=self.job_name,
             run_immediately=True,
+            run_after=run_after,
             logger=self.logger,
         ).start()
 
 
 @run.command(name="spectrometer_reading")
-def start_spectrometer_reading() -> None:
+@click.option(
+    "--replay",
+    "replay_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Replay an as7341_spectrum_readings export (zip or csv) instead of reading the sensor.",
+)
+@click.option("--replay-speed", default=1.0, show_default=True, type=click.FloatRange(min=0, min_open=True))
+@click.option("--replay-unit", help="Unit to replay, if the recording has several.")
+@click.option("--replay-loop", is_flag=True, help="Start the recording over when it ends.")
+def start_spectrometer_reading(replay_path: str | None, replay_speed: float, replay_unit: str | None, replay_loop: bool) -> None:
     """
     Start spectrometer reading from the AS7341 sensor.
     """
     unit = get_unit_name()
     exp = get_assigned_experiment_name(unit)
+
+    if replay_path is not None:
+        replay_spectrometer_reading(unit, exp, replay_path, replay_speed, replay_unit, replay_loop)
+        return
+
     enable_dodging_od = config.getboolean("spectrometer_reading.config", "enable_dodging_od", fallback=False)
     job = SpectrometerReading(unit=unit, experiment=exp, enable_dodging_od=enable_dodging_od)
     job.block_until_disconnected()
+
+
+def replay_spectrometer_reading(
+    unit: str, experiment: str, path: str, speed: float, recorded_unit: str | None, loop: bool
+) -> None:
+    from pioreactor.config import temporary_config_changes
+
+    from spectrometer_reading_plugin.replay import ReplayAS7341
+
+    sensor = ReplayAS7341.from_recording(path, speed=speed, unit=recorded_unit, loop=loop)
+
+    # the replay sets the pace, emulates the onboard LED for the dark frame, and never dodges OD. Each recorded spectrum
+    # is already a burst's average, so a cycle reads one.
+    changes: list[tuple[str, str, str | None]] = [
+        ("od_reading.config", "samples_per_second", str(2 * sensor.samples_per_second)),
+        ("spectrometer_reading.config", "max_burst_scans", "1"),
+        ("spectrometer_reading.config", "use_onboard_led", "1"),
+        ("spectrometer_reading.config", "led_current_mA", "5"),
+        ("spectrometer_reading.config", "synchronize_scans", "0"),
+    ]
+    with temporary_config_changes(config, changes):
+        with SpectrometerReading(unit=unit, experiment=experiment, enable_dodging_od=False, sensor=sensor) as job:
+            # the job disconnects itself at the end of the recording.
+            job.block_until_disconnected()
+
+
+@run.command(name="spectrometer_snapshot")
+@click.option("--scans", default=1, show_default=True, type=click.IntRange(min=1), help="Average this many dark and lit scans.")
+@click.option("--publish", is_flag=True, help="Also publish the spectrum, so the leader stores it with the job's readings.")
+def click_spectrometer_snapshot(scans: int, publish: bool) -> None:
+    """
+    Take one spectrum from the AS7341 sensor, print it as JSON, and exit.
+    """
+    from pioreactor.utils import is_pio_job_running
+
+    from spectrometer_reading_plugin.snapshot import take_snapshot
+
+    if is_pio_job_running("spectrometer_reading"):
+        raise click.ClickException("spectrometer_reading is running and using the sensor. Stop it first.")
+    if is_pio_job_running("od_reading"):
+        # a snapshot doesn't dodge OD readings: its LED would shine into them, and theirs into the snapshot.
+        raise click.ClickException(
+            "od_reading is running. Stop it first, or use spectrometer_reading, which takes scans between OD readings."
+        )
+
+    try:
+        bands = parse_bands(config.get("spectrometer_reading.config", "bands", fallback=""))
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    try:
+        sensor = create_sensor()
+    except Exception as e:
+        raise click.ClickException("Is the AS7341 board attached to the Pioreactor HAT?") from e
+
+    led_current = config.getfloat("spectrometer_reading.config", "led_current_mA")
+    sensor.led_current = led_current
+    sensor.gain = 10
+
+    spectrum = take_snapshot(
+        sensor,
+        scans=scans,
+        use_led=config.getboolean("spectrometer_reading.config", "use_onboard_led") and led_current > 0,
+        bands=bands,
+    )
+    click.echo(str(spectrum))
+
+    if publish:
+        from pioreactor.pubsub import publish as publish_to_mqtt
+
+        unit = get_unit_name()
+        exp = get_assigned_experiment_name(unit)
+        publish_to_mqtt(f"pioreactor/{unit}/{exp}/spectrometer_reading/spectrum", str(spectrum))
+
+
+@run.command(name="spectrometer_blank")
+@click.option("--delete", is_flag=True, help="Delete the experiment's blank, instead of recording one.")
+def click_spectrometer_blank(delete: bool) -> None:
+    """
+    Record the next spectrometer scan as the blank for absorbance, or delete the blank.
+    """
+    from pioreactor.pubsub import publish
+    from pioreactor.utils import is_pio_job_running
+
+    from spectrometer_reading_plugin.absorbance import delete_blank
+
+    unit = get_unit_name()
+    exp = get_assigned_experiment_name(unit)
+
+    if delete:
+        delete_blank(exp)
+        click.echo(f"Deleted the spectrometer blank for {exp}. Restart spectrometer_reading to stop publishing absorbance.")
+        return
+
+    if not is_pio_job_running("spectrometer_reading"):
+        raise click.ClickException("spectrometer_reading isn't running. Start it, and then record the blank.")
+
+    publish(f"pioreactor/{unit}/{exp}/spectrometer_reading/record_blank/set", 1)
+    click.echo("The next spectrometer scan will be recorded as the blank.")
+
+
+@run.command(name="spectrometer_archive")
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--experiment", help="Archive only this experiment's readings.")
+def click_spectrometer_archive(output: str, experiment: str | None) -> None:
+    """
+    Write the leader's spectrometer readings to a compact, columnar archive. Run this on the leader.
+    """
+    import sqlite3
+    from pathlib import Path
+
+    from spectrometer_reading_plugin.archive import write_archive
+
+    database = Path(config.get("storage", "database"))
+    if not database.exists():
+        raise click.ClickException(f"{database} not found. Is this the leader?")
+
+    # read-only, and closed afterwards: a connection's context manager only ends its transaction.
+    with closing(sqlite3.connect(f"{database.absolute().as_uri()}?mode=ro", uri=True)) as db:
+        written = write_archive(db, output, experiment=experiment)
+    click.echo(f"Archived {written['readings']} readings in {written['chunks']} chunks to {output}.")
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Absorbance relative to a blank: A = -log10(I / I0), per band.
+
+The blank (I0) is a spectrum recorded per experiment, usually at inoculation, and kept in the unit's persistent
+storage so it survives restarts.
+"""
+from __future__ import annotations
+
+from math import log10
+from typing import cast
+
+from msgspec.json import decode as msgspec_loads
+from msgspec.json import encode as msgspec_dumps
+from pioreactor.utils import local_persistent_storage
+
+BLANK_CACHE_NAME = "spectrometer_blank"
+
+
+def load_blank(experiment: str) -> dict[int, float] | None:
+    with local_persistent_storage(BLANK_CACHE_NAME) as cache:
+        if experiment not in cache:
+            return None
+        return msgspec_loads(cast(bytes, cache[experiment]), type=dict[int, float])
+
+
+def save_blank(experiment: str, bands: dict[int, float]) -> None:
+    with local_persistent_storage(BLANK_CACHE_NAME) as cache:
+        cache[experiment] = msgspec_dumps(bands)
+
+
+def delete_blank(experiment: str) -> None:
+    with local_persistent_storage(BLANK_CACHE_NAME) as cache:
+        if experiment in cache:
+            del cache[experiment]
+
+
+def absorbance(bands: dict[int, float], blank: dict[int, float]) -> dict[int, float]:
+    """
+    Absorbance of each band with a positive reading and a positive blank. Other bands are left out, since their
+    absorbance isn't defined.
+    """
+    return {band: -log10(reading / blank[band]) for band, reading in bands.items() if reading > 0 and blank.get(band, 0.0) > 0}
@@ -1,3 +1,309 @@
+-- Readings are stored compactly: experiment and unit as integer keys into lookup tables, timestamps as integer
+-- milliseconds since the Unix epoch, clustered by (experiment, band, unit, time) so charts and exports read
+-- contiguous pages. as7341_spectrum_readings_all presents them with the original column names and ISO timestamps,
+-- and accepts inserts in that form.
+--
+-- This script runs on every install, so every statement must be safe to repeat.
+
+CREATE TABLE IF NOT EXISTS as7341_experiments (
+    experiment_id            INTEGER PRIMARY KEY,
+    experiment               TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS as7341_units (
+    unit_id                  INTEGER PRIMARY KEY,
+    pioreactor_unit          TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS as7341_spectrum_readings_compact (
+    experiment_id            INTEGER NOT NULL REFERENCES as7341_experiments (experiment_id),
+    band                     INTEGER NOT NULL,
+    unit_id                  INTEGER NOT NULL REFERENCES as7341_units (unit_id),
+    timestamp_ms             INTEGER NOT NULL,
+    reading                  REAL,
+    PRIMARY KEY (experiment_id, band, unit_id, timestamp_ms)
+) WITHOUT ROWID;
+
+-- quality flags of the readings that have any: 1 saturated, 2 integrated at another gain than set (invalid), 4 retaken
+-- at a lower gain. Most readings have none, so they're kept apart, and a good reading costs no storage.
+CREATE TABLE IF NOT EXISTS as7341_spectrum_flags_compact (
+    experiment_id            INTEGER NOT NULL REFERENCES as7341_experiments (experiment_id),
+    band                     INTEGER NOT NULL,
+    unit_id                  INTEGER NOT NULL REFERENCES as7341_units (unit_id),
+    timestamp_ms             INTEGER NOT NULL,
+    flags                    INTEGER NOT NULL,
+    PRIMARY KEY (experiment_id, band, unit_id, timestamp_ms)
+) WITHOUT ROWID;
+
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_all;
+CREATE VIEW as7341_spectrum_readings_all AS
+  SELECT
+    e.experiment,
+    u.pioreactor_unit,
+    strftime('%Y-%m-%dT%H:%M:%fZ', r.timestamp_ms / 1000.0, 'unixepoch') AS timestamp,
+    r.reading,
+    r.band,
+    coalesce(f.flags, 0) AS flags
+  FROM as7341_spectrum_readings_compact AS r
+  JOIN as7341_experiments AS e USING (experiment_id)
+  JOIN as7341_units AS u USING (unit_id)
+  LEFT JOIN as7341_spectrum_flags_compact AS f USING (experiment_id, band, unit_id, timestamp_ms);
+
+CREATE TRIGGER IF NOT EXISTS as7341_spectrum_readings_all_insert
+INSTEAD OF INSERT ON as7341_spectrum_readings_all
+BEGIN
+    INSERT OR IGNORE INTO as7341_experiments (experiment) VALUES (NEW.experiment);
+    INSERT OR IGNORE INTO as7341_units (pioreactor_unit) VALUES (NEW.pioreactor_unit);
+    INSERT OR IGNORE INTO as7341_spectrum_readings_compact (experiment_id, band, unit_id, timestamp_ms, reading)
+    VALUES (
+        (SELECT experiment_id FROM as7341_experiments WHERE experiment = NEW.experiment),
+        NEW.band,
+        (SELECT unit_id FROM as7341_units WHERE pioreactor_unit = NEW.pioreactor_unit),
+        CAST(round((julianday(NEW.timestamp) - 2440587.5) * 86400000) AS INTEGER),
+        NEW.reading
+    );
+    INSERT OR IGNORE INTO as7341_spectrum_flags_compact (experiment_id, band, unit_id, timestamp_ms, flags)
+    SELECT
+        e.experiment_id,
+        NEW.band,
+        u.unit_id,
+        CAST(round((julianday(NEW.timestamp) - 2440587.5) * 86400000) AS INTEGER),
+        NEW.flags
+    FROM as7341_experiments AS e, as7341_units AS u
+    WHERE e.experiment = NEW.experiment AND u.pioreactor_unit = NEW.pioreactor_unit AND coalesce(NEW.flags, 0) != 0;
+END;
+
+
+-- absorbance relative to the experiment's blank, stored the same way.
+CREATE TABLE IF NOT EXISTS as7341_absorbance_readings_compact (
+    experiment_id            INTEGER NOT NULL REFERENCES as7341_experiments (experiment_id),
+    band                     INTEGER NOT NULL,
+    unit_id                  INTEGER NOT NULL REFERENCES as7341_units (unit_id),
+    timestamp_ms             INTEGER NOT NULL,
+    absorbance               REAL,
+    PRIMARY KEY (experiment_id, band, unit_id, timestamp_ms)
+) WITHOUT ROWID;
+
+DROP VIEW IF EXISTS as7341_absorbance_readings_all;
+CREATE VIEW as7341_absorbance_readings_all AS
+  SELECT
+    e.experiment,
+    u.pioreactor_unit,
+    strftime('%Y-%m-%dT%H:%M:%fZ', r.timestamp_ms / 1000.0, 'unixepoch') AS timestamp,
+    r.absorbance AS reading,
+    r.band,
+    -- the flags of the scan the absorbance is from. Inserted flags are ignored, since the scan's insert stores them.
+    coalesce(f.flags, 0) AS flags
+  FROM as7341_absorbance_readings_compact AS r
+  JOIN as7341_experiments AS e USING (experiment_id)
+  JOIN as7341_units AS u USING (unit_id)
+  LEFT JOIN as7341_spectrum_flags_compact AS f USING (experiment_id, band, unit_id, timestamp_ms);
+
+CREATE TRIGGER IF NOT EXISTS as7341_absorbance_readings_all_insert
+INSTEAD OF INSERT ON as7341_absorbance_readings_all
+BEGIN
+    INSERT OR IGNORE INTO as7341_experiments (experiment) VALUES (NEW.experiment);
+    INSERT OR IGNORE INTO as7341_units (pioreactor_unit) VALUES (NEW.pioreactor_unit);
+    INSERT OR IGNORE INTO as7341_absorbance_readings_compact (experiment_id, band, unit_id, timestamp_ms, absorbance)
+    VALUES (
+        (SELECT experiment_id FROM as7341_experiments WHERE experiment = NEW.experiment),
+        NEW.band,
+        (SELECT unit_id FROM as7341_units WHERE pioreactor_unit = NEW.pioreactor_unit),
+        CAST(round((julianday(NEW.timestamp) - 2440587.5) * 86400000) AS INTEGER),
+        NEW.reading
+    );
+END;
+
+
+-- excitation sweeps: one scan per Pioreactor LED state, with the state dictionary-encoded like experiments and units.
+CREATE TABLE IF NOT EXISTS as7341_excitations (
+    excitation_id            INTEGER PRIMARY KEY,
+    excitation               TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS as7341_excitation_readings_compact (
+    experiment_id            INTEGER NOT NULL REFERENCES as7341_experiments (experiment_id),
+    excitation_id            INTEGER NOT NULL REFERENCES as7341_excitations (excitation_id),
+    band                     INTEGER NOT NULL,
+    unit_id                  INTEGER NOT NULL REFERENCES as7341_units (unit_id),
+    timestamp_ms             INTEGER NOT NULL,
+    reading                  REAL,
+    PRIMARY KEY (experiment_id, excitation_id, band, unit_id, timestamp_ms)
+) WITHOUT ROWID;
+
+DROP VIEW IF EXISTS as7341_excitation_readings_all;
+CREATE VIEW as7341_excitation_readings_all AS
+  SELECT
+    e.experiment,
+    u.pioreactor_unit,
+    strftime('%Y-%m-%dT%H:%M:%fZ', r.timestamp_ms / 1000.0, 'unixepoch') AS timestamp,
+    x.excitation,
+    r.reading,
+    r.band
+  FROM as7341_excitation_readings_compact AS r
+  JOIN as7341_experiments AS e USING (experiment_id)
+  JOIN as7341_units AS u USING (unit_id)
+  JOIN as7341_excitations AS x USING (excitation_id);
+
+CREATE TRIGGER IF NOT EXISTS as7341_excitation_readings_all_insert
+INSTEAD OF INSERT ON as7341_excitation_readings_all
+BEGIN
+    INSERT OR IGNORE INTO as7341_experiments (experiment) VALUES (NEW.experiment);
+    INSERT OR IGNORE INTO as7341_units (pioreactor_unit) VALUES (NEW.pioreactor_unit);
+    INSERT OR IGNORE INTO as7341_excitations (excitation) VALUES (NEW.excitation);
+    INSERT OR IGNORE INTO as7341_excitation_readings_compact (experiment_id, excitation_id, band, unit_id, timestamp_ms, reading)
+    VALUES (
+        (SELECT experiment_id FROM as7341_experiments WHERE experiment = NEW.experiment),
+        (SELECT excitation_id FROM as7341_excitations WHERE excitation = NEW.excitation),
+        NEW.band,
+        (SELECT unit_id FROM as7341_units WHERE pioreactor_unit = NEW.pioreactor_unit),
+        CAST(round((julianday(NEW.timestamp) - 2440587.5) * 86400000) AS INTEGER),
+        NEW.reading
+    );
+END;
+
+
+-- one reading per band, unit and chart bucket, downsampled by the leader (see downsampling.py), for the charts. Each
+-- level's buckets are 8 times as wide as the level below's.
+CREATE TABLE IF NOT EXISTS as7341_spectrum_chart_compact (
+    experiment_id            INTEGER NOT NULL REFERENCES as7341_experiments (experiment_id),
+    band                     INTEGER NOT NULL,
+    unit_id                  INTEGER NOT NULL REFERENCES as7341_units (unit_id),
+    level                    INTEGER NOT NULL,
+    timestamp_ms             INTEGER NOT NULL,
+    reading                  REAL,
+    PRIMARY KEY (experiment_id, band, unit_id, level, timestamp_ms)
+) WITHOUT ROWID;
+
+-- the number of points of each series at each level, so the charts can pick a level without counting them.
+CREATE TABLE IF NOT EXISTS as7341_spectrum_chart_levels (
+    experiment_id            INTEGER NOT NULL REFERENCES as7341_experiments (experiment_id),
+    band                     INTEGER NOT NULL,
+    unit_id                  INTEGER NOT NULL REFERENCES as7341_units (unit_id),
+    level                    INTEGER NOT NULL,
+    points                   INTEGER NOT NULL,
+    PRIMARY KEY (experiment_id, band, unit_id, level)
+) WITHOUT ROWID;
+
+-- each series at the finest level with at most 2000 points (downsampling.CHART_POINTS), or else its coarsest.
+DROP VIEW IF EXISTS as7341_spectrum_chart_all;
+CREATE VIEW as7341_spectrum_chart_all AS
+  SELECT
+    e.experiment,
+    u.pioreactor_unit,
+    strftime('%Y-%m-%dT%H:%M:%fZ', r.timestamp_ms / 1000.0, 'unixepoch') AS timestamp,
+    r.reading,
+    r.band,
+    r.level
+  FROM as7341_spectrum_chart_compact AS r
+  JOIN (
+    SELECT experiment_id, band, unit_id, coalesce(min(CASE WHEN points <= 2000 THEN level END), max(level)) AS level
+    FROM as7341_spectrum_chart_levels
+    GROUP BY experiment_id, band, unit_id
+  ) USING (experiment_id, band, unit_id, level)
+  JOIN as7341_experiments AS e USING (experiment_id)
+  JOIN as7341_units AS u USING (unit_id);
+
+CREATE TRIGGER IF NOT EXISTS as7341_spectrum_chart_all_insert
+INSTEAD OF INSERT ON as7341_spectrum_chart_all
+BEGIN
+    INSERT OR IGNORE INTO as7341_experiments (experiment) VALUES (NEW.experiment);
+    INSERT OR IGNORE INTO as7341_units (pioreactor_unit) VALUES (NEW.pioreactor_unit);
+    INSERT OR IGNORE INTO as7341_spectrum_chart_compact (experiment_id, band, unit_id, level, timestamp_ms, reading)
+    VALUES (
+        (SELECT experiment_id FROM as7341_experiments WHERE experiment = NEW.experiment),
+        NEW.band,
+        (SELECT unit_id FROM as7341_units WHERE pioreactor_unit = NEW.pioreactor_unit),
+        NEW.level,
+        CAST(round((julianday(NEW.timestamp) - 2440587.5) * 86400000) AS INTEGER),
+        NEW.reading
+    );
+    INSERT INTO as7341_spectrum_chart_levels (experiment_id, band, unit_id, level, points)
+    VALUES (
+        (SELECT experiment_id FROM as7341_experiments WHERE experiment = NEW.experiment),
+        NEW.band,
+        (SELECT unit_id FROM as7341_units WHERE pioreactor_unit = NEW.pioreactor_unit),
+        NEW.level,
+        1
+    )
+    ON CONFLICT DO UPDATE SET points = points + 1;
+END;
+
+
+-- each scan paired with the nearest preceding OD reading of each of its unit's channels, so analyses don't repeat the
+-- as-of join. The leader inserts one row per scan into as7341_spectrum_od_all, and the trigger looks up the OD
+-- readings then, using Pioreactor's od_readings_ix (experiment, pioreactor_unit, channel, timestamp).
+CREATE TABLE IF NOT EXISTS as7341_spectrum_od_compact (
+    experiment_id            INTEGER NOT NULL REFERENCES as7341_experiments (experiment_id),
+    unit_id                  INTEGER NOT NULL REFERENCES as7341_units (unit_id),
+    timestamp_ms             INTEGER NOT NULL,
+    channel                  INTEGER NOT NULL,
+    angle                    INTEGER,
+    od_timestamp_ms          INTEGER NOT NULL,
+    od_reading               REAL,
+    PRIMARY KEY (experiment_id, unit_id, timestamp_ms, channel)
+) WITHOUT ROWID;
+
+DROP VIEW IF EXISTS as7341_spectrum_od_all;
+CREATE VIEW as7341_spectrum_od_all AS
+  SELECT
+    e.experiment,
+    u.pioreactor_unit,
+    strftime('%Y-%m-%dT%H:%M:%fZ', p.timestamp_ms / 1000.0, 'unixepoch') AS timestamp
+  FROM as7341_spectrum_od_compact AS p
+  JOIN as7341_experiments AS e USING (experiment_id)
+  JOIN as7341_units AS u USING (unit_id);
+
+CREATE TRIGGER IF NOT EXISTS as7341_spectrum_od_all_insert
+INSTEAD OF INSERT ON as7341_spectrum_od_all
+BEGIN
+    INSERT OR IGNORE INTO as7341_experiments (experiment) VALUES (NEW.experiment);
+    INSERT OR IGNORE INTO as7341_units (pioreactor_unit) VALUES (NEW.pioreactor_unit);
+    INSERT OR IGNORE INTO as7341_spectrum_od_compact (experiment_id, unit_id, timestamp_ms, channel, angle, od_timestamp_ms, od_reading)
+    SELECT
+        (SELECT experiment_id FROM as7341_experiments WHERE experiment = NEW.experiment),
+        (SELECT unit_id FROM as7341_units WHERE pioreactor_unit = NEW.pioreactor_unit),
+        CAST(round((julianday(NEW.timestamp) - 2440587.5) * 86400000) AS INTEGER),
+        o.channel,
+        o.angle,
+        CAST(round((julianday(o.timestamp) - 2440587.5) * 86400000) AS INTEGER),
+        o.od_reading
+    FROM od_readings AS o
+    WHERE o.rowid IN (
+        SELECT (
+            SELECT rowid FROM od_readings
+            WHERE experiment = NEW.experiment AND pioreactor_unit = NEW.pioreactor_unit AND channel = c.channel AND timestamp <= NEW.timestamp
+            ORDER BY timestamp DESC
+            LIMIT 1
+        )
+        FROM (SELECT 1 AS channel UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4) AS c
+    );
+END;
+
+-- long format, like as7341_spectrum_readings_all, with the paired OD reading(s). Scans without one have NULLs.
+DROP VIEW IF EXISTS as7341_spectrum_readings_with_od;
+CREATE VIEW as7341_spectrum_readings_with_od AS
+  SELECT
+    e.experiment,
+    u.pioreactor_unit,
+    strftime('%Y-%m-%dT%H:%M:%fZ', r.timestamp_ms / 1000.0, 'unixepoch') AS timestamp,
+    r.reading,
+    r.band,
+    coalesce(f.flags, 0) AS flags,
+    p.channel AS od_channel,
+    p.angle AS od_angle,
+    strftime('%Y-%m-%dT%H:%M:%fZ', p.od_timestamp_ms / 1000.0, 'unixepoch') AS od_timestamp,
+    p.od_reading
+  FROM as7341_spectrum_readings_compact AS r
+  JOIN as7341_experiments AS e USING (experiment_id)
+  JOIN as7341_units AS u USING (unit_id)
+  LEFT JOIN as7341_spectrum_flags_compact AS f USING (experiment_id, band, unit_id, timestamp_ms)
+  LEFT JOIN as7341_spectrum_od_compact AS p
+    ON p.experiment_id = r.experiment_id AND p.unit_id = r.unit_id AND p.timestamp_ms = r.timestamp_ms;
+
+
+-- move readings from the original, uncompressed table, then drop it.
 CREATE TABLE IF NOT EXISTS as7341_spectrum_readings (
     experiment               TEXT NOT NULL,
     pioreactor_unit          TEXT NOT NULL,
@@ -6,27 +312,106 @@ CREATE TABLE IF NOT EXISTS as7341_spectrum_readings (
     band                     INT
 );
 
+INSERT INTO as7341_spectrum_readings_all (experiment, pioreactor_unit, timestamp, reading, band)
+  SELECT experiment, pioreactor_unit, timestamp, reading, band FROM as7341_spectrum_readings;
+
+DROP TABLE as7341_spectrum_readings;
+
+
+-- on the first install with charts downsampled, fill them from the existing readings: per bucket of each level, the
+-- reading farthest from the bucket's mean, a cheap stand-in for the leader's LTTB.
+INSERT OR IGNORE INTO as7341_spectrum_chart_compact (experiment_id, band, unit_id, level, timestamp_ms, reading)
+  SELECT experiment_id, band, unit_id, level, timestamp_ms, reading
+  FROM (
+    SELECT
+      *,
+      ROW_NUMBER() OVER (PARTITION BY experiment_id, band, unit_id, level, bucket ORDER BY abs(reading - bucket_mean) DESC) AS rank
+    FROM (
+      SELECT
+        *,
+        timestamp_ms / bucket_ms AS bucket,
+        avg(reading) OVER (PARTITION BY experiment_id, band, unit_id, level, timestamp_ms / bucket_ms) AS bucket_mean
+      FROM as7341_spectrum_readings_compact
+      -- 60 s buckets, and downsampling.LEVEL_FACTOR times wider at each of downsampling.LEVELS levels
+      CROSS JOIN (
+        SELECT 0 AS level, 60000 AS bucket_ms
+        UNION ALL SELECT 1, 480000
+        UNION ALL SELECT 2, 3840000
+        UNION ALL SELECT 3, 30720000
+        UNION ALL SELECT 4, 245760000
+      )
+      WHERE NOT EXISTS (SELECT 1 FROM as7341_spectrum_chart_compact)
+    )
+  )
+  WHERE rank = 1;
+
+INSERT INTO as7341_spectrum_chart_levels (experiment_id, band, unit_id, level, points)
+  SELECT experiment_id, band, unit_id, level, count(*)
+  FROM as7341_spectrum_chart_compact
+  WHERE NOT EXISTS (SELECT 1 FROM as7341_spectrum_chart_levels)
+  GROUP BY experiment_id, band, unit_id, level;
+
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_415;
+CREATE VIEW as7341_spectrum_readings_415 AS
+  SELECT * FROM as7341_spectrum_readings_all WHERE band=415;
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_445;
+CREATE VIEW as7341_spectrum_readings_445 AS
+  SELECT * FROM as7341_spectrum_readings_all WHERE band=445;
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_480;
+CREATE VIEW as7341_spectrum_readings_480 AS
+  SELECT * FROM as7341_spectrum_readings_all WHERE band=480;
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_515;
+CREATE VIEW as7341_spectrum_readings_515 AS
+  SELECT * FROM as7341_spectrum_readings_all WHERE band=515;
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_555;
+CREATE VIEW as7341_spectrum_readings_555 AS
+  SELECT * FROM as7341_spectrum_readings_all WHERE band=555;
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_590;
+CREATE VIEW as7341_spectrum_readings_590 AS
+  SELECT * FROM as7341_spectrum_readings_all WHERE band=590;
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_630;
+CREATE VIEW as7341_spectrum_readings_630 AS
+  SELECT * FROM as7341_spectrum_readings_all WHERE band=630;
+
+DROP VIEW IF EXISTS as7341_spectrum_readings_680;
+CREATE VIEW as7341_spectrum_readings_680 AS
+  SELECT * FROM as7341_spectrum_readings_all WHERE band=680;
 
-CREATE VIEW IF NOT EXISTS as7341_spectrum_readings_415 AS
-  SELECT * FROM as7341_spectrum_readings WHERE band=415;
+DROP VIEW IF EXISTS as7341_spectrum_chart_415;
+CREATE VIEW as7341_spectrum_chart_415 AS
+  SELECT * FROM as7341_spectrum_chart_all WHERE band=415;
 
-CREATE VIEW IF NOT EXISTS as7341_spectrum_readings_445 AS
-  SELECT * FROM as7341_spectrum_readings WHERE band=445;
+DROP VIEW IF EXISTS as7341_spectrum_chart_445;
+CREATE VIEW as7341_spectrum_chart_445 AS
+  SELECT * FROM as7341_spectrum_chart_all WHERE band=445;
 
-CREATE VIEW IF NOT EXISTS as7341_spectrum_readings_480 AS
-  SELECT * FROM as7341_spectrum_readings WHERE band=480;
+DROP VIEW IF EXISTS as7341_spectrum_chart_480;
+CREATE VIEW as7341_spectrum_chart_480 AS
+  SELECT * FROM as7341_spectrum_chart_all WHERE band=480;
 
-CREATE VIEW IF NOT EXISTS as7341_spectrum_readings_515 AS
-  SELECT * FROM as7341_spectrum_readings WHERE band=515;
+DROP VIEW IF EXISTS as7341_spectrum_chart_515;
+CREATE VIEW as7341_spectrum_chart_515 AS
+  SELECT * FROM as7341_spectrum_chart_all WHERE band=515;
 
-CREATE VIEW IF NOT EXISTS as7341_spectrum_readings_555 AS
-  SELECT * FROM as7341_spectrum_readings WHERE band=555;
+DROP VIEW IF EXISTS as7341_spectrum_chart_555;
+CREATE VIEW as7341_spectrum_chart_555 AS
+  SELECT * FROM as7341_spectrum_chart_all WHERE band=555;
 
-CREATE VIEW IF NOT EXISTS as7341_spectrum_readings_590 AS
-  SELECT * FROM as7341_spectrum_readings WHERE band=590;
+DROP VIEW IF EXISTS as7341_spectrum_chart_590;
+CREATE VIEW as7341_spectrum_chart_590 AS
+  SELECT * FROM as7341_spectrum_chart_all WHERE band=590;
 
-CREATE VIEW IF NOT EXISTS as7341_spectrum_readings_630 AS
-  SELECT * FROM as7341_spectrum_readings WHERE band=630;
+DROP VIEW IF EXISTS as7341_spectrum_chart_630;
+CREATE VIEW as7341_spectrum_chart_630 AS
+  SELECT * FROM as7341_spectrum_chart_all WHERE band=630;
 
-CREATE VIEW IF NOT EXISTS as7341_spectrum_readings_680 AS
-  SELECT * FROM as7341_spectrum_readings WHERE band=680;
+DROP VIEW IF EXISTS as7341_spectrum_chart_680;
+CREATE VIEW as7341_spectrum_chart_680 AS
+  SELECT * FROM as7341_spectrum_chart_all WHERE band=680;
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Non-blocking scans of the AS7341, for asyncio.
+
+The vendored driver waits for SMUX to load and for integration to finish in `time.sleep` loops, so a scan holds its
+thread for about two integrations. `AsyncAS7341` makes the same register accesses, each a short I2C transaction, but
+awaits those waits, so the event loop can process and publish results, or drive another sensor, meanwhile:
+
+    async def read_two(a: AsyncAS7341, b: AsyncAS7341):
+        return await asyncio.gather(a.read_bands(BANDS), b.read_bands(BANDS))
+
+`AcquisitionLoop` runs an event loop on its own thread, for the job's (synchronous) timers and callbacks to submit to.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from time import monotonic
+from typing import Any
+from typing import Callable
+from typing import Collection
+from typing import Coroutine
+from typing import TypeVar
+
+from spectrometer_reading_plugin.sensor import read_scan
+from spectrometer_reading_plugin.sensor import Scan
+from spectrometer_reading_plugin.sensor import scan_halves
+from spectrometer_reading_plugin.sensor import SMUX_WRITE_FROM_RAM
+
+T = TypeVar("T")
+
+
+class AsyncAS7341:
+    """
+    Awaitable scans on an AS7341 driver, or a ResilientSensor wrapping one (so each register access is retried).
+    Sensors without SMUX control (ex: a replay) are read on a worker thread instead.
+    """
+
+    def __init__(self, sensor: Any, poll_seconds: float = 0.002, timeout_seconds: float = 1.0) -> None:
+        self.sensor = sensor
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+
+    async def _wait_until(self, condition: Callable[[], bool], what: str) -> None:
+        deadline = monotonic() + self.timeout_seconds
+        while not condition():
+            if monotonic() > deadline:
+                # the driver raises the same, so callers handle both the same way.
+                raise RuntimeError(f"Timeout occurred waiting for {what}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def read_half(self, low: bool) -> tuple[int, tuple[int, ...]]:
+        """
+        Integrate one SMUX half (F1-F4, or F5-F8), and return its ASTATUS and its four band channels.
+        """
+        sensor = self.sensor
+        # as the driver's _configure_f1_f4 / _configure_f5_f8, but awaiting SMUX and the data.
+        sensor._color_meas_enabled = False
+        sensor._smux_command = SMUX_WRITE_FROM_RAM
+        if low:
+            sensor._f1f4_clear_nir()
+        else:
+            sensor._f5f8_clear_nir()
+        sensor._low_bank_active = False
+        sensor._smux_enable_bit = True
+        await self._wait_until(lambda: not sensor._smux_enable_bit, "SMUX")
+        sensor._color_meas_enabled = True
+        # the driver's record of which half is configured is stale now, so its next scan reconfigures.
+        sensor._low_channels_configured = False
+        sensor._high_channels_configured = False
+
+        await self._wait_until(lambda: sensor._data_ready_bit, "sensor data")
+        # ASTATUS and the six ADCs (4 bands, clear, NIR)
+        astatus, *reads = sensor._all_channels[:-2]
+        return astatus, tuple(reads)
+
+    async def read_scan(self, bands: Collection[int], gain: int | None = None, retake_gain: int | None = None) -> Scan:
+        """
+        As `sensor.read_scan`: the eight band channels and their quality flags, integrating only the SMUX halves
+        that `bands` fall in, and retaking a saturated half at `retake_gain`.
+        """
+        if not hasattr(self.sensor, "_f1f4_clear_nir"):
+            return await asyncio.to_thread(read_scan, self.sensor, bands, gain, retake_gain)
+
+        halves = scan_halves(self.sensor, bands, gain, retake_gain)
+        try:
+            low = next(halves)
+            while True:
+                low = halves.send(await self.read_half(low))
+        except StopIteration as done:
+            return done.value
+        finally:
+            halves.close()
+
+    async def read_bands(self, bands: Collection[int]) -> tuple[int, ...]:
+        """
+        As `sensor.read_bands`: the eight band channels, integrating only the SMUX halves that `bands` fall in.
+        """
+        return (await self.read_scan(bands)).channels
+
+
+class AcquisitionLoop:
+    """
+    An asyncio event loop on a daemon thread. `run` submits a coroutine from any other thread and waits for its result.
+    """
+
+    def __init__(self, name: str = "acquisition") -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def stop(self) -> None:
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
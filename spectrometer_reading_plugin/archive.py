@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar archives of `as7341_spectrum_readings`, for multi-month analyses that the csv export is too bulky for.
+
+    pio run spectrometer_archive readings.as7341
+
+The compact table is streamed in primary-key order, (experiment, band, unit, time), and cut into chunks of at most
+`chunk_rows` readings of a single experiment, band and unit. Each chunk stores three zlib-compressed columns:
+timestamps as a first value and int64 millisecond deltas (nearly constant, so they compress to almost nothing),
+readings as float32, and quality flags as uint8 (almost all 0). A NULL reading is stored as NaN, which sqlite can't
+store, so it's read back as None. Experiments and units are dictionary-encoded. A JSON footer indexes every chunk by experiment,
+unit, band and time range, so a reader seeks straight to the chunks it needs.
+
+Layout: MAGIC, chunks..., footer (JSON), footer length (uint64, little-endian), MAGIC.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from datetime import timezone
+from math import isnan
+from pathlib import Path
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+
+MAGIC = b"AS7341A1"
+VERSION = 2
+TRAILER = struct.Struct("<Q")
+
+
+class ArchivedReading(NamedTuple):
+    experiment: str
+    pioreactor_unit: str
+    timestamp: datetime
+    band: int
+    reading: float | None
+    flags: int
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    column = array(typecode, data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _encode_chunk(timestamps_ms: list[int], readings: list[float | None], flags: list[int]) -> tuple[bytes, bytes, bytes]:
+    deltas = array("q", [timestamps_ms[0]] + [b - a for a, b in zip(timestamps_ms, timestamps_ms[1:])])
+    values = array("f", [float("nan") if reading is None else reading for reading in readings])
+    return zlib.compress(_little_endian(deltas)), zlib.compress(_little_endian(values)), zlib.compress(bytes(flags))
+
+
+def write_archive(
+    db: sqlite3.Connection, path: str | Path, experiment: str | None = None, chunk_rows: int = 65_536
+) -> dict[str, int]:
+    """
+    Stream the readings (of one experiment, or all of them) from the leader's database into a columnar archive at
+    `path`. Only one chunk is held in memory at a time. Returns the number of readings and chunks written.
+    """
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be positive.")
+
+    experiments = dict(db.execute("SELECT experiment_id, experiment FROM as7341_experiments"))
+    units = dict(db.execute("SELECT unit_id, pioreactor_unit FROM as7341_units"))
+    experiment_index = {experiment_id: i for i, experiment_id in enumerate(experiments)}
+    unit_index = {unit_id: i for i, unit_id in enumerate(units)}
+
+    query = """
+        SELECT experiment_id, band, unit_id, timestamp_ms, r.reading, coalesce(f.flags, 0)
+        FROM as7341_spectrum_readings_compact AS r
+        LEFT JOIN as7341_spectrum_flags_compact AS f USING (experiment_id, band, unit_id, timestamp_ms)
+    """
+    parameters: tuple = ()
+    if experiment is not None:
+        query += " WHERE experiment_id = (SELECT experiment_id FROM as7341_experiments WHERE experiment = ?)"
+        parameters = (experiment,)
+    # the primary key's order, so sqlite streams the table without sorting it.
+    query += " ORDER BY experiment_id, band, unit_id, timestamp_ms"
+
+    index: list[dict] = []
+    total = 0
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+
+        key: tuple[int, int, int] | None = None
+        timestamps_ms: list[int] = []
+        readings: list[float | None] = []
+        flags: list[int] = []
+
+        def flush() -> None:
+            if not timestamps_ms:
+                return
+            assert key is not None
+            experiment_id, band, unit_id = key
+            timestamp_column, reading_column, flags_column = _encode_chunk(timestamps_ms, readings, flags)
+            index.append(
+                {
+                    "experiment": experiment_index[experiment_id],
+                    "unit": unit_index[unit_id],
+                    "band": band,
+                    "rows": len(timestamps_ms),
+                    "min_timestamp_ms": timestamps_ms[0],
+                    "max_timestamp_ms": timestamps_ms[-1],
+                    "offset": f.tell(),
+                    "timestamp_bytes": len(timestamp_column),
+                    "reading_bytes": len(reading_column),
+                    "flags_bytes": len(flags_column),
+                }
+            )
+            f.write(timestamp_column)
+            f.write(reading_column)
+            f.write(flags_column)
+            timestamps_ms.clear()
+            readings.clear()
+            flags.clear()
+
+        cursor = db.execute(query, parameters)
+        while rows := cursor.fetchmany(chunk_rows):
+            for experiment_id, band, unit_id, timestamp_ms, reading, reading_flags in rows:
+                if (experiment_id, band, unit_id) != key or len(timestamps_ms) == chunk_rows:
+                    flush()
+                    key = (experiment_id, band, unit_id)
+                timestamps_ms.append(timestamp_ms)
+                readings.append(reading)
+                flags.append(reading_flags)
+            total += len(rows)
+        flush()
+
+        footer = json.dumps(
+            {
+                "version": VERSION,
+                "experiments": list(experiments.values()),
+                "units": list(units.values()),
+                "chunks": index,
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+        f.write(footer)
+        f.write(TRAILER.pack(len(footer)))
+        f.write(MAGIC)
+
+    return {"readings": total, "chunks": len(index)}
+
+
+def read_footer(path: str | Path) -> dict:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} isn't a spectrometer archive.")
+        f.seek(-(TRAILER.size + len(MAGIC)), 2)
+        (footer_length,) = TRAILER.unpack(f.read(TRAILER.size))
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is truncated.")
+        f.seek(-(footer_length + TRAILER.size + len(MAGIC)), 2)
+        footer = json.loads(f.read(footer_length))
+
+    if footer["version"] != VERSION:
+        raise ValueError(f"Unsupported archive version {footer['version']}.")
+    return footer
+
+
+def _to_ms(timestamp: datetime | None) -> int | None:
+    return None if timestamp is None else round(timestamp.timestamp() * 1000)
+
+
+def read_archive(
+    path: str | Path,
+    units: Iterable[str] | None = None,
+    bands: Iterable[int] | None = None,
+    experiments: Iterable[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Iterator[ArchivedReading]:
+    """
+    Readings from the archive, filtered by unit, band, experiment and [start, end]. Chunks that can't match are
+    skipped using the footer's index, without being read or decompressed.
+    """
+    footer = read_footer(path)
+    unit_names = footer["units"]
+    experiment_names = footer["experiments"]
+    wanted_units = None if units is None else set(units)
+    wanted_bands = None if bands is None else set(bands)
+    wanted_experiments = None if experiments is None else set(experiments)
+    start_ms, end_ms = _to_ms(start), _to_ms(end)
+
+    with open(path, "rb") as f:
+        for chunk in footer["chunks"]:
+            unit = unit_names[chunk["unit"]]
+            experiment = experiment_names[chunk["experiment"]]
+            if wanted_units is not None and unit not in wanted_units:
+                continue
+            if wanted_bands is not None and chunk["band"] not in wanted_bands:
+                continue
+            if wanted_experiments is not None and experiment not in wanted_experiments:
+                continue
+            if start_ms is not None and chunk["max_timestamp_ms"] < start_ms:
+                continue
+            if end_ms is not None and chunk["min_timestamp_ms"] > end_ms:
+                continue
+
+            f.seek(chunk["offset"])
+            deltas = _from_little_endian("q", zlib.decompress(f.read(chunk["timestamp_bytes"])))
+            values = _from_little_endian("f", zlib.decompress(f.read(chunk["reading_bytes"])))
+            flags = zlib.decompress(f.read(chunk["flags_bytes"]))
+
+            timestamp_ms = 0
+            for delta, reading, reading_flags in zip(deltas, values, flags):
+                timestamp_ms += delta
+                if start_ms is not None and timestamp_ms < start_ms:
+                    continue
+                if end_ms is not None and timestamp_ms > end_ms:
+                    break
+                yield ArchivedReading(
+                    experiment=experiment,
+                    pioreactor_unit=unit,
+                    timestamp=datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc),
+                    band=chunk["band"],
+                    reading=None if isnan(reading) else reading,
+                    flags=reading_flags,
+                )
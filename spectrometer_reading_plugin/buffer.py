@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from array import array
+from datetime import datetime
+from datetime import timezone
+from math import sqrt
+from typing import Sequence
+
+from spectrometer_reading_plugin.structs import BandSummary
+from spectrometer_reading_plugin.structs import Spectrum
+
+
+class SpectrumBuffer:
+    """
+    Fixed-size ring buffer of the most recent scans, for quick-look queries without the leader's database.
+
+    Scans are stored in preallocated flat arrays of doubles (one timestamp and one row of readings per scan), so memory
+    is bounded at capacity * (len(bands) + 1) * 8 bytes, and appending never allocates. Scans must be appended in
+    time order.
+    """
+
+    def __init__(self, capacity: int, bands: Sequence[int]) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive.")
+
+        self.capacity = capacity
+        self.bands = tuple(bands)
+        self._timestamps = array("d", bytes(8 * capacity))  # seconds since the Unix epoch
+        self._readings = array("d", bytes(8 * capacity * len(self.bands)))
+        self._next = 0  # physical slot the next scan is written to
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: datetime, readings: Sequence[float]) -> None:
+        n_bands = len(self.bands)
+        self._timestamps[self._next] = timestamp.timestamp()
+        self._readings[self._next * n_bands : (self._next + 1) * n_bands] = array("d", readings)
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _slot(self, i: int) -> int:
+        # physical slot of the i-th oldest scan
+        return (self._next - self._size + i) % self.capacity
+
+    def _first_since(self, since: datetime | None) -> int:
+        # binary search over the logical (time-ordered) index
+        if since is None:
+            return 0
+        target = since.timestamp()
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamps[self._slot(mid)] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window(self, since: datetime | None = None, limit: int | None = None) -> list[Spectrum]:
+        """
+        Scans at or after `since`, oldest first. With `limit`, only the most recent `limit` of those.
+        """
+        start = self._first_since(since)
+        if limit is not None:
+            start = max(start, self._size - limit)
+
+        n_bands = len(self.bands)
+        spectra = []
+        for i in range(start, self._size):
+            slot = self._slot(i)
+            row = self._readings[slot * n_bands : (slot + 1) * n_bands]
+            spectra.append(
+                Spectrum(
+                    timestamp=datetime.fromtimestamp(self._timestamps[slot], tz=timezone.utc),
+                    bands=dict(zip(self.bands, row)),
+                )
+            )
+        return spectra
+
+    def summary(self, since: datetime | None = None) -> tuple[int, dict[int, BandSummary]]:
+        """
+        Number of scans at or after `since`, and the mean, (population) standard deviation, min and max of each band over them.
+        """
+        start = self._first_since(since)
+        count = self._size - start
+        if count == 0:
+            return 0, {}
+
+        n_bands = len(self.bands)
+        summaries = {}
+        for j, band in enumerate(self.bands):
+            values = [self._readings[self._slot(i) * n_bands + j] for i in range(start, self._size)]
+            mean = sum(values) / count
+            variance = sum((value - mean) ** 2 for value in values) / count
+            summaries[band] = BandSummary(mean=mean, std=sqrt(variance), min=min(values), max=max(values))
+        return count, summaries
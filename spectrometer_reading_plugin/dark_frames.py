@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Dark frames (the background recorded with every LED off) persisted on the unit, so a restarted job can start
+publishing in its first cycle instead of spending it on a new dark frame.
+
+A dark frame is only reused with the same sensor settings, so it is keyed by unit, gain, integration, LED current and
+the bands read.
+"""
+from __future__ import annotations
+
+from time import time
+from typing import cast
+from typing import Sequence
+
+from msgspec import DecodeError
+from msgspec import Struct
+from msgspec.json import decode as msgspec_loads
+from msgspec.json import encode as msgspec_dumps
+from pioreactor.utils import local_persistent_storage
+
+DARK_FRAME_CACHE_NAME = "spectrometer_dark_frame"
+
+
+class DarkFrame(Struct):
+    recorded_at: float  # seconds since the Unix epoch
+    background: list[float]
+
+
+def dark_frame_key(unit: str, gain: int, atime: int, astep: int, led_current: float, bands: Sequence[int]) -> str:
+    return f"{unit}/gain={gain}/atime={atime}/astep={astep}/led_current={led_current:g}/bands={','.join(map(str, bands))}"
+
+
+def load_dark_frame(key: str, max_age_seconds: float) -> DarkFrame | None:
+    with local_persistent_storage(DARK_FRAME_CACHE_NAME) as cache:
+        if key not in cache:
+            return None
+        try:
+            dark_frame = msgspec_loads(cast(bytes, cache[key]), type=DarkFrame)
+        except DecodeError:
+            return None
+
+    if time() - dark_frame.recorded_at > max_age_seconds:
+        return None
+    return dark_frame
+
+
+def save_dark_frame(key: str, background: list[float]) -> DarkFrame:
+    dark_frame = DarkFrame(recorded_at=time(), background=background)
+    with local_persistent_storage(DARK_FRAME_CACHE_NAME) as cache:
+        cache[key] = msgspec_dumps(dark_frame)
+    return dark_frame
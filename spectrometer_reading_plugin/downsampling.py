@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Downsampled series for the spectrometer charts, maintained incrementally by the leader as readings arrive.
+
+Charts ask for up to `lookback` hours of points, and the UI thins a series by keeping every n-th point, which drops
+exactly the spikes and steps worth seeing. Largest-Triangle-Three-Buckets keeps the point of each bucket that forms
+the largest triangle with the point kept from the previous bucket and the mean of the next bucket, so the shape of
+the series survives at a fraction of the points.
+
+Buckets of a fixed width still give a series points in proportion to its length, so the points kept are downsampled
+again into buckets LEVEL_FACTOR times wider, for LEVELS levels. The chart views read, per series, the finest level
+with at most CHART_POINTS points (see additional_sql.sql), so a chart of any length plots a bounded number of points.
+"""
+from __future__ import annotations
+
+Point = tuple[float, float]  # (seconds since the Unix epoch, reading)
+
+# with 60s buckets: 60s, 8min, 64min, ~8.5h and ~68h, so 2000 points span from ~33 hours to ~15 years.
+LEVELS = 5
+LEVEL_FACTOR = 8
+CHART_POINTS = 2000  # also in additional_sql.sql's as7341_spectrum_chart_all
+
+
+def triangle_area(a: Point, b: Point, c: Point) -> float:
+    # twice the area, which ranks candidates the same.
+    return abs((a[0] - c[0]) * (b[1] - a[1]) - (a[0] - b[0]) * (c[1] - a[1]))
+
+
+def mean_point(points: list[Point]) -> Point:
+    return sum(t for t, _ in points) / len(points), sum(y for _, y in points) / len(points)
+
+
+class BucketedLTTB:
+    """
+    LTTB over buckets of `bucket_seconds`, fed one point at a time, in time order. Keeps one point per bucket.
+
+    A bucket's point is chosen once the bucket after it is complete (the first point of the bucket after that
+    arrives), since its mean is needed. So points are returned up to two buckets late, and memory is bounded by two
+    buckets' points.
+    """
+
+    def __init__(self, bucket_seconds: float) -> None:
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive.")
+        self.bucket_seconds = bucket_seconds
+        self._kept: Point | None = None  # point kept from the bucket before `_pending`
+        self._pending: list[Point] = []  # the complete bucket waiting for the next one's mean
+        self._current: list[Point] = []
+        self._current_bucket: int | None = None
+
+    def add(self, timestamp: float, reading: float) -> Point | None:
+        """
+        Add a point, and return the point kept for a bucket if this point completed the bucket after it.
+        """
+        bucket = int(timestamp // self.bucket_seconds)
+        if self._current_bucket is None or bucket <= self._current_bucket:
+            # points late for their bucket join the current one, rather than reopening a closed bucket.
+            if self._current_bucket is None:
+                self._current_bucket = bucket
+            self._current.append((timestamp, reading))
+            return None
+
+        closed, self._current = self._current, [(timestamp, reading)]
+        self._current_bucket = bucket
+
+        if self._kept is None:
+            # like LTTB's first point, the first bucket has no previous point to form a triangle with.
+            self._kept = closed[0]
+            return self._kept
+
+        kept = None
+        if self._pending:
+            kept_before, next_mean = self._kept, mean_point(closed)
+            kept = max(self._pending, key=lambda point: triangle_area(kept_before, point, next_mean))
+            self._kept = kept
+        self._pending = closed
+        return kept
+
+
+class LevelledLTTB:
+    """
+    BucketedLTTB at `levels` bucket widths, each `factor` times the last. Each level is fed the points kept by the
+    level below it, so memory is bounded by two buckets' points per level.
+    """
+
+    def __init__(self, bucket_seconds: float, levels: int = LEVELS, factor: int = LEVEL_FACTOR) -> None:
+        self.levels = [BucketedLTTB(bucket_seconds * factor**level) for level in range(levels)]
+
+    def add(self, timestamp: float, reading: float) -> list[tuple[int, Point]]:
+        """
+        Add a point, and return the (level, point) of each point kept, finest level first.
+        """
+        kept: list[tuple[int, Point]] = []
+        point = (timestamp, reading)
+        for level, series in enumerate(self.levels):
+            coarser = series.add(*point)
+            if coarser is None:
+                break
+            point = coarser
+            kept.append((level, point))
+        return kept
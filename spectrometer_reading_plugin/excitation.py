@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Excitation sweeps: after the white-light scan, the job steps through Pioreactor LED states and takes a scan in each,
+with the onboard LED off. States are configured as
+
+    excitation_states=A:50;B:50;A:25,B:25
+
+that is, `;`-separated states of `,`-separated `channel:intensity` pairs. Channels not listed are off.
+"""
+from __future__ import annotations
+
+from pioreactor import types as pt
+
+LED_CHANNELS: tuple[pt.LedChannel, ...] = ("A", "B", "C", "D")
+
+
+def parse_excitation_states(text: str) -> list[dict[str, float]]:
+    states = []
+    for state_text in filter(None, (part.strip() for part in text.split(";"))):
+        state: dict[str, float] = {}
+        for pair in state_text.split(","):
+            channel, sep, intensity = pair.partition(":")
+            channel = channel.strip().upper()
+            if not sep or channel not in LED_CHANNELS:
+                raise ValueError(f"Can't parse `{pair.strip()}` in excitation_states. Use channel:intensity, ex: A:50.")
+            state[channel] = float(intensity)
+            if not 0 <= state[channel] <= 100:
+                raise ValueError(f"LED intensity in `{pair.strip()}` must be between 0 and 100.")
+        states.append(state)
+    return states
+
+
+def excitation_label(state: dict[str, float]) -> str:
+    # canonical, so the same state is always stored under the same label. Ex: {"B": 25, "A": 50.0} -> "A:50,B:25"
+    return ",".join(f"{channel}:{state[channel]:g}" for channel in sorted(state))
+
+
+def full_led_state(state: dict[str, float]) -> dict[pt.LedChannel, float]:
+    # every channel, so a single LED change moves from one state to the next.
+    return {channel: state.get(channel, 0.0) for channel in LED_CHANNELS}
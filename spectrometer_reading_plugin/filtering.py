@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from math import sqrt
+from statistics import median
+from typing import Sequence
+
+
+class KalmanFilter1D:
+    """
+    Scalar Kalman filter for a single band, using a random-walk model of the underlying signal:
+
+        x_t = x_{t-1} + w,   w ~ N(0, process_noise)
+        z_t = x_t + v,       v ~ N(0, measurement_noise)
+
+    Each update is O(1) in time and memory, so it can run on every scan.
+    """
+
+    def __init__(self, process_noise: float, measurement_noise: float) -> None:
+        if process_noise < 0 or measurement_noise <= 0:
+            raise ValueError("process_noise must be non-negative, and measurement_noise must be positive.")
+
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.estimate: float | None = None
+        self.variance = measurement_noise
+
+    def update(self, observation: float) -> tuple[float, float]:
+        """
+        Incorporate a new observation, and return the filtered estimate and its standard deviation.
+        """
+        if self.estimate is None:
+            # first observation: trust it as much as the sensor allows.
+            self.estimate = observation
+            self.variance = self.measurement_noise
+            return self.estimate, sqrt(self.variance)
+
+        predicted_variance = self.variance + self.process_noise
+        gain = predicted_variance / (predicted_variance + self.measurement_noise)
+
+        self.estimate = self.estimate + gain * (observation - self.estimate)
+        self.variance = (1 - gain) * predicted_variance
+        return self.estimate, sqrt(self.variance)
+
+    def reset(self) -> None:
+        self.estimate = None
+        self.variance = self.measurement_noise
+
+
+# scales the median absolute deviation to the standard deviation, for normally distributed noise.
+MAD_TO_STD = 1.4826
+
+
+def robust_mean(values: Sequence[float], threshold: float, min_scale: float = 0.0) -> tuple[float, int]:
+    """
+    Mean of `values` after rejecting outliers (ex: a bubble passing during one sub-scan): values more than `threshold`
+    robust standard deviations (MAD * 1.4826, at least `min_scale`) from the median. Returns the mean and the number
+    of rejected values. Fewer than 3 values can't identify an outlier, so they are all kept.
+    """
+    if len(values) < 3:
+        return sum(values) / len(values), 0
+
+    center = median(values)
+    scale = max(MAD_TO_STD * median(abs(value - center) for value in values), min_scale)
+    if scale == 0:
+        return center, sum(value != center for value in values)
+
+    kept = [value for value in values if abs(value - center) <= threshold * scale]
+    return sum(kept) / len(kept), len(values) - len(kept)
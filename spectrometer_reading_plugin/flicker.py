@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Ambient light flicker, from lamps on mains power, measured with the AS7341's flicker detection engine.
+
+Light from mains-powered lamps flickers at twice the mains frequency, 100 Hz or 120 Hz. An integration that covers a
+fraction of a period catches a varying part of the flicker, which is noise that only more scans average away. With
+ASTEP set so each ATIME step lasts exactly one flicker period, every integration covers whole periods, and the flicker
+averages out within each scan.
+
+Detection uses the engine's default 100 Hz / 120 Hz coefficients. (The vendored driver's
+`_configure_1k_flicker_detection` replaces them with 1000 Hz / 1200 Hz ones, for LED PWM, and writes its ~40
+registers one transaction at a time.) The 20 SMUX registers are written in a single auto-incrementing transaction.
+"""
+from __future__ import annotations
+
+from time import monotonic
+from time import sleep
+from typing import Any
+
+from spectrometer_reading_plugin.planning import INTEGRATION_STEP_SECONDS
+from spectrometer_reading_plugin.sensor import SMUX_WRITE_FROM_RAM
+
+ENABLE = 0x80
+FD_STATUS = 0xDB
+SMUX_RAM = 0x00
+
+# ENABLE bits
+PON = 0x01
+FDEN = 0x40
+
+# FD_STATUS bits. The result bits are cleared by writing 1 to them.
+FD_100HZ_DETECTED = 0x01
+FD_120HZ_DETECTED = 0x02
+FD_100HZ_VALID = 0x04
+FD_120HZ_VALID = 0x08
+FD_SATURATED = 0x10
+FD_MEASUREMENT_VALID = 0x20
+FD_RESULTS = FD_100HZ_VALID | FD_120HZ_VALID | FD_SATURATED | FD_MEASUREMENT_VALID
+
+# SMUX RAM 0x00-0x13, connecting only the flicker photodiode (to the flicker detection ADC)
+FLICKER_SMUX = bytes(19) + b"\x60"
+
+
+def decode_flicker_status(status: int) -> int | None:
+    """
+    The flicker frequency in Hz from FD_STATUS: 100, 120, or 0 for no flicker. None if the measurement isn't
+    finished, or saturated.
+    """
+    if not status & FD_MEASUREMENT_VALID or status & FD_SATURATED:
+        return None
+    if status & FD_100HZ_VALID and status & FD_100HZ_DETECTED:
+        return 100
+    if status & FD_120HZ_VALID and status & FD_120HZ_DETECTED:
+        return 120
+    if status & FD_100HZ_VALID and status & FD_120HZ_VALID:
+        return 0
+    return None
+
+
+def detect_mains_flicker(sensor: Any, timeout_seconds: float = 0.5, poll_seconds: float = 0.02) -> int | None:
+    """
+    Measure the ambient flicker frequency, see `decode_flicker_status`. The spectral measurement is stopped while
+    detecting, and the next scan reconfigures SMUX for the bands, so call this between scans, with the LEDs off.
+    """
+    # flicker detection and spectral measurement share the SMUX, so stop measuring first.
+    sensor._write_register(ENABLE, PON)
+    sensor._smux_command = SMUX_WRITE_FROM_RAM
+    with sensor.i2c_device as i2c:
+        i2c.write(bytes([SMUX_RAM]) + FLICKER_SMUX)
+    sensor._smux_enabled = True  # waits until SMUX has loaded the configuration
+
+    sensor._write_register(FD_STATUS, FD_RESULTS)
+    sensor._write_register(ENABLE, PON | FDEN)
+    status = 0
+    try:
+        deadline = monotonic() + timeout_seconds
+        while monotonic() < deadline:
+            sleep(poll_seconds)
+            status = sensor._fd_status
+            if status & FD_MEASUREMENT_VALID:
+                break
+    finally:
+        sensor._write_register(ENABLE, PON)
+        sensor._low_channels_configured = False
+        sensor._high_channels_configured = False
+
+    return decode_flicker_status(status)
+
+
+def flicker_astep(flicker_hz: float) -> int:
+    # ASTEP such that one ATIME step, (ASTEP + 1) * 2.78µs, is one flicker period.
+    return round(1 / (flicker_hz * INTEGRATION_STEP_SECONDS)) - 1
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Fit spectrometer scans into the time available between OD readings.
+
+A scan integrates once per SMUX half it reads (F1-F4, then F5-F8, unless only bands of one half are used), and each
+integration lasts (ATIME + 1) * (ASTEP + 1) * 2.78µs. Around the scan, the Pioreactor LEDs and onboard LED are switched.
+"""
+from __future__ import annotations
+
+from math import floor
+from typing import NamedTuple
+
+INTEGRATION_STEP_SECONDS = 2.78e-6
+DEFAULT_ASTEP = 999
+MAX_ATIME = 255
+SMUX_OVERHEAD_SECONDS = 0.010  # per half: writing the 20 SMUX registers and waiting for the SMUX command.
+
+
+class IntegrationBudgetError(ValueError):
+    pass
+
+
+class IntegrationPlan(NamedTuple):
+    atime: int
+    astep: int
+    burst_scans: int
+    window_seconds: float  # time available for LED switching and scans
+    duration_seconds: float  # time the planned scans are expected to take, including LED switching
+
+    @property
+    def integration_seconds(self) -> float:
+        return integration_seconds(self.atime, self.astep)
+
+
+def integration_seconds(atime: int, astep: int) -> float:
+    return (atime + 1) * (astep + 1) * INTEGRATION_STEP_SECONDS
+
+
+def scan_seconds(atime: int, astep: int, halves: int = 2) -> float:
+    return halves * (integration_seconds(atime, astep) + SMUX_OVERHEAD_SECONDS)
+
+
+def available_window(samples_per_second: float, od_duration: float, pre_delay: float, post_delay: float) -> float:
+    """
+    Seconds between the end of `post_delay` after one OD reading, and the start of `pre_delay` before the next.
+    """
+    return 1.0 / samples_per_second - od_duration - pre_delay - post_delay
+
+
+def plan_integration(
+    window_seconds: float,
+    led_switching_seconds: float,
+    max_integration_seconds: float,
+    max_burst_scans: int = 1,
+    extra_scans: int = 0,
+    halves: int = 2,
+    astep: int = DEFAULT_ASTEP,
+) -> IntegrationPlan:
+    """
+    Choose ATIME (with ASTEP fixed, by default at 2.78ms per step) and the number of back-to-back scans, so that
+    the total integration is as large as possible while everything fits in `window_seconds`.
+
+    `extra_scans` are scans at the same integration that must also fit, ex: an excitation sweep after the burst.
+    `halves` is the number of SMUX halves each scan integrates. `astep` sets the length of an ATIME step, ex: one
+    flicker period.
+    Integrations longer than `max_integration_seconds` aren't used, since the ADC saturates. If even the shortest
+    integration doesn't fit, raise IntegrationBudgetError.
+    """
+    step = (astep + 1) * INTEGRATION_STEP_SECONDS
+    longest_atime = min(MAX_ATIME, max(0, floor(max_integration_seconds / step + 1e-9) - 1))
+    scan_budget = window_seconds - led_switching_seconds
+
+    shortest = (1 + extra_scans) * scan_seconds(0, astep, halves)
+    if scan_budget < shortest:
+        raise IntegrationBudgetError(
+            f"{1 + extra_scans} spectrometer scan(s) need at least {shortest + led_switching_seconds:.3f}s, but only {window_seconds:.3f}s is available between OD readings."
+        )
+
+    burst_scans = max(1, min(max_burst_scans, floor(scan_budget / scan_seconds(longest_atime, astep, halves)) - extra_scans))
+    total_scans = burst_scans + extra_scans
+
+    # shorten the integration, if needed, so all the scans fit.
+    per_half = scan_budget / total_scans / halves - SMUX_OVERHEAD_SECONDS
+    atime = min(longest_atime, floor(per_half / step + 1e-9) - 1)
+
+    return IntegrationPlan(
+        atime=atime,
+        astep=astep,
+        burst_scans=burst_scans,
+        window_seconds=window_seconds,
+        duration_seconds=led_switching_seconds + total_scans * scan_seconds(atime, astep, halves),
+    )
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in profiling of a running `spectrometer_reading` job, for slow cycles or memory that creeps up over weeks.
+
+Turn it on with `profile=1` in `[spectrometer_reading.config]`, or SPECTROMETER_PROFILE=1 in the job's environment.
+Every `profile_interval_minutes`, the job writes:
+
+ - profile-<time>.pstats: cProfile of the scan cycle and publishing over the interval. Open with `python -m pstats`,
+   or snakeviz.
+ - memory-<time>.txt: the lines holding the most memory, from a tracemalloc snapshot, and how much each grew since
+   the previous snapshot.
+
+to `<Pioreactor data dir>/profiling/spectrometer_reading/`, keeping the newest `profile_keep_files` of each.
+
+When profiling is off, nothing is wrapped or traced, so there's no overhead.
+"""
+from __future__ import annotations
+
+import cProfile
+import os
+import threading
+import tracemalloc
+from datetime import datetime
+from datetime import timezone
+from functools import wraps
+from pathlib import Path
+from time import monotonic
+from typing import Any
+from typing import Callable
+
+from pioreactor.config import config
+from pioreactor.paths import get_dot_pioreactor_path
+
+TOP_LINES = 25
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get("SPECTROMETER_PROFILE", "") == "1" or config.getboolean(
+        "spectrometer_reading.config", "profile", fallback=False
+    )
+
+
+def profiling_directory(job_name: str) -> Path:
+    return get_dot_pioreactor_path() / "profiling" / job_name
+
+
+class JobProfiler:
+    """
+    cProfile's the functions passed to `wrap`, and writes the profile and a tracemalloc snapshot every
+    `interval_seconds`, checked when a wrapped function returns.
+
+    Calls nested inside a wrapped function (ex: publishing during a scan) are part of the outer call's profile.
+    """
+
+    def __init__(self, directory: Path, interval_seconds: float, keep: int = 24, tracemalloc_frames: int = 1) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.interval_seconds = interval_seconds
+        self.keep = keep
+
+        self._profile = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._depth = threading.local()
+        self._next_write_at = monotonic() + interval_seconds
+        self._previous_snapshot: tracemalloc.Snapshot | None = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(tracemalloc_frames)
+
+    def wrap(self, function: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(function)
+        def profiled(*args: Any, **kwargs: Any) -> Any:
+            depth = getattr(self._depth, "value", 0)
+            if depth:
+                # already inside a profiled call on this thread
+                return function(*args, **kwargs)
+
+            if not self._lock.acquire(blocking=False):
+                # cProfile allows one active profiler at a time. Rather than block (ex: an MQTT callback publishing
+                # during a scan), a call on another thread goes unprofiled.
+                return function(*args, **kwargs)
+
+            self._depth.value = 1
+            self._profile.enable()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._profile.disable()
+                self._depth.value = 0
+                if monotonic() >= self._next_write_at:
+                    self.write()
+                self._lock.release()
+
+        return profiled
+
+    def write(self) -> None:
+        # call while holding self._lock, or after profiling stopped.
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+        self._profile.dump_stats(self.directory / f"profile-{stamp}.pstats")
+        self._profile = cProfile.Profile()  # each file covers one interval
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced memory: {current / 1024:,.0f} KiB (peak {peak / 1024:,.0f} KiB)", ""]
+        if self._previous_snapshot is None:
+            lines += [str(stat) for stat in snapshot.statistics("lineno")[:TOP_LINES]]
+        else:
+            lines += [str(stat) for stat in snapshot.compare_to(self._previous_snapshot, "lineno")[:TOP_LINES]]
+        (self.directory / f"memory-{stamp}.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        self._previous_snapshot = snapshot
+
+        self._next_write_at = monotonic() + self.interval_seconds
+        self.rotate()
+
+    def rotate(self) -> None:
+        for pattern in ("profile-*.pstats", "memory-*.txt"):
+            # the timestamped names sort oldest first
+            for old in sorted(self.directory.glob(pattern))[: -self.keep]:
+                old.unlink(missing_ok=True)
+
+    def stop(self) -> None:
+        with self._lock:
+            self.write()
+        tracemalloc.stop()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Drive `SpectrometerReading` from recorded spectra instead of hardware.
+
+    pio run spectrometer_reading --replay export.zip --replay-speed 10
+
+Recordings are exports of the `as7341_spectrum_readings` dataset (a zip, or the csv inside it).
+"""
+from __future__ import annotations
+
+import csv
+import io
+import statistics
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from time import monotonic
+from time import sleep
+from typing import Iterable
+from typing import NamedTuple
+
+from spectrometer_reading_plugin import BANDS
+
+
+class RecordedScan(NamedTuple):
+    timestamp: datetime
+    readings: tuple[float, ...]  # background-subtracted, normalized readings in band order
+
+
+def read_recorded_scans(path: str | Path, unit: str | None = None, experiment: str | None = None) -> list[RecordedScan]:
+    """
+    Read a long-format `as7341_spectrum_readings` export (one row per band) and group the rows into scans.
+    """
+    path = Path(path)
+    if path.suffix == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            names = [name for name in archive.namelist() if name.endswith(".csv") and "as7341_spectrum_readings" in name]
+            if not names:
+                raise ValueError(f"No as7341_spectrum_readings csv found in {path}.")
+            with archive.open(names[0]) as f:
+                return _group_rows_into_scans(csv.DictReader(io.TextIOWrapper(f, encoding="utf-8")), unit, experiment)
+    else:
+        with path.open(newline="", encoding="utf-8") as f:
+            return _group_rows_into_scans(csv.DictReader(f), unit, experiment)
+
+
+def _group_rows_into_scans(rows: Iterable[dict[str, str]], unit: str | None, experiment: str | None) -> list[RecordedScan]:
+    scans: dict[tuple[str, str], dict[int, float]] = defaultdict(dict)
+    for row in rows:
+        if unit is not None and row["pioreactor_unit"] != unit:
+            continue
+        if experiment is not None and row["experiment"] != experiment:
+            continue
+        scans[(row["pioreactor_unit"], row["timestamp"])][int(row["band"])] = float(row["reading"])
+
+    units = {unit_ for unit_, _ in scans}
+    if len(units) > 1:
+        raise ValueError(f"Recording has scans from several units, {sorted(units)}. Choose one to replay.")
+
+    return sorted(
+        (
+            RecordedScan(datetime.fromisoformat(timestamp), tuple(bands.get(band, 0.0) for band in BANDS))
+            for (_, timestamp), bands in scans.items()
+        ),
+        key=lambda scan: scan.timestamp,
+    )
+
+
+class ReplayAS7341:
+    """
+    A stand-in for `adafruit_as7341.AS7341` that returns recorded scans, paced by their recorded timestamps.
+
+    Recordings are already background-subtracted, so reads with the onboard LED off (the dark frame) return zeros,
+    and reads with the LED on return the next recorded scan, converted back to raw counts using the current gain
+    and integration settings. A read blocks until the scan is due: the gap between recorded scans divided by `speed`.
+    """
+
+    def __init__(self, scans: list[RecordedScan], speed: float = 1.0, loop: bool = False) -> None:
+        if not scans:
+            raise ValueError("No scans to replay.")
+        if speed <= 0:
+            raise ValueError("speed must be positive.")
+
+        self.scans = scans
+        self.speed = speed
+        self.loop = loop
+
+        self.led_current: float = 4.0
+        self.gain: int = 10
+        self.atime: int = 100
+        self.astep: int = 999
+        self.led: bool = False
+
+        self._position = 0
+        self._started_at: float | None = None
+        self._loop_offset = 0.0  # seconds of recording already played in previous loops
+
+    @classmethod
+    def from_recording(
+        cls, path: str | Path, speed: float = 1.0, unit: str | None = None, experiment: str | None = None, loop: bool = False
+    ) -> ReplayAS7341:
+        return cls(read_recorded_scans(path, unit=unit, experiment=experiment), speed=speed, loop=loop)
+
+    @property
+    def exhausted(self) -> bool:
+        return self._position >= len(self.scans) and not self.loop
+
+    @property
+    def recorded_interval(self) -> float:
+        # typical seconds between recorded scans
+        if len(self.scans) < 2:
+            return 1.0
+        gaps = [(b.timestamp - a.timestamp).total_seconds() for a, b in zip(self.scans, self.scans[1:])]
+        return max(statistics.median(gaps), 1e-3)
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.speed / self.recorded_interval
+
+    @property
+    def all_channels(self) -> tuple[float, ...]:
+        if not self.led:
+            return (0.0,) * len(BANDS)
+
+        if self._position >= len(self.scans):
+            if not self.loop:
+                raise RuntimeError("Replay has no more recorded scans.")
+            self._loop_offset += self._recorded_seconds(self.scans[-1]) + self.recorded_interval
+            self._position = 0
+
+        scan = self.scans[self._position]
+        self._position += 1
+        self._wait_until_due(scan)
+
+        # undo SpectrometerReading.normalize_by_gain_time
+        scale = 2 ** (self.gain - 1) * (self.atime + 1) * (self.astep + 1) / 1010
+        return tuple(reading * scale for reading in scan.readings)
+
+    def _recorded_seconds(self, scan: RecordedScan) -> float:
+        return (scan.timestamp - self.scans[0].timestamp).total_seconds()
+
+    def _wait_until_due(self, scan: RecordedScan) -> None:
+        if self._started_at is None:
+            self._started_at = monotonic()
+            return
+        due_at = self._started_at + (self._loop_offset + self._recorded_seconds(scan)) / self.speed
+        sleep(max(0.0, due_at - monotonic()))
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from time import sleep
+from typing import Any
+from typing import Callable
+from typing import Collection
+from typing import Generator
+from typing import Iterable
+from typing import NamedTuple
+from typing import Sequence
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# I2C faults surface as OSError from the bus, or RuntimeError when the sensor never reports data ready.
+TRANSIENT_ERRORS = (OSError, RuntimeError)
+
+# the AS7341 integrates four bands at a time, through one of two SMUX configurations.
+LOW_HALF_BANDS = (415, 445, 480, 515)  # F1-F4
+HIGH_HALF_BANDS = (555, 590, 630, 680)  # F5-F8
+# the SMUX command that loads a configuration from SMUX RAM, ex: one written there directly, rather than by the driver.
+SMUX_WRITE_FROM_RAM = 2
+
+# ASTATUS, read along with each half's channels: bit 7 is set if any of the half's ADCs saturated (analog or
+# digital), and bits 0-3 are the gain the half was integrated at.
+ASTATUS_SATURATED = 0x80
+ASTATUS_GAIN = 0x0F
+FULL_SCALE = 2**16 - 1
+
+# per-band quality flags, published with each spectrum and stored with each reading. 0 is a good reading.
+SATURATED = 1  # the band's half saturated, or the band is at full scale
+INVALID = 2  # the band's half was integrated at a different gain than set, ex: the sensor reset mid-scan
+RETAKEN = 4  # the band's half saturated, and was integrated again at a lower gain, scaled to the set gain
+
+
+class ResilientSensor:
+    """
+    Wraps an AS7341 driver so transient I2C errors don't cost a scan, or the job.
+
+    Every attribute access and method call on the driver is retried up to `retries` times, with exponential backoff.
+    After `reinitialize_after` consecutive failures, the sensor is re-initialized and the settings we've written to
+    it (gain, integration, LED) are written again, since a brown-out or bus reset may have cleared them. Reads of
+    those settings are served from that shadow copy, saving a bus transaction each.
+
+    `on_error` is called with the counters after every failure, so callers can publish them.
+    """
+
+    SHADOWED_SETTINGS = ("gain", "atime", "astep", "led_current", "led")
+
+    def __init__(
+        self,
+        sensor: Any,
+        retries: int = 3,
+        backoff_seconds: float = 0.05,
+        reinitialize_after: int = 3,
+        on_error: Callable[[ResilientSensor], None] | None = None,
+    ) -> None:
+        object.__setattr__(self, "_sensor", sensor)
+        object.__setattr__(self, "_shadow", {})
+        object.__setattr__(self, "retries", retries)
+        object.__setattr__(self, "backoff_seconds", backoff_seconds)
+        object.__setattr__(self, "reinitialize_after", reinitialize_after)
+        object.__setattr__(self, "on_error", on_error)
+        object.__setattr__(self, "errors", 0)
+        object.__setattr__(self, "retried", 0)
+        object.__setattr__(self, "reinitializations", 0)
+        object.__setattr__(self, "_consecutive_errors", 0)
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for names that aren't on the wrapper itself
+        if name in self._shadow:
+            return self._shadow[name]
+        value = self.call(lambda: getattr(self._sensor, name))
+        if callable(value):
+            return lambda *args, **kwargs: self.call(lambda: value(*args, **kwargs))
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in self.SHADOWED_SETTINGS:
+            self._shadow[name] = value
+        self.call(lambda: setattr(self._sensor, name, value))
+
+    def call(self, function: Callable[[], T]) -> T:
+        for attempt in range(self.retries + 1):
+            try:
+                result = function()
+            except TRANSIENT_ERRORS:
+                self._record_error()
+                if attempt == self.retries:
+                    raise
+                object.__setattr__(self, "retried", self.retried + 1)
+                sleep(self.backoff_seconds * 2**attempt)
+                if self._consecutive_errors >= self.reinitialize_after:
+                    self._reinitialize()
+            else:
+                object.__setattr__(self, "_consecutive_errors", 0)
+                return result
+        raise AssertionError("unreachable")
+
+    def _record_error(self) -> None:
+        object.__setattr__(self, "errors", self.errors + 1)
+        object.__setattr__(self, "_consecutive_errors", self._consecutive_errors + 1)
+        if self.on_error is not None:
+            self.on_error(self)
+
+    def _reinitialize(self) -> None:
+        object.__setattr__(self, "_consecutive_errors", 0)
+        object.__setattr__(self, "reinitializations", self.reinitializations + 1)
+        try:
+            self._sensor.initialize()
+            # the driver caches which SMUX half is configured, but the sensor may have lost it.
+            for flag in ("_low_channels_configured", "_high_channels_configured", "_flicker_detection_1k_configured"):
+                if hasattr(self._sensor, flag):
+                    setattr(self._sensor, flag, False)
+            for name, value in self._shadow.items():
+                setattr(self._sensor, name, value)
+        except TRANSIENT_ERRORS:
+            # still failing; the next retry (or re-initialization) will try again.
+            self._record_error()
+
+
+class Scan(NamedTuple):
+    channels: tuple[int, ...]  # the eight band channels, in band order
+    flags: tuple[int, ...]  # each band's quality flags
+
+
+def smux_halves(bands: Collection[int]) -> int:
+    return any(band in LOW_HALF_BANDS for band in bands) + any(band in HIGH_HALF_BANDS for band in bands)
+
+
+def half_flags(astatus: int, reads: Sequence[int], gain: int | None = None) -> tuple[int, ...]:
+    flags = SATURATED if astatus & ASTATUS_SATURATED else 0
+    if gain is not None and astatus & ASTATUS_GAIN != gain:
+        flags |= INVALID
+    return tuple(flags | (SATURATED if read >= FULL_SCALE else 0) for read in reads)
+
+
+def read_half(sensor: Any, low: bool) -> tuple[int, tuple[int, ...]]:
+    """
+    Integrate one SMUX half (F1-F4, or F5-F8), and return its ASTATUS and its four band channels.
+    """
+    # the driver only reconfigures SMUX when switching halves. Forcing it, like `all_channels` does every scan,
+    # restarts integration, so the reading can't have started before an LED change.
+    if low:
+        sensor._low_channels_configured = False
+        sensor._configure_f1_f4()
+    else:
+        sensor._high_channels_configured = False
+        sensor._configure_f5_f8()
+    # ASTATUS and the six ADCs (4 bands, clear, NIR), in one read
+    astatus, *reads = sensor._all_channels[:-2]
+    return astatus, tuple(reads)
+
+
+def scan_halves(
+    sensor: Any, bands: Collection[int], gain: int | None = None, retake_gain: int | None = None
+) -> Generator[bool, tuple[int, tuple[int, ...]], Scan]:
+    """
+    A scan, less the integrations, for `read_scan` and `aio.AsyncAS7341.read_scan`, which differ only in how they wait
+    on the sensor. Yields each SMUX half to integrate (True for F1-F4), is sent that half's ASTATUS and channels, and
+    returns the Scan.
+    """
+    channels: tuple[int, ...] = ()
+    flags: tuple[int, ...] = ()
+    for low, half in ((True, LOW_HALF_BANDS), (False, HIGH_HALF_BANDS)):
+        if not any(band in half for band in bands):
+            channels += (0,) * 4
+            flags += (0,) * 4
+            continue
+
+        astatus, reads = yield low
+        reads_flags = half_flags(astatus, reads, gain)
+        if gain is not None and retake_gain is not None and any(flag & SATURATED for flag in reads_flags):
+            sensor.gain = retake_gain
+            try:
+                astatus, reads = yield low
+            finally:
+                sensor.gain = gain
+            reads_flags = tuple(flag | RETAKEN for flag in half_flags(astatus, reads, retake_gain))
+            # each gain step doubles the counts, so the retaken channels are scaled back to `gain`.
+            reads = tuple(read * 2 ** (gain - retake_gain) for read in reads)
+        channels += reads
+        flags += reads_flags
+    return Scan(channels, flags)
+
+
+def read_scan(sensor: Any, bands: Collection[int], gain: int | None = None, retake_gain: int | None = None) -> Scan:
+    """
+    The eight band channels, in band order, and their quality flags, integrating only the SMUX halves that `bands`
+    fall in. A half that isn't read is zeros, unflagged. The flags come from the ASTATUS byte that's read with each
+    half's channels, and that the driver's `all_channels` discards, so they cost no bus transactions.
+
+    With `gain` (the gain set) and `retake_gain`, a saturated half is integrated again at `retake_gain`.
+    Sensors without SMUX control (ex: a replay) read both halves, and only channels at full scale are flagged.
+    """
+    if not hasattr(sensor, "_configure_f1_f4"):
+        channels = tuple(sensor.all_channels)
+        return Scan(channels, tuple(SATURATED if channel >= FULL_SCALE else 0 for channel in channels))
+
+    halves = scan_halves(sensor, bands, gain, retake_gain)
+    try:
+        low = next(halves)
+        while True:
+            low = halves.send(read_half(sensor, low))
+    except StopIteration as done:
+        return done.value
+    finally:
+        # if a read failed, restores the gain of a retake
+        halves.close()
+
+
+def band_flags(scans: Iterable[Scan], bands: Collection[int]) -> dict[int, int]:
+    """
+    The flags of each band in `bands` that any of `scans` flagged, ex: for a Spectrum. Sparse, like the table they're
+    stored in: bands without flags are good readings.
+    """
+    flags = [0] * 8
+    for scan in scans:
+        flags = [flag | scan_flag for flag, scan_flag in zip(flags, scan.flags)]
+    return {band: flag for band, flag in zip(LOW_HALF_BANDS + HIGH_HALF_BANDS, flags) if band in bands and flag}
+
+
+def read_bands(sensor: Any, bands: Collection[int]) -> tuple[int, ...]:
+    """
+    The eight band channels, in band order, integrating only the SMUX halves that `bands` fall in. A half that isn't
+    read is zeros. Sensors without SMUX control (ex: a replay) read both halves.
+    """
+    return read_scan(sensor, bands).channels
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+A single spectrum, without starting the `spectrometer_reading` job:
+
+    pio run spectrometer_snapshot --scans 3
+
+The sensor is read directly: no MQTT connection (unless `--publish`), no LED or OD coordination, and no waiting
+for a timer. So it refuses to run alongside od_reading. The Pioreactor's LED channels aren't changed, so turn off other
+light sources first if they'd interfere.
+"""
+from __future__ import annotations
+
+from typing import Any
+from typing import Collection
+
+from pioreactor.utils.timing import current_utc_datetime
+
+from spectrometer_reading_plugin import BANDS
+from spectrometer_reading_plugin import normalize_by_gain_time
+from spectrometer_reading_plugin.sensor import band_flags
+from spectrometer_reading_plugin.sensor import read_scan
+from spectrometer_reading_plugin.sensor import Scan
+from spectrometer_reading_plugin.structs import Spectrum
+
+
+def average_scans(sensor: Any, scans: int, bands: Collection[int] = BANDS) -> tuple[list[float], list[Scan]]:
+    # like the job, the SMUX half that no band in the mask needs isn't integrated, and each scan is flagged.
+    raw_scans = [read_scan(sensor, bands, sensor.gain) for _ in range(scans)]
+    return [sum(readings) / scans for readings in zip(*(scan.channels for scan in raw_scans))], raw_scans
+
+
+def take_snapshot(sensor: Any, scans: int = 1, use_led: bool = True, bands: Collection[int] = BANDS) -> Spectrum:
+    """
+    Average `scans` dark scans (onboard LED off) and `scans` lit scans, and return the background-subtracted,
+    normalized spectrum of `bands`, stamped with the midpoint of the lit scans.
+    """
+    sensor.led = False
+    dark, dark_scans = average_scans(sensor, scans, bands)
+    dark = normalize_by_gain_time(dark, sensor.gain, sensor.atime, sensor.astep)
+
+    sensor.led = use_led
+    try:
+        started_at = current_utc_datetime()
+        lit, lit_scans = average_scans(sensor, scans, bands)
+        lit = normalize_by_gain_time(lit, sensor.gain, sensor.atime, sensor.astep)
+        ended_at = current_utc_datetime()
+    finally:
+        sensor.led = False
+
+    return Spectrum(
+        timestamp=started_at + (ended_at - started_at) / 2,
+        bands={band: lit_ - dark_ for band, lit_, dark_ in zip(BANDS, lit, dark) if band in bands},
+        # as the job's: a band is flagged if any of its scans, dark or lit, was.
+        flags=band_flags(dark_scans + lit_scans, bands),
+    )
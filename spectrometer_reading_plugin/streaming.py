@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Leader-side ingestion of spectrometer readings. This is only imported by the leader's `mqtt_to_db_streaming` process.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from datetime import timezone
+from functools import lru_cache
+
+from msgspec.json import Decoder
+from pioreactor import types as pt
+from pioreactor.background_jobs.leader.mqtt_to_db_streaming import register_source_to_sink
+from pioreactor.background_jobs.leader.mqtt_to_db_streaming import TopicToParserToTable
+from pioreactor.config import config
+from pioreactor.utils.timing import to_iso_format
+
+from spectrometer_reading_plugin.downsampling import LevelledLTTB
+from spectrometer_reading_plugin.structs import ExcitationSweep
+from spectrometer_reading_plugin.structs import Spectrum
+
+# built once, instead of looking up the decoder for the type on every message.
+decode_spectrum = Decoder(Spectrum).decode
+
+
+@lru_cache(maxsize=256)
+def topic_metadata(topic: str) -> tuple[str, str]:
+    # pioreactor/<unit>/<experiment>/spectrometer_reading/spectrum. A leader sees few distinct topics, so cache them.
+    _, unit, experiment, _ = topic.split("/", 3)
+    return experiment, unit
+
+
+def parser(topic: str, payload: pt.MQTTMessagePayload) -> list[dict]:
+    # one message per scan: the topic is parsed once, and all bands share the acquisition timestamp.
+    experiment, unit = topic_metadata(topic)
+    spectrum = decode_spectrum(payload)
+    # formatted once here, rather than by sqlite's datetime adapter for each of the rows.
+    timestamp = to_iso_format(spectrum.timestamp)
+
+    return [
+        {
+            "experiment": experiment,
+            "pioreactor_unit": unit,
+            "timestamp": timestamp,
+            "reading": reading,
+            "band": band,
+            "flags": spectrum.flags.get(band, 0),
+        }
+        for band, reading in spectrum.bands.items()
+    ]
+
+
+def scan_parser(topic: str, payload: pt.MQTTMessagePayload) -> dict:
+    # one row per scan: the as7341_spectrum_od_all trigger pairs it with the unit's latest OD readings.
+    experiment, unit = topic_metadata(topic)
+    return {
+        "experiment": experiment,
+        "pioreactor_unit": unit,
+        "timestamp": to_iso_format(decode_spectrum(payload).timestamp),
+    }
+
+
+# one downsampler per (experiment, unit, band). After a restart of mqtt_to_db_streaming, the buckets in flight are lost.
+chart_series: dict[tuple[str, str, int], LevelledLTTB] = {}
+
+
+def drop_finished_series(experiment: str, unit: str) -> None:
+    # a unit runs one experiment at a time, so once it publishes to another, its earlier series are done.
+    for key in [key for key in chart_series if key[1] == unit and key[0] != experiment]:
+        del chart_series[key]
+
+
+def chart_parser(topic: str, payload: pt.MQTTMessagePayload) -> list[dict] | None:
+    experiment, unit = topic_metadata(topic)
+    spectrum = decode_spectrum(payload)
+    timestamp = spectrum.timestamp.timestamp()
+
+    rows = []
+    for band, reading in spectrum.bands.items():
+        series = chart_series.get((experiment, unit, band))
+        if series is None:
+            drop_finished_series(experiment, unit)
+            series = chart_series[(experiment, unit, band)] = LevelledLTTB(
+                config.getfloat("spectrometer_reading.config", "chart_bucket_seconds", fallback=60.0)
+            )
+        for level, (kept_at, kept_reading) in series.add(timestamp, reading):
+            rows.append(
+                {
+                    "experiment": experiment,
+                    "pioreactor_unit": unit,
+                    "timestamp": to_iso_format(datetime.fromtimestamp(kept_at, tz=timezone.utc)),
+                    "reading": kept_reading,
+                    "band": band,
+                    "level": level,
+                }
+            )
+    # most scans complete no bucket, and None skips the insert.
+    return rows or None
+
+
+decode_excitation_sweep = Decoder(ExcitationSweep).decode
+
+
+def excitation_parser(topic: str, payload: pt.MQTTMessagePayload) -> list[dict]:
+    experiment, unit = topic_metadata(topic)
+    sweep = decode_excitation_sweep(payload)
+
+    return [
+        {
+            "experiment": experiment,
+            "pioreactor_unit": unit,
+            "timestamp": to_iso_format(scan.timestamp),
+            "excitation": scan.excitation,
+            "reading": reading,
+            "band": band,
+        }
+        for scan in sweep.scans
+        for band, reading in scan.bands.items()
+    ]
+
+
+def register_sinks() -> list[TopicToParserToTable]:
+    return register_source_to_sink(
+        [
+            TopicToParserToTable(
+                "pioreactor/+/+/spectrometer_reading/spectrum",
+                parser,
+                "as7341_spectrum_readings_all",
+            ),
+            TopicToParserToTable(
+                "pioreactor/+/+/spectrometer_reading/spectrum",
+                chart_parser,
+                "as7341_spectrum_chart_all",
+            ),
+            TopicToParserToTable(
+                "pioreactor/+/+/spectrometer_reading/spectrum",
+                scan_parser,
+                "as7341_spectrum_od_all",
+            ),
+            # absorbance is published as a Spectrum too, so it's parsed the same way.
+            TopicToParserToTable(
+                "pioreactor/+/+/spectrometer_reading/absorbance",
+                parser,
+                "as7341_absorbance_readings_all",
+            ),
+            TopicToParserToTable(
+                "pioreactor/+/+/spectrometer_reading/excitation_sweep",
+                excitation_parser,
+                "as7341_excitation_readings_all",
+            ),
+        ]
+    )
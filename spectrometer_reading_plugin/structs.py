@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import typing as t
+from datetime import datetime
+
+from msgspec import Meta
+from pioreactor.structs import JSONPrintedStruct
+
+
+class Spectrum(JSONPrintedStruct):
+    """
+    One scan of the AS7341. `timestamp` is when the sensor integrated, not when the message was processed.
+    """
+
+    timestamp: t.Annotated[datetime, Meta(tz=True)]
+    bands: dict[int, float]
+    flags: dict[int, int] = {}  # quality flags of the bands that have any, see sensor.py. Other bands are good readings.
+
+
+class BandSummary(JSONPrintedStruct):
+    mean: float
+    std: float
+    min: float
+    max: float
+
+
+class RecentSpectraRequest(JSONPrintedStruct):
+    """
+    Published to `.../spectrometer_reading/recent_spectra/request`. All fields are optional.
+    """
+
+    seconds: t.Optional[float] = None  # only scans from the last `seconds`
+    limit: t.Optional[int] = None  # only the most recent `limit` scans
+    summary: bool = False  # per-band summary statistics instead of the scans
+    request_id: t.Optional[str] = None  # echoed in the response
+
+
+class RecentSpectra(JSONPrintedStruct):
+    """
+    Published to `.../spectrometer_reading/recent_spectra/response` in reply to a RecentSpectraRequest.
+    """
+
+    request_id: t.Optional[str]
+    count: int
+    spectra: list[Spectrum]
+    summary: dict[int, BandSummary]
+
+
+class ExcitationScan(JSONPrintedStruct):
+    timestamp: t.Annotated[datetime, Meta(tz=True)]
+    excitation: str  # ex: "A:50,B:25", see excitation.excitation_label
+    bands: dict[int, float]
+
+
+class ExcitationSweep(JSONPrintedStruct):
+    """
+    The scans of one excitation sweep, published together.
+    """
+
+    scans: list[ExcitationScan]
@@ -24,6 +24,10 @@ broker_address=127.0.0.1
 log_file={log_file_path}
 console_log_level=DEBUG
 
+[storage]
+temporary_cache={global_config_path.parent / "local_intermittent_pioreactor_metadata.sqlite"}
+persistent_cache={global_config_path.parent / "local_persistent_pioreactor_metadata.sqlite"}
+
 [od_reading.config]
 samples_per_second=0.2
 
@@ -72,6 +76,7 @@ def plugin_module(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
             self.led_current: float = 0.0
             self.gain: int = 10
             self.atime: int = 100
+            self.astep: int = 999
             self.led: bool = False
             self._channels: list[int] = [0] * 8
 
@@ -87,6 +92,10 @@ def plugin_module(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
         cached = getattr(config_module, cache_name, None)
         if cached is not None and hasattr(cached, "cache_clear"):
             cached.cache_clear()
+    # give each test a fresh config, so values set in one test don't leak into the next
+    monkeypatch.setattr(config_module, "config", config_module.get_config())
+    # the caches read their paths from the config they imported, so point them at this test's storage too
+    monkeypatch.setattr(importlib.import_module("pioreactor.utils.sqlite_cache"), "config", config_module.config)
 
     mqtt_to_db_streaming = importlib.import_module("pioreactor.background_jobs.leader.mqtt_to_db_streaming")
 
@@ -103,3 +112,36 @@ def plugin_module(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
     monkeypatch.setattr(mqtt_to_db_streaming, "register_source_to_sink", lambda items: items)
 
     return importlib.import_module("spectrometer_reading_plugin")
+
+
+# fixture name -> plugin module. Each is imported after plugin_module has set up the config and stubs.
+PLUGIN_SUBMODULES = {
+    "absorbance_module": "absorbance",
+    "aio": "aio",
+    "archive": "archive",
+    "buffer_module": "buffer",
+    "dark_frames": "dark_frames",
+    "downsampling": "downsampling",
+    "excitation": "excitation",
+    "filtering": "filtering",
+    "flicker": "flicker",
+    "planning": "planning",
+    "profiling": "profiling",
+    "replay": "replay",
+    "sensor_module": "sensor",
+    "snapshot": "snapshot",
+    "streaming": "streaming",
+    "vendor_as7341": "_vendor.adafruit_as7341",
+}
+
+
+def _submodule_fixture(fixture_name: str, module_name: str):
+    @pytest.fixture(name=fixture_name)
+    def submodule(plugin_module) -> types.ModuleType:
+        return importlib.import_module(f"spectrometer_reading_plugin.{module_name}")
+
+    return submodule
+
+
+for _fixture_name, _module_name in PLUGIN_SUBMODULES.items():
+    globals()[_fixture_name] = _submodule_fixture(_fixture_name, _module_name)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from math import log10
+
+import pytest
+
+
+def test_absorbance_is_negative_log_of_transmittance(absorbance_module) -> None:
+    result = absorbance_module.absorbance({415: 0.5, 445: 0.02, 480: 0.0}, {415: 0.5, 445: 0.2, 480: 0.1})
+
+    assert result[415] == pytest.approx(0.0)
+    assert result[445] == pytest.approx(-log10(0.1))
+    assert 480 not in result
+
+
+def test_blank_is_persisted_per_experiment(absorbance_module) -> None:
+    assert absorbance_module.load_blank("exp1") is None
+
+    absorbance_module.save_blank("exp1", {415: 0.5, 680: 0.25})
+
+    assert absorbance_module.load_blank("exp1") == {415: 0.5, 680: 0.25}
+    assert absorbance_module.load_blank("exp2") is None
+    absorbance_module.delete_blank("exp1")
+    assert absorbance_module.load_blank("exp1") is None
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+
+class _RegisterSensor:
+    # the driver's registers that a scan touches. SMUX and integration finish after a few polls.
+    def __init__(self, name: str, events: list[str], polls: int = 3) -> None:
+        self.name = name
+        self.events = events
+        self.polls = polls
+        self._half = ""
+        self._smux_polls = 0
+        self._data_polls = 0
+        self._color_meas_enabled = True
+        self._smux_command = 0
+        self._low_bank_active = True
+        self._low_channels_configured = True
+        self._high_channels_configured = True
+
+    def _f1f4_clear_nir(self) -> None:
+        self._half = "F1-F4"
+
+    def _f5f8_clear_nir(self) -> None:
+        self._half = "F5-F8"
+
+    @property
+    def _smux_enable_bit(self) -> bool:
+        self._smux_polls -= 1
+        return self._smux_polls > 0
+
+    @_smux_enable_bit.setter
+    def _smux_enable_bit(self, value: bool) -> None:
+        self._smux_polls = self.polls
+
+    @property
+    def _data_ready_bit(self) -> bool:
+        self.events.append(self.name)
+        self._data_polls += 1
+        return self._data_polls % self.polls == 0
+
+    @property
+    def _all_channels(self) -> tuple[int, ...]:
+        offset = 0 if self._half == "F1-F4" else 4
+        return (0,) + tuple(offset + i for i in range(1, 5)) + (98, 99)
+
+
+def test_bands_are_read_from_the_halves_they_fall_in(aio) -> None:
+    sensor = _RegisterSensor("a", [])
+    async_sensor = aio.AsyncAS7341(sensor, poll_seconds=0)
+
+    assert asyncio.run(async_sensor.read_bands((415, 445, 480, 515, 555, 590, 630, 680))) == (1, 2, 3, 4, 5, 6, 7, 8)
+    assert asyncio.run(async_sensor.read_bands((630, 680))) == (0, 0, 0, 0, 5, 6, 7, 8)
+    # the driver reconfigures SMUX on its next scan
+    assert not sensor._low_channels_configured and not sensor._high_channels_configured
+    assert sensor._color_meas_enabled is True
+
+
+def test_saturated_half_is_retaken_like_a_blocking_scan(aio, plugin_module, sensor_module) -> None:
+    class _SaturatingSensor(_RegisterSensor):
+        gain = 10
+
+        @property
+        def _all_channels(self) -> tuple[int, ...]:
+            status = sensor_module.ASTATUS_SATURATED | 10 if self._half == "F5-F8" and self.gain == 10 else self.gain
+            return (status,) + super()._all_channels[1:]
+
+    sensor = _SaturatingSensor("a", [])
+    scan = asyncio.run(aio.AsyncAS7341(sensor, poll_seconds=0).read_scan(plugin_module.BANDS, gain=10, retake_gain=8))
+
+    # scaled to gain 10
+    assert scan.channels == (1, 2, 3, 4, 20, 24, 28, 32)
+    assert scan.flags == (0,) * 4 + (sensor_module.RETAKEN,) * 4
+    assert sensor.gain == 10
+
+
+def test_waiting_on_one_sensor_doesnt_block_another(aio) -> None:
+    events: list[str] = []
+    a = aio.AsyncAS7341(_RegisterSensor("a", events), poll_seconds=0)
+    b = aio.AsyncAS7341(_RegisterSensor("b", events), poll_seconds=0)
+
+    async def read_both():
+        return await asyncio.gather(a.read_bands((415,)), b.read_bands((415,)))
+
+    assert asyncio.run(read_both()) == [(1, 2, 3, 4, 0, 0, 0, 0)] * 2
+    # the sensors' polls interleave
+    assert events[:4] == ["a", "b", "a", "b"]
+
+
+def test_sensor_that_never_has_data_times_out(aio) -> None:
+    async_sensor = aio.AsyncAS7341(_RegisterSensor("a", [], polls=10**9), poll_seconds=0, timeout_seconds=0.01)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(async_sensor.read_bands((415,)))
+
+
+def test_sensors_without_smux_control_are_read_on_a_thread(aio, plugin_module, vendor_as7341) -> None:
+    sensor = vendor_as7341.AS7341(None)
+    sensor._channels = [1, 2, 3, 4, 5, 6, 7, 8]
+    loop = aio.AcquisitionLoop()
+    try:
+        assert loop.run(aio.AsyncAS7341(sensor).read_bands(plugin_module.BANDS)) == (1, 2, 3, 4, 5, 6, 7, 8)
+    finally:
+        loop.stop()
+    assert loop.loop.is_closed()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+
+import pytest
+
+SQL = (Path(__file__).parent.parent / "spectrometer_reading_plugin" / "additional_sql.sql").read_text(encoding="utf-8")
+
+
+@pytest.fixture()
+def db():
+    with sqlite3.connect(":memory:") as db:
+        db.executescript(SQL)
+        rows = [
+            (experiment, unit, f"2026-01-01T00:{minute:02d}:{second:02d}.000Z", 0.25 * band_index + minute, band)
+            for experiment, unit in (("exp1", "unit1"), ("exp1", "unit2"), ("exp2", "unit1"))
+            for minute in range(3)
+            for second in (0, 5)
+            for band_index, band in enumerate((415, 680))
+        ]
+        db.executemany(
+            "INSERT INTO as7341_spectrum_readings_all (experiment, pioreactor_unit, timestamp, reading, band) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        db.execute(
+            "INSERT INTO as7341_spectrum_readings_all (experiment, pioreactor_unit, timestamp, reading, band, flags) VALUES (?, ?, ?, ?, ?, ?)",
+            ("exp2", "unit1", "2026-01-01T00:03:00.000Z", None, 680, 5),
+        )
+        yield db
+
+
+def test_archive_round_trips_the_readings(archive, db, tmp_path) -> None:
+    path = tmp_path / "readings.as7341"
+    written = archive.write_archive(db, path, chunk_rows=4)
+
+    # 6 series of 6 readings, cut into chunks of 4 and 2, and a seventh reading in the last series
+    assert written == {"readings": 37, "chunks": 12}
+    expected = db.execute(
+        "SELECT experiment, pioreactor_unit, timestamp, band, reading, flags FROM as7341_spectrum_readings_all"
+    ).fetchall()
+    archived = [
+        (r.experiment, r.pioreactor_unit, r.timestamp.strftime("%Y-%m-%dT%H:%M:%S.000Z"), r.band, r.reading, r.flags)
+        for r in archive.read_archive(path)
+    ]
+    assert sorted(archived, key=repr) == sorted(expected, key=repr)
+    # the flagged reading without a value keeps both
+    assert ("exp2", "unit1", "2026-01-01T00:03:00.000Z", 680, None, 5) in archived
+
+
+def test_archive_reads_only_the_selected_readings(archive, db, tmp_path) -> None:
+    path = tmp_path / "readings.as7341"
+    archive.write_archive(db, path, experiment="exp1")
+
+    readings = list(
+        archive.read_archive(
+            path,
+            units=["unit2"],
+            bands=[680],
+            start=datetime(2026, 1, 1, 0, 1, tzinfo=timezone.utc),
+            end=datetime(2026, 1, 1, 0, 1, 5, tzinfo=timezone.utc),
+        )
+    )
+
+    assert [(r.experiment, r.pioreactor_unit, r.band, r.reading) for r in readings] == [
+        ("exp1", "unit2", 680, 1.25),
+        ("exp1", "unit2", 680, 1.25),
+    ]
+    assert [r.timestamp.second for r in readings] == [0, 5]
+
+
+def test_archive_rejects_other_files(archive, tmp_path) -> None:
+    path = tmp_path / "readings.csv"
+    path.write_text("experiment,pioreactor_unit,timestamp,reading,band\n")
+
+    with pytest.raises(ValueError, match="isn't a spectrometer archive"):
+        archive.read_footer(path)
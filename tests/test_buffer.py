@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import pytest
+
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _filled(buffer_module, capacity: int, n: int):
+    buffer = buffer_module.SpectrumBuffer(capacity, bands=(415, 445))
+    for i in range(n):
+        buffer.append(START + timedelta(seconds=i), [float(i), float(2 * i)])
+    return buffer
+
+
+def test_buffer_keeps_only_the_most_recent_scans(buffer_module) -> None:
+    buffer = _filled(buffer_module, capacity=4, n=10)
+
+    spectra = buffer.window()
+
+    assert len(buffer) == 4
+    assert [spectrum.bands[415] for spectrum in spectra] == [6.0, 7.0, 8.0, 9.0]
+    assert spectra[0].timestamp == START + timedelta(seconds=6)
+
+
+def test_window_since_and_limit(buffer_module) -> None:
+    buffer = _filled(buffer_module, capacity=8, n=10)
+
+    assert [s.bands[415] for s in buffer.window(since=START + timedelta(seconds=7))] == [7.0, 8.0, 9.0]
+    assert [s.bands[445] for s in buffer.window(since=START, limit=2)] == [16.0, 18.0]
+    assert buffer.window(since=START + timedelta(seconds=60)) == []
+
+
+def test_summary(buffer_module) -> None:
+    buffer = _filled(buffer_module, capacity=8, n=4)
+
+    count, summary = buffer.summary(since=START + timedelta(seconds=1))
+
+    assert count == 3
+    assert summary[415].mean == pytest.approx(2.0)
+    assert summary[415].std == pytest.approx((2 / 3) ** 0.5)
+    assert (summary[445].min, summary[445].max) == (2.0, 6.0)
+    assert buffer_module.SpectrumBuffer(2, bands=(415,)).summary() == (0, {})
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+
+def test_dark_frame_is_reused_while_fresh(dark_frames, monkeypatch) -> None:
+    key = dark_frames.dark_frame_key("unit1", gain=10, atime=100, astep=999, led_current=5.0, bands=(630, 680))
+    monkeypatch.setattr(dark_frames, "time", lambda: 1000.0)
+    dark_frames.save_dark_frame(key, [0.5] * 8)
+
+    monkeypatch.setattr(dark_frames, "time", lambda: 1060.0)
+    assert dark_frames.load_dark_frame(key, max_age_seconds=120).background == [0.5] * 8
+    assert dark_frames.load_dark_frame(key, max_age_seconds=30) is None
+
+
+def test_dark_frame_is_keyed_by_sensor_settings(dark_frames) -> None:
+    dark_frames.save_dark_frame(dark_frames.dark_frame_key("unit1", 10, 100, 999, 5.0, (415, 680)), [0.5] * 8)
+
+    assert (
+        dark_frames.load_dark_frame(dark_frames.dark_frame_key("unit1", 10, 60, 999, 5.0, (415, 680)), max_age_seconds=3600)
+        is None
+    )
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+
+def _downsample(downsampling, points, bucket_seconds: float) -> list[tuple[float, float]]:
+    series = downsampling.BucketedLTTB(bucket_seconds)
+    return [kept for t, y in points if (kept := series.add(t, y)) is not None]
+
+
+def test_one_point_is_kept_per_bucket_starting_with_the_first_point(downsampling) -> None:
+    points = [(float(t), 0.01 * t) for t in range(0, 600, 5)]
+
+    kept = _downsample(downsampling, points, bucket_seconds=60)
+
+    # the last two buckets are still waiting for the buckets after them.
+    assert len(kept) == 600 // 60 - 2
+    assert kept[0] == points[0]
+    assert [int(t // 60) for t, _ in kept] == list(range(len(kept)))
+
+
+def test_spikes_survive_downsampling(downsampling) -> None:
+    points = [(float(t), 1.0) for t in range(0, 600, 5)]
+    points[50] = (250.0, 5.0)  # a single spike, in the fifth bucket
+
+    kept = _downsample(downsampling, points, bucket_seconds=60)
+
+    assert (250.0, 5.0) in kept
+
+
+def test_late_points_join_the_current_bucket(downsampling) -> None:
+    series = downsampling.BucketedLTTB(60)
+    series.add(0, 1.0)
+    series.add(61, 1.0)
+
+    assert series.add(30, 9.0) is None  # its bucket already closed
+    assert series.add(125, 1.0) is None
+    assert series.add(185, 1.0) == (30, 9.0)
+
+
+def test_each_level_downsamples_the_level_below(downsampling) -> None:
+    series = downsampling.LevelledLTTB(60, levels=3, factor=4)
+
+    kept = [kept for t in range(0, 6 * 3600, 5) for kept in series.add(float(t), 1.0)]
+
+    counts = [sum(1 for level, _ in kept if level == n) for n in range(3)]
+    # 360 one-minute buckets, 90 four-minute ones and 22 sixteen-minute ones, less those still waiting
+    assert counts == [358, 88, 20]
+    # like each level's first bucket, a level's first point is the first point it's fed
+    assert [point for level, point in kept if level == 2][0] == (0.0, 1.0)
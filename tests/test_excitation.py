@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import pytest
+
+
+def test_parse_excitation_states(excitation) -> None:
+    states = excitation.parse_excitation_states("A:50; b:50 ;A:25,B:12.5;")
+
+    assert states == [{"A": 50.0}, {"B": 50.0}, {"A": 25.0, "B": 12.5}]
+    assert excitation.parse_excitation_states("") == []
+
+
+@pytest.mark.parametrize("text", ["A50", "E:10", "A:150"])
+def test_parse_excitation_states_rejects_bad_states(excitation, text) -> None:
+    with pytest.raises(ValueError):
+        excitation.parse_excitation_states(text)
+
+
+def test_excitation_label_and_full_state(excitation) -> None:
+    assert excitation.excitation_label({"B": 25.0, "A": 50}) == "A:50,B:25"
+    assert excitation.full_led_state({"B": 25.0}) == {"A": 0.0, "B": 25.0, "C": 0.0, "D": 0.0}
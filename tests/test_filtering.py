@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import pytest
+
+
+def test_kalman_filter_starts_at_first_observation(filtering) -> None:
+    filter_ = filtering.KalmanFilter1D(process_noise=1e-4, measurement_noise=1e-2)
+
+    estimate, std = filter_.update(0.5)
+
+    assert estimate == 0.5
+    assert std == pytest.approx(0.1)
+
+
+def test_kalman_filter_smooths_noise_and_shrinks_uncertainty(filtering) -> None:
+    filter_ = filtering.KalmanFilter1D(process_noise=1e-6, measurement_noise=1e-2)
+    observations = [1.0, 1.2, 0.8, 1.1, 0.9] * 10
+
+    stds = []
+    for observation in observations:
+        estimate, std = filter_.update(observation)
+        stds.append(std)
+
+    assert estimate == pytest.approx(1.0, abs=0.05)
+    assert stds[-1] < stds[0]
+
+
+def test_kalman_filter_rejects_invalid_noise(filtering) -> None:
+    with pytest.raises(ValueError):
+        filtering.KalmanFilter1D(process_noise=1e-4, measurement_noise=0.0)
+
+
+def test_robust_mean_rejects_a_spike(filtering) -> None:
+    estimate, rejected = filtering.robust_mean([1000, 1004, 996, 1002, 4000], threshold=3.5)
+
+    assert estimate == pytest.approx(1000.5)
+    assert rejected == 1
+
+
+def test_robust_mean_keeps_everything_with_too_few_values_or_within_the_noise_floor(filtering) -> None:
+    assert filtering.robust_mean([1000, 4000], threshold=3.5) == (2500, 0)
+    assert filtering.robust_mean([1000, 1000, 1001], threshold=3.5, min_scale=1.0) == (pytest.approx(1000.333, abs=1e-3), 0)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import pytest
+
+
+class _FlickerSensor:
+    def __init__(self, statuses: list[int]) -> None:
+        self.statuses = statuses
+        self.registers: list[tuple[int, int]] = []
+        self.transactions: list[bytes] = []
+        self._smux_command = 0
+        self._smux_enabled = False
+        self._low_channels_configured = True
+        self._high_channels_configured = True
+
+        sensor = self
+
+        class _I2CDevice:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args) -> None:
+                pass
+
+            def write(self, buffer: bytes) -> None:
+                sensor.transactions.append(bytes(buffer))
+
+        self.i2c_device = _I2CDevice()
+
+    def _write_register(self, addr: int, data: int) -> None:
+        self.registers.append((addr, data))
+
+    @property
+    def _fd_status(self) -> int:
+        return self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+
+
+def test_flicker_status_is_decoded(flicker) -> None:
+    assert flicker.decode_flicker_status(45) == 100
+    assert flicker.decode_flicker_status(46) == 120
+    assert flicker.decode_flicker_status(44) == 0
+    assert flicker.decode_flicker_status(0) is None
+    assert flicker.decode_flicker_status(45 | flicker.FD_SATURATED) is None
+
+
+def test_detection_writes_smux_in_one_transaction_and_stops_the_engine(flicker) -> None:
+    sensor = _FlickerSensor([0, 0, 46])
+
+    assert flicker.detect_mains_flicker(sensor, poll_seconds=0) == 120
+
+    assert sensor.transactions == [bytes([0x00]) + bytes(19) + b"\x60"]
+    assert sensor._smux_command == 2 and sensor._smux_enabled is True
+    assert sensor.registers[-2:] == [(flicker.ENABLE, flicker.PON | flicker.FDEN), (flicker.ENABLE, flicker.PON)]
+    # the next scan reprograms SMUX for the bands
+    assert not sensor._low_channels_configured and not sensor._high_channels_configured
+
+
+def test_detection_times_out_without_a_valid_measurement(flicker) -> None:
+    sensor = _FlickerSensor([0])
+
+    assert flicker.detect_mains_flicker(sensor, timeout_seconds=0.01, poll_seconds=0) is None
+    assert sensor.registers[-1] == (flicker.ENABLE, flicker.PON)
+
+
+def test_flicker_astep_makes_each_atime_step_one_period(flicker, planning) -> None:
+    for hz in (100, 120):
+        astep = flicker.flicker_astep(hz)
+        assert planning.integration_seconds(0, astep) == pytest.approx(1 / hz, rel=1e-3)
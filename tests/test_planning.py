@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import pytest
+
+
+def test_plan_keeps_driver_default_integration_when_it_fits(planning) -> None:
+    window = planning.available_window(0.2, od_duration=1.0, pre_delay=1.0, post_delay=1.0)
+
+    plan = planning.plan_integration(window, led_switching_seconds=0.2, max_integration_seconds=0.281)
+
+    assert window == pytest.approx(2.0)
+    assert (plan.atime, plan.astep, plan.burst_scans) == (100, 999, 1)
+
+
+def test_plan_fills_spare_time_with_burst_scans(planning) -> None:
+    plan = planning.plan_integration(2.0, led_switching_seconds=0.2, max_integration_seconds=0.281, max_burst_scans=10)
+
+    assert plan.atime == 100
+    assert plan.burst_scans == 3
+    assert plan.duration_seconds <= 2.0
+
+
+def test_plan_rejects_windows_too_small_for_one_scan(planning) -> None:
+    with pytest.raises(planning.IntegrationBudgetError):
+        planning.plan_integration(0.1, led_switching_seconds=0.2, max_integration_seconds=0.281)
+
+
+def test_plan_fits_extra_scans_after_the_burst(planning) -> None:
+    plan = planning.plan_integration(
+        2.0, led_switching_seconds=0.4, max_integration_seconds=0.281, max_burst_scans=10, extra_scans=3
+    )
+
+    assert plan.burst_scans == 1
+    assert plan.atime < 100
+    assert plan.duration_seconds <= 2.0
+
+    with pytest.raises(planning.IntegrationBudgetError):
+        planning.plan_integration(0.5, led_switching_seconds=0.4, max_integration_seconds=0.281, extra_scans=3)
+
+
+def test_plan_for_one_smux_half_fits_twice_the_scans(planning) -> None:
+    both = planning.plan_integration(2.0, led_switching_seconds=0.2, max_integration_seconds=0.281, max_burst_scans=10)
+    one = planning.plan_integration(2.0, led_switching_seconds=0.2, max_integration_seconds=0.281, max_burst_scans=10, halves=1)
+
+    assert one.atime == both.atime == 100
+    assert one.burst_scans == 2 * both.burst_scans
+    assert one.duration_seconds <= 2.0
+
+
+def test_plan_integrates_whole_steps_of_the_given_astep(planning) -> None:
+    # ASTEP 3596 is one 100 Hz flicker period per ATIME step
+    plan = planning.plan_integration(2.0, led_switching_seconds=0.2, max_integration_seconds=0.281, astep=3596)
+
+    assert (plan.atime, plan.astep) == (27, 3596)
+    assert plan.integration_seconds == pytest.approx(0.28, rel=1e-3)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import pstats
+import tracemalloc
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def stop_tracemalloc():
+    yield
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def test_profiler_writes_profiles_and_memory_reports_and_rotates_them(profiling, tmp_path) -> None:
+    profiler = profiling.JobProfiler(tmp_path, interval_seconds=0, keep=2)
+
+    def publish() -> str:
+        return "published"
+
+    def scan() -> str:
+        return profiled_publish()
+
+    profiled_publish = profiler.wrap(publish)
+    profiled_scan = profiler.wrap(scan)
+
+    for _ in range(3):
+        assert profiled_scan() == "published"  # nested profiled calls run inside the outer profile
+
+    profiles = sorted(tmp_path.glob("profile-*.pstats"))
+    assert len(profiles) == 2
+    assert len(list(tmp_path.glob("memory-*.txt"))) == 2
+    assert "scan" in pstats.Stats(str(profiles[-1])).get_stats_profile().func_profiles
+
+    profiler.stop()
+    assert not tracemalloc.is_tracing()
+
+
+def test_profiling_is_off_unless_configured(profiling, monkeypatch) -> None:
+    monkeypatch.delenv("SPECTROMETER_PROFILE", raising=False)
+    assert profiling.profiling_enabled() is False
+
+    monkeypatch.setenv("SPECTROMETER_PROFILE", "1")
+    assert profiling.profiling_enabled() is True
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+EXPORT_HEADER = "experiment,pioreactor_unit,timestamp,reading,band\n"
+
+
+def _write_export(path: Path, scans: list[tuple[str, str, float]]) -> Path:
+    lines = [EXPORT_HEADER]
+    for unit, timestamp, reading in scans:
+        for band in (415, 445, 480, 515, 555, 590, 630, 680):
+            lines.append(f"exp,{unit},{timestamp},{reading},{band}\n")
+    path.write_text("".join(lines), encoding="utf-8")
+    return path
+
+
+def test_read_recorded_scans_groups_bands_into_sorted_scans(replay, tmp_path: Path) -> None:
+    csv_path = _write_export(
+        tmp_path / "as7341_spectrum_readings.csv",
+        [("unit1", "2026-01-01T00:00:05.000Z", 0.2), ("unit1", "2026-01-01T00:00:00.000Z", 0.1)],
+    )
+    zip_path = tmp_path / "export.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.write(csv_path, "as7341_spectrum_readings-20260101.csv")
+
+    for path in (csv_path, zip_path):
+        scans = replay.read_recorded_scans(path)
+        assert [scan.readings[0] for scan in scans] == [0.1, 0.2]
+        assert len(scans[0].readings) == 8
+
+
+def test_read_recorded_scans_requires_a_single_unit(replay, tmp_path: Path) -> None:
+    csv_path = _write_export(
+        tmp_path / "export.csv",
+        [("unit1", "2026-01-01T00:00:00.000Z", 0.1), ("unit2", "2026-01-01T00:00:00.000Z", 0.1)],
+    )
+
+    with pytest.raises(ValueError):
+        replay.read_recorded_scans(csv_path)
+
+    assert len(replay.read_recorded_scans(csv_path, unit="unit2")) == 1
+
+
+def test_replay_sensor_drives_the_job_at_accelerated_speed(replay, plugin_module, monkeypatch, tmp_path: Path) -> None:
+    csv_path = _write_export(
+        tmp_path / "export.csv",
+        [("unit1", f"2026-01-01T00:00:{10 * i:02d}.000Z", 0.01 * (i + 1)) for i in range(3)],
+    )
+    sensor = replay.ReplayAS7341.from_recording(csv_path, speed=100.0)
+    sleeps: list[float] = []
+    monkeypatch.setattr(replay, "sleep", sleeps.append)
+    monkeypatch.setattr(replay, "monotonic", lambda: 0.0)
+
+    assert sensor.samples_per_second == pytest.approx(10.0)
+
+    job = plugin_module.SpectrometerReading.__new__(plugin_module.SpectrometerReading)
+    job._publish_setting = lambda setting: None
+    job.logger = SimpleNamespace(
+        debug=lambda *args, **kwargs: None, warning=lambda *args, **kwargs: None, info=lambda *args, **kwargs: None
+    )
+    job._band_filters = {}
+    job.recent_spectra = plugin_module.SpectrumBuffer(10, plugin_module.BANDS)
+    job.record_blank = False
+    job._blank = None
+    job._persist_dark_frames = False
+    job._profiler = None
+    job._acquisition = None
+    job._async_sensor = None
+    job._cycle_deadline = None
+    job.flicker_hz = None
+    job._flicker_checked_at = None
+    job._flicker_aware = False
+    job.bands = plugin_module.BANDS
+    job._background_noise = [0.0] * 8
+    job.sensor = sensor
+
+    job.record_background_noise()
+    assert job._background_noise == [0.0] * 8
+
+    sensor.led = True
+    readings = [job.record_all_bands() and job.band_415 for _ in range(3)]
+
+    assert readings == pytest.approx([0.01, 0.02, 0.03])
+    assert sleeps == pytest.approx([0.1, 0.2])
+    assert sensor.exhausted
+
+    # the next cycle stops the job, instead of reading past the end of the recording
+    cleaned_up: list[bool] = []
+    job.clean_up = lambda: cleaned_up.append(True)
+    job.is_setup_done = True
+    job._record_once()
+    assert cleaned_up == [True]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import pytest
+
+
+class _FlakySensor:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.gain = 10
+        self.atime = 100
+        self.initializations = 0
+        self._low_channels_configured = True
+
+    @property
+    def all_channels(self) -> tuple[int, ...]:
+        if self.failures > 0:
+            self.failures -= 1
+            raise OSError(121, "Remote I/O error")
+        return (1,) * 8
+
+    def initialize(self) -> None:
+        self.initializations += 1
+        self.gain = 8
+        self.atime = 29
+
+
+def test_transient_errors_are_retried(sensor_module) -> None:
+    counts = []
+    sensor = sensor_module.ResilientSensor(
+        _FlakySensor(failures=2), backoff_seconds=0, on_error=lambda s: counts.append(s.errors)
+    )
+
+    assert sensor.all_channels == (1,) * 8
+    assert (sensor.errors, sensor.retried, sensor.reinitializations) == (2, 2, 0)
+    assert counts == [1, 2]
+
+
+def test_repeated_errors_reinitialize_and_restore_settings(sensor_module) -> None:
+    driver = _FlakySensor(failures=0)
+    sensor = sensor_module.ResilientSensor(driver, retries=5, backoff_seconds=0, reinitialize_after=3)
+    sensor.gain = 10
+    sensor.atime = 50
+
+    driver.failures = 4
+    assert sensor.all_channels == (1,) * 8
+
+    assert driver.initializations == 1
+    assert sensor.reinitializations == 1
+    assert (driver.gain, driver.atime) == (10, 50)
+    assert driver._low_channels_configured is False
+
+
+def test_errors_are_raised_once_retries_run_out(sensor_module) -> None:
+    sensor = sensor_module.ResilientSensor(_FlakySensor(failures=10), retries=2, backoff_seconds=0, reinitialize_after=100)
+
+    with pytest.raises(OSError):
+        sensor.all_channels
+
+    assert sensor.errors == 3
+
+
+def test_written_settings_are_read_back_without_the_bus(sensor_module) -> None:
+    driver = _FlakySensor(failures=0)
+    sensor = sensor_module.ResilientSensor(driver)
+    sensor.gain = 9
+    driver.gain = 3  # would only happen if the sensor reset
+
+    assert sensor.gain == 9
+    assert sensor.atime == 100
+
+
+class _SmuxSensor:
+    # records which SMUX halves are configured, like the vendored driver
+    def __init__(self, astatus: dict[str, int] | None = None) -> None:
+        self.configured: list[str] = []
+        self.gains: list[int] = []
+        self.gain = 10
+        # each half's ASTATUS at gain 10. Otherwise, and by default, not saturated, at the gain set.
+        self.astatus = astatus or {}
+        self._low_channels_configured = False
+        self._high_channels_configured = False
+
+    def _configure_f1_f4(self) -> None:
+        self.configured.append("F1-F4")
+        self.gains.append(self.gain)
+        self._low_channels_configured = True
+
+    def _configure_f5_f8(self) -> None:
+        self.configured.append("F5-F8")
+        self.gains.append(self.gain)
+        self._high_channels_configured = True
+
+    @property
+    def _all_channels(self) -> tuple[int, ...]:
+        # ASTATUS, four bands, clear, NIR
+        half = self.configured[-1]
+        reads = (1, 2, 3, 4) if half == "F1-F4" else (5, 6, 7, 8)
+        status = self.astatus.get(half, self.gain) if self.gain == 10 else self.gain
+        return (status,) + reads + (50, 60)
+
+    @property
+    def all_channels(self) -> tuple[int, ...]:
+        raise AssertionError("the status byte is read with each half instead")
+
+
+def test_bands_in_one_smux_half_only_integrate_that_half(sensor_module) -> None:
+    driver = _SmuxSensor()
+    sensor = sensor_module.ResilientSensor(driver)
+
+    assert sensor_module.read_bands(sensor, (630, 680)) == (0, 0, 0, 0, 5, 6, 7, 8)
+    # reconfigured every read, even though the half was already configured, so integration restarts.
+    assert sensor_module.read_bands(sensor, (630, 680)) == (0, 0, 0, 0, 5, 6, 7, 8)
+    assert sensor_module.read_bands(sensor, (415,)) == (1, 2, 3, 4, 0, 0, 0, 0)
+    assert driver.configured == ["F5-F8", "F5-F8", "F1-F4"]
+
+    assert sensor_module.read_bands(sensor, (415, 680)) == (1, 2, 3, 4, 5, 6, 7, 8)
+    assert driver.configured[-2:] == ["F1-F4", "F5-F8"]
+    assert sensor_module.smux_halves((415, 680)) == 2
+
+
+def test_scan_flags_come_from_each_halfs_status_byte(sensor_module) -> None:
+    driver = _SmuxSensor(astatus={"F5-F8": sensor_module.ASTATUS_SATURATED | 10, "F1-F4": 3})
+    scan = sensor_module.read_scan(driver, (415, 680), gain=10)
+
+    assert scan.channels == (1, 2, 3, 4, 5, 6, 7, 8)
+    assert scan.flags == (sensor_module.INVALID,) * 4 + (sensor_module.SATURATED,) * 4
+    # without the gain set, the gain isn't checked
+    assert sensor_module.read_scan(driver, (415,)).flags == (0,) * 8
+
+
+def test_saturated_half_is_retaken_at_a_lower_gain(sensor_module) -> None:
+    # saturated at gain 10, but not at gain 8
+    driver = _SmuxSensor(astatus={"F5-F8": sensor_module.ASTATUS_SATURATED | 10})
+    scan = sensor_module.read_scan(driver, sensor_module.LOW_HALF_BANDS + sensor_module.HIGH_HALF_BANDS, gain=10, retake_gain=8)
+
+    assert driver.configured == ["F1-F4", "F5-F8", "F5-F8"]
+    assert driver.gains == [10, 10, 8]
+    assert driver.gain == 10
+    # scaled to gain 10
+    assert scan.channels == (1, 2, 3, 4, 20, 24, 28, 32)
+    assert scan.flags == (0,) * 4 + (sensor_module.RETAKEN,) * 4
+
+
+def test_failed_retake_restores_the_gain(sensor_module) -> None:
+    class _FailingAtLowGain(_SmuxSensor):
+        @property
+        def _all_channels(self) -> tuple[int, ...]:
+            if self.gain != 10:
+                raise RuntimeError("Timeout occurred waiting for sensor data")
+            return super()._all_channels
+
+    driver = _FailingAtLowGain(astatus={"F1-F4": sensor_module.ASTATUS_SATURATED | 10})
+
+    with pytest.raises(RuntimeError):
+        sensor_module.read_scan(driver, (415,), gain=10, retake_gain=8)
+    assert driver.gain == 10
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import importlib
+
+import pytest
+from click.testing import CliRunner
+
+
+class _LitSensor:
+    def __init__(self) -> None:
+        self.gain = 10
+        self.atime = 100
+        self.astep = 999
+        self.led = False
+        self.reads = 0
+
+    @property
+    def all_channels(self) -> tuple[int, ...]:
+        self.reads += 1
+        if self.led:
+            return tuple(1000 + 100 * i + self.reads % 2 for i in range(8))
+        return (256,) * 8
+
+
+def test_snapshot_subtracts_dark_scan_and_turns_led_off(snapshot, plugin_module) -> None:
+    sensor = _LitSensor()
+
+    spectrum = snapshot.take_snapshot(sensor, scans=2)
+
+    assert sensor.reads == 4
+    assert sensor.led is False
+    expected = plugin_module.normalize_by_gain_time([1000.5 - 256, 1100.5 - 256], 10, 100, 999)
+    assert spectrum.bands[415] == pytest.approx(expected[0])
+    assert spectrum.bands[445] == pytest.approx(expected[1])
+    assert list(spectrum.bands) == list(plugin_module.BANDS)
+
+
+def test_snapshot_without_led_reads_only_background(snapshot) -> None:
+    spectrum = snapshot.take_snapshot(_LitSensor(), use_led=False)
+
+    assert set(spectrum.bands.values()) == {0.0}
+
+
+class _SmuxLitSensor(_LitSensor):
+    # with the driver's SMUX control, so a scan can integrate one half only
+    def __init__(self) -> None:
+        super().__init__()
+        self.configured: list[str] = []
+
+    def _configure_f1_f4(self) -> None:
+        self.configured.append("F1-F4")
+
+    def _configure_f5_f8(self) -> None:
+        self.configured.append("F5-F8")
+
+    @property
+    def _all_channels(self) -> tuple[int, ...]:
+        # ASTATUS (the gain set), four bands, clear, NIR
+        return (self.gain,) + self.all_channels[:4] + (50, 60)
+
+
+def test_snapshot_reads_and_returns_only_masked_bands(snapshot) -> None:
+    sensor = _SmuxLitSensor()
+
+    spectrum = snapshot.take_snapshot(sensor, bands=(630, 680))
+
+    assert list(spectrum.bands) == [630, 680]
+    # one half for the dark scan, and one for the lit scan
+    assert sensor.configured == ["F5-F8", "F5-F8"]
+    assert sensor.reads == 2
+
+
+def test_snapshot_flags_bands_saturated_in_any_scan(snapshot, sensor_module) -> None:
+    class _SaturatingSensor(_LitSensor):
+        @property
+        def all_channels(self) -> tuple[int, ...]:
+            channels = super().all_channels
+            return channels[:-1] + (2**16 - 1,) if self.led and self.reads == 3 else channels
+
+    sensor = _SaturatingSensor()
+
+    assert snapshot.take_snapshot(sensor, scans=2).flags == {680: sensor_module.SATURATED}
+    assert snapshot.take_snapshot(_LitSensor()).flags == {}
+
+
+def test_snapshot_command_refuses_to_run_alongside_od_reading(plugin_module, monkeypatch) -> None:
+    utils = importlib.import_module("pioreactor.utils")
+    monkeypatch.setattr(utils, "is_pio_job_running", lambda job: job == "od_reading")
+
+    result = CliRunner().invoke(plugin_module.click_spectrometer_snapshot, [])
+
+    assert result.exit_code == 1
+    assert "od_reading is running" in result.output
@@ -1,8 +1,17 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import importlib
+import subprocess
+import sys
+from contextlib import nullcontext
+from pathlib import Path
+from types import SimpleNamespace
 from typing import Any
 
+import msgspec
+import pytest
+
 
 def _build_job(plugin_module: Any):
     job = plugin_module.SpectrometerReading.__new__(plugin_module.SpectrometerReading)
@@ -10,18 +19,56 @@ def _build_job(plugin_module: Any):
     class _Logger:
         def __init__(self) -> None:
             self.errors: list[str] = []
+            self.warnings: list[str] = []
 
         def error(self, message: str) -> None:
             self.errors.append(message)
 
+        def warning(self, message: str) -> None:
+            self.warnings.append(message)
+
+        def debug(self, message: str, **kwargs: Any) -> None:
+            pass
+
+        def info(self, message: str) -> None:
+            pass
+
     job.logger = _Logger()
+    job._publish_setting = lambda setting: None
     job.state = job.READY
     job.currently_dodging_od = False
     job.job_name = "spectrometer_reading"
     job.continuous_sampling_timer = None
+    job.sensor = _fake_sensor()
+    job.recent_spectra = plugin_module.SpectrumBuffer(10, plugin_module.BANDS)
+    job._od_schedule = None
+    job._dodging_window_cap = None
+    job._healthy_margins = 0
+    job._cycles_to_skip = 0
+    job._cycle_deadline = None
+    job._plan = None
+    job._band_filters = {}
+    job.record_blank = False
+    job._blank = None
+    job._excitation_states = []
+    job._background_recorded_at = 0.0
+    job._background_is_cached = False
+    job._persist_dark_frames = False
+    job._profiler = None
+    job._acquisition = None
+    job._async_sensor = None
+    job.flicker_hz = None
+    job._flicker_checked_at = None
+    job._flicker_aware = False
+    job.bands = plugin_module.BANDS
     return job
 
 
+def _fake_sensor():
+    # conftest replaces the vendored driver with a stub
+    return importlib.import_module("spectrometer_reading_plugin._vendor.adafruit_as7341").AS7341(None)
+
+
 def test_initialize_continuous_operation_uses_od_sample_rate(plugin_module, monkeypatch) -> None:
     module = plugin_module
     created: dict[str, Any] = {}
@@ -145,3 +192,654 @@ def test_on_disconnected_calls_super_and_cleans_local_resources(plugin_module, m
     assert super_called["called"] is True
     assert timer.cancelled is True
     assert led["off"] is True
+
+
+def test_record_all_bands_publishes_filtered_bands(plugin_module) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    published: list[str] = []
+    job._publish_setting = published.append
+    job.published_settings = dict(module.SpectrometerReading.published_settings)
+
+    job.sensor = _fake_sensor()
+    job.sensor._channels = [512] * 8
+    job._background_noise = [0.0] * 8
+    job._band_filters = {}
+    job.initialize_band_filters()
+
+    job.record_all_bands()
+    first_reading, first_estimate = job.band_415, job.band_415_filtered
+    job.sensor._channels = [1024] * 8
+    job.record_all_bands()
+
+    assert first_estimate == first_reading
+    assert first_estimate < job.band_415_filtered < job.band_415
+    assert job.band_680_filtered_std > 0
+    assert "band_415_filtered" in published
+    assert "band_415_filtered_std" in published
+
+
+def test_scan_slots_are_shared_multiples_of_the_interval(plugin_module) -> None:
+    module = plugin_module
+
+    assert module.seconds_until_next_scan_slot(5.0, 1_000_001.0) == 4.0
+    assert module.seconds_until_next_scan_slot(5.0, 1_000_000.0) == 0.0
+    assert module.scan_slot_skew(5.0, 1_000_000.02) == pytest.approx(0.02)
+    assert module.scan_slot_skew(5.0, 999_999.97) == pytest.approx(-0.03)
+
+
+def test_synchronized_scans_start_on_the_next_slot(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    created: dict[str, Any] = {}
+
+    class FakeTimer:
+        def __init__(self, interval: float, function: Any, **kwargs: Any) -> None:
+            created["kwargs"] = kwargs
+
+        def start(self):
+            return self
+
+    monkeypatch.setattr(module, "RepeatedTimer", FakeTimer)
+    monkeypatch.setattr(module, "time", lambda: 1_000_001.5)
+    module.config.set("spectrometer_reading.config", "synchronize_scans", "true")
+    module.config.set("od_reading.config", "samples_per_second", "0.2")
+    job = _build_job(module)
+
+    job.initialize_continuous_operation()
+
+    assert created["kwargs"]["run_after"] == pytest.approx(3.5)
+
+
+def test_large_scan_skew_realigns_timer(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    monkeypatch.setattr(module, "time", lambda: 1_000_000.2)
+    module.config.set("od_reading.config", "samples_per_second", "0.2")
+    module.config.set("spectrometer_reading.config", "max_scan_skew_ms", "50")
+    job = _build_job(module)
+    realigned = {"called": False}
+    job.initialize_continuous_operation = lambda: realigned.__setitem__("called", True)
+
+    assert job.record_scan_skew() is True
+
+    assert job.scan_skew_ms == pytest.approx(200.0)
+    assert realigned["called"] is True
+
+
+def test_realigning_skips_the_off_slot_scan(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    monkeypatch.setattr(module, "time", lambda: 1_000_000.2)
+    module.config.set("od_reading.config", "samples_per_second", "0.2")
+    module.config.set("spectrometer_reading.config", "synchronize_scans", "true")
+    job = _build_job(module)
+    job.initialize_continuous_operation = lambda: None
+    scans = []
+    job._record_once = lambda: scans.append(1)
+
+    job._record_continuously()
+    assert scans == []
+
+    monkeypatch.setattr(module, "time", lambda: 1_000_000.01)
+    job._record_continuously()
+    assert scans == [1]
+
+
+def test_record_all_bands_publishes_spectrum_with_acquisition_timestamp(plugin_module) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    published: list[str] = []
+    job._publish_setting = published.append
+    job.sensor = _fake_sensor()
+    job.sensor._channels = [512 * (i + 1) for i in range(8)]
+    job._background_noise = [0.0] * 8
+    job._band_filters = {}
+
+    before = module.current_utc_datetime()
+    job.record_all_bands()
+    after = module.current_utc_datetime()
+
+    assert "spectrum" in published
+    assert before <= job.spectrum.timestamp <= after
+    assert job.spectrum.bands == {band: getattr(job, f"band_{band}") for band in module.BANDS}
+
+
+def test_parser_produces_one_row_per_band_from_a_single_message(streaming) -> None:
+    payload = b'{"timestamp": "2026-01-01T00:00:00.500000Z", "bands": {"415": 0.1, "680": 0.2}}'
+
+    rows = streaming.parser("pioreactor/unit1/exp1/spectrometer_reading/spectrum", payload)
+
+    assert [row["band"] for row in rows] == [415, 680]
+    assert [row["reading"] for row in rows] == [0.1, 0.2]
+    assert all(row["experiment"] == "exp1" and row["pioreactor_unit"] == "unit1" for row in rows)
+    # the format sqlite's datetime adapter on the leader would have stored
+    assert {row["timestamp"] for row in rows} == {"2026-01-01T00:00:00.500Z"}
+    streaming.parser("pioreactor/unit1/exp1/spectrometer_reading/spectrum", payload)
+    assert streaming.topic_metadata.cache_info().hits >= 1
+
+
+def test_parser_stores_each_bands_flags(streaming) -> None:
+    payload = b'{"timestamp": "2026-01-01T00:00:00.500000Z", "bands": {"415": 0.1, "680": 0.2}, "flags": {"680": 1}}'
+
+    rows = streaming.parser("pioreactor/unit1/exp1/spectrometer_reading/spectrum", payload)
+
+    assert [(row["band"], row["flags"]) for row in rows] == [(415, 0), (680, 1)]
+
+
+def test_chart_parser_emits_a_row_per_band_as_buckets_complete(plugin_module, streaming) -> None:
+    plugin_module.config.set("spectrometer_reading.config", "chart_bucket_seconds", "60")
+    topic = "pioreactor/unit1/exp1/spectrometer_reading/spectrum"
+
+    def payload(seconds: int) -> bytes:
+        return f'{{"timestamp": "2026-01-01T00:{seconds // 60:02d}:{seconds % 60:02d}.000000Z", "bands": {{"415": {seconds}, "680": 0.2}}}}'.encode()
+
+    assert streaming.chart_parser(topic, payload(0)) is None
+    assert streaming.chart_parser(topic, payload(30)) is None
+    rows = streaming.chart_parser(topic, payload(60))  # completes the first bucket
+
+    assert [(row["band"], row["timestamp"], row["reading"], row["level"]) for row in rows] == [
+        (415, "2026-01-01T00:00:00.000Z", 0.0, 0),
+        (680, "2026-01-01T00:00:00.000Z", 0.2, 0),
+    ]
+    assert all(row["experiment"] == "exp1" and row["pioreactor_unit"] == "unit1" for row in rows)
+
+    # the unit's next experiment drops the finished one's series
+    streaming.chart_parser("pioreactor/unit2/exp1/spectrometer_reading/spectrum", payload(0))
+    streaming.chart_parser("pioreactor/unit1/exp2/spectrometer_reading/spectrum", payload(0))
+    assert sorted(set(key[:2] for key in streaming.chart_series)) == [("exp1", "unit2"), ("exp2", "unit1")]
+    streaming.chart_series.clear()
+
+
+def test_band_mask_publishes_only_the_selected_bands(plugin_module) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    job.bands = module.parse_bands("680, 630")
+    job.recent_spectra = module.SpectrumBuffer(10, job.bands)
+    job._background_noise = [0.0] * 8
+    job._band_filters = {}
+    job.sensor._channels = [100] * 8
+
+    job.record_all_bands()
+
+    assert job.bands == (630, 680)
+    assert list(job.spectrum.bands) == [630, 680]
+    assert getattr(job, "band_415", None) is None
+    assert job.recent_spectra.window()[0].bands == job.spectrum.bands
+
+    with pytest.raises(ValueError, match="Unknown bands"):
+        module.parse_bands("630,700")
+
+
+def test_importing_plugin_does_not_load_hardware_or_leader_modules(plugin_module) -> None:
+    # run in a fresh interpreter, since the test process already has these modules loaded.
+    deferred = [
+        "board",
+        "spectrometer_reading_plugin._vendor.adafruit_as7341",
+        "spectrometer_reading_plugin.aio",
+        "asyncio",
+        "pioreactor.actions.led_intensity",
+        "pioreactor.background_jobs.leader.mqtt_to_db_streaming",
+    ]
+    code = f"import sys, spectrometer_reading_plugin; print([m for m in {deferred!r} if m in sys.modules])"
+
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=Path(__file__).parents[1]
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_apply_integration_plan_shortens_integration_to_fit_dodging_window(plugin_module) -> None:
+    module = plugin_module
+    module.config.set("od_reading.config", "samples_per_second", "0.2")
+    module.config.set("spectrometer_reading.config", "pre_delay_duration", "1.5")
+    module.config.set("spectrometer_reading.config", "post_delay_duration", "1.5")
+    module.config.set("spectrometer_reading.config", "led_switching_duration", "0.5")
+    job = _build_job(module)
+    job.currently_dodging_od = True
+
+    plan = job.apply_integration_plan()
+
+    # 5s interval - 1s OD reading - 3s of delays leaves 1s, and 0.5s for both halves of the scan.
+    assert plan is not None
+    assert job.sensor.atime == plan.atime < 100
+    assert plan.duration_seconds <= 1.0
+    assert any("Shortened" in message for message in job.logger.warnings)
+
+
+def test_apply_integration_plan_refuses_scans_that_overlap_od_readings(plugin_module) -> None:
+    module = plugin_module
+    module.config.set("od_reading.config", "samples_per_second", "0.25")
+    module.config.set("spectrometer_reading.config", "pre_delay_duration", "1.5")
+    module.config.set("spectrometer_reading.config", "post_delay_duration", "1.4")
+    job = _build_job(module)
+    job.currently_dodging_od = True
+    cleaned = {"called": False}
+    job.clean_up = lambda: cleaned.__setitem__("called", True)
+
+    assert job.apply_integration_plan() is None
+    assert cleaned["called"] is True
+    assert job.logger.errors
+
+
+def test_sensor_errors_are_published(plugin_module, sensor_module) -> None:
+    job = _build_job(plugin_module)
+    published: list[str] = []
+    job._publish_setting = published.append
+    sensor = sensor_module.ResilientSensor(job.sensor)
+    object.__setattr__(sensor, "errors", 4)
+    object.__setattr__(sensor, "retried", 3)
+    object.__setattr__(sensor, "reinitializations", 1)
+
+    job.on_sensor_error(sensor)
+
+    assert (job.i2c_errors, job.i2c_retries, job.i2c_reinitializations) == (4, 3, 1)
+    assert {"i2c_errors", "i2c_retries", "i2c_reinitializations"} <= set(published)
+
+
+def test_recent_spectra_requests_are_answered_from_memory(plugin_module) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    job._publish_setting = lambda setting: None
+    job.unit, job.experiment = "unit1", "exp1"
+    published: list[tuple[str, Any]] = []
+    job.publish = lambda topic, payload, **kwargs: published.append((topic, payload))
+    job.sensor._channels = [512] * 8
+    job._background_noise = [0.0] * 8
+    job._band_filters = {}
+    for _ in range(3):
+        job.record_all_bands()
+
+    job.respond_with_recent_spectra(SimpleNamespace(payload=b'{"limit": 2, "request_id": "abc"}'))
+    job.respond_with_recent_spectra(SimpleNamespace(payload=b'{"seconds": 60, "summary": true}'))
+    job.respond_with_recent_spectra(SimpleNamespace(payload=b"not json"))
+
+    (topic, window_payload), (_, summary_payload) = published
+    window, summary = (msgspec.json.decode(payload, type=module.RecentSpectra) for payload in (window_payload, summary_payload))
+    assert topic == "pioreactor/unit1/exp1/spectrometer_reading/recent_spectra/response"
+    assert (window.request_id, window.count, len(window.spectra)) == ("abc", 2, 2)
+    assert window.spectra[-1] == job.spectrum
+    assert summary.count == 3
+    assert summary.summary[415].mean == pytest.approx(job.band_415)
+    assert summary.summary[415].std == pytest.approx(0.0)
+
+
+def _build_dodging_job(plugin_module: Any):
+    module = plugin_module
+    module.config.set("od_reading.config", "samples_per_second", "0.2")
+    module.config.set("spectrometer_reading.config", "pre_delay_duration", "1.0")
+    module.config.set("spectrometer_reading.config", "post_delay_duration", "1.0")
+    module.config.set("spectrometer_reading.config", "min_dodging_margin_ms", "100")
+    job = _build_job(module)
+    job._publish_setting = lambda setting: None
+    job.currently_dodging_od = True
+    job._od_schedule = (5.0, 1000.0)  # OD readings at 1000, 1005, ...
+    job.apply_integration_plan()
+    return job
+
+
+def test_shipped_config_plans_three_scans_that_leave_the_dodging_margin(plugin_module) -> None:
+    shipped = plugin_module.config.__class__()
+    shipped.read(Path(plugin_module.__file__).parent / "additional_config.ini")
+    for key, value in shipped["spectrometer_reading.config"].items():
+        plugin_module.config.set("spectrometer_reading.config", key, value)
+    plugin_module.config.set("od_reading.config", "samples_per_second", "0.2")
+    job = _build_job(plugin_module)
+    job.currently_dodging_od = True
+
+    plan = job.plan_for_window(job.scan_window())
+
+    window = plugin_module.available_window(0.2, od_duration=job.OD_READING_DURATION, pre_delay=1.0, post_delay=1.0)
+    assert plan.burst_scans == 3
+    assert window - plan.duration_seconds >= shipped.getfloat("spectrometer_reading.config", "min_dodging_margin_ms") / 1000
+
+
+def test_dodging_margin_is_published_without_adjusting_when_large(plugin_module) -> None:
+    job = _build_dodging_job(plugin_module)
+    before = job._plan
+
+    # OD reading at 1000.0 ends at 1001.0, scan starts after post_delay, next pre_delay starts at 1004.0
+    job.record_dodging_margin(started_at=1002.0, ended_at=1002.5)
+
+    assert job.dodging_margin_ms == pytest.approx(1500.0)
+    assert job._plan is before
+    assert job.logger.warnings == []
+
+
+def test_small_dodging_margin_shortens_integration(plugin_module) -> None:
+    # with a burst, the plan drops scans before it shortens the integration.
+    plugin_module.config.set("spectrometer_reading.config", "max_burst_scans", "1")
+    job = _build_dodging_job(plugin_module)
+
+    before = job._plan
+    job.record_dodging_margin(started_at=1002.0, ended_at=1003.95)
+
+    assert job.dodging_margin_ms == pytest.approx(50.0)
+    assert job.sensor.atime < before.atime
+    assert job._plan.duration_seconds <= before.duration_seconds - 0.05
+    assert job.scan_window() == job._dodging_window_cap
+    assert job._cycles_to_skip == 0
+
+
+def test_shortened_plan_is_lengthened_again_after_healthy_margins(plugin_module) -> None:
+    plugin_module.config.set("spectrometer_reading.config", "max_burst_scans", "1")
+    job = _build_dodging_job(plugin_module)
+    before = job._plan
+    job.record_dodging_margin(started_at=1002.0, ended_at=1003.95)
+    shortened = job._dodging_window_cap
+    shortened_plan = job._plan
+
+    for cycle in range(job.RELAX_WINDOW_CAP_AFTER):
+        job.record_dodging_margin(started_at=1002.0 + 5 * cycle, ended_at=1002.5 + 5 * cycle)
+
+    assert shortened < job._dodging_window_cap < job.dodging_budget()
+    assert job._plan.atime > shortened_plan.atime
+
+    for cycle in range(10 * job.RELAX_WINDOW_CAP_AFTER):
+        job.record_dodging_margin(started_at=1002.0 + 5 * cycle, ended_at=1002.5 + 5 * cycle)
+
+    assert job._dodging_window_cap is None
+    assert job._plan == before
+
+
+def test_slow_scans_end_the_cycle_before_the_dodging_budget_runs_out(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    job = _build_dodging_job(module)
+    job.burst_scans = 3
+    clock = [1002.0]
+    monkeypatch.setattr(module, "time", lambda: clock[0])
+
+    def slow_scan():
+        clock[0] += 0.8  # planned for about 0.6s
+        return module.Scan((1000,) * 8, (0,) * 8)
+
+    scanned: list[bool] = []
+
+    def counted_scan():
+        scanned.append(True)
+        return slow_scan()
+
+    job.take_scan = counted_scan
+    job.process_scans = lambda scans, started_at, ended_at: None
+    job._record_once = job.record_all_bands
+    job.record_dodging_margin = lambda started_at, ended_at: None
+
+    job.action_to_do_after_od_reading()
+
+    # the window is 1.9s, so a third 0.8s scan wouldn't fit
+    assert len(scanned) == 2
+    assert clock[0] - 1002.0 <= job.dodging_budget()
+    assert job._cycle_deadline is None
+
+
+def test_dodging_overrun_that_cannot_be_shortened_skips_a_cycle(plugin_module) -> None:
+    job = _build_dodging_job(plugin_module)
+    job.record_dodging_margin(started_at=1002.0, ended_at=1006.5)
+
+    assert job.dodging_margin_ms == pytest.approx(-2500.0)
+    assert job._cycles_to_skip == 1
+
+    recorded = []
+    job._record_once = lambda: recorded.append(True)
+    job.action_to_do_after_od_reading()
+    assert recorded == []
+    assert job._cycles_to_skip == 0
+
+
+def test_recorded_blank_is_saved_and_referenced_by_later_scans(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    job.experiment = "exp1"
+    published: list[str] = []
+    job._publish_setting = published.append
+    job.published_settings = dict(module.SpectrometerReading.published_settings)
+    saved = {}
+    monkeypatch.setattr(module, "save_blank", lambda experiment, bands: saved.update({experiment: bands}))
+    job._background_noise = [0.0] * 8
+    job._band_filters = {}
+
+    job.sensor._channels = [1000] * 8
+    job.record_all_bands()
+    assert "absorbance" not in published
+
+    job.set_record_blank(True)
+    job.record_all_bands()
+    job.sensor._channels = [100] * 8
+    job.record_all_bands()
+
+    assert job.record_blank is False
+    assert saved["exp1"] == {band: pytest.approx(job.band_415 * 10) for band in module.BANDS}
+    assert job.band_415_absorbance == pytest.approx(1.0)
+    assert job.absorbance.bands == {band: pytest.approx(1.0) for band in module.BANDS}
+    assert "band_680_absorbance" in published
+
+
+def test_burst_scans_are_combined_without_outliers(plugin_module) -> None:
+    job = _build_job(plugin_module)
+    scans = [[1000] * 8, [1002] * 8, [998] * 8, [1000] * 7 + [9000]]
+
+    combined = job.combine_scans(scans)
+
+    assert combined[:7] == [1000.0] * 7
+    assert combined[7] == pytest.approx(1000.0)
+    assert job.rejected_samples == 1
+
+
+def test_excitation_sweep_scans_once_per_led_state(plugin_module, monkeypatch) -> None:
+    led_utils = importlib.import_module("pioreactor.actions.led_intensity")
+    module = plugin_module
+    job = _build_job(module)
+    job.unit, job.experiment, job.pub_client = "unit1", "exp1", None
+    job._background_noise = [0.0] * 8
+    job._excitation_states = [{"A": 50.0}, {"A": 25.0, "B": 25.0}]
+
+    led_changes: list[dict] = []
+
+    def led_intensity(state, **kwargs):
+        led_changes.append(state)
+        job.sensor._channels = [int(10 * state["A"])] * 8
+        return True
+
+    monkeypatch.setattr(led_utils, "led_intensity", led_intensity)
+    monkeypatch.setattr(led_utils, "local_intermittent_storage", lambda name: _EmptyCache())
+
+    job.record_excitation_sweep()
+
+    assert led_changes[:2] == [{"A": 50.0, "B": 0.0, "C": 0.0, "D": 0.0}, {"A": 25.0, "B": 25.0, "C": 0.0, "D": 0.0}]
+    assert led_changes[2] == {"A": 0.0, "B": 0.0, "C": 0.0, "D": 0.0}  # restored
+    assert [scan.excitation for scan in job.excitation_sweep.scans] == ["A:50", "A:25,B:25"]
+    first, second = job.excitation_sweep.scans
+    assert first.bands[415] == pytest.approx(2 * second.bands[415])
+
+
+class _EmptyCache:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+    def getfloat(self, key, fallback=None):
+        return fallback
+
+
+def test_excitation_states_are_planned_into_the_window(plugin_module) -> None:
+    job = _build_job(plugin_module)
+    without_sweep = job.plan_for_window(2.0)
+    job._excitation_states = [{"A": 50.0}, {"B": 50.0}]
+
+    with_sweep = job.plan_for_window(2.0)
+
+    assert with_sweep.atime < without_sweep.atime
+    assert with_sweep.duration_seconds <= 2.0
+
+
+def test_cached_dark_frame_skips_setup_until_it_needs_refreshing(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    job.unit = "unit1"
+    job._persist_dark_frames = True
+    saved: dict[str, SimpleNamespace] = {}
+    monkeypatch.setattr(
+        module, "save_dark_frame", lambda key, background: saved.setdefault(key, SimpleNamespace(recorded_at=1.0))
+    )
+    monkeypatch.setattr(
+        module, "load_dark_frame", lambda key, max_age: SimpleNamespace(recorded_at=module.time() - 30, background=[1.0] * 8)
+    )
+
+    assert job.load_cached_background() is True
+    assert job._background_noise == [1.0] * 8
+    # used for the first cycle, then refreshed, even with periodic refreshes off
+    module.config.set("spectrometer_reading.config", "dark_frame_refresh_minutes", "0")
+    assert job.background_is_stale() is True
+
+    job.record_background_noise()
+    assert list(saved) == ["unit1/gain=10/atime=100/astep=999/led_current=5/bands=415,445,480,515,555,590,630,680"]
+    assert job.background_is_stale() is False
+
+    module.config.set("spectrometer_reading.config", "dark_frame_refresh_minutes", "0.25")
+    job._background_recorded_at = module.time() - 30
+    assert job.background_is_stale() is True
+
+
+def test_stale_dark_frame_is_refreshed_at_the_start_of_a_scan_cycle(plugin_module, monkeypatch) -> None:
+    led_utils = importlib.import_module("pioreactor.actions.led_intensity")
+    module = plugin_module
+    job = _build_job(module)
+    job.unit, job.experiment, job.pub_client = "unit1", "exp1", None
+    job.is_setup_done = True
+    led_changes: list[dict] = []
+
+    def change_leds_intensities_temporarily(state, **kwargs):
+        led_changes.append(state)
+        return nullcontext()
+
+    monkeypatch.setattr(led_utils, "change_leds_intensities_temporarily", change_leds_intensities_temporarily)
+    events: list[str] = []
+    job.record_background_noise = lambda: events.append("dark")
+    job.record_all_bands = lambda: events.append("scan")
+
+    # with time left in the dodging window, the dark frame and the scan share the cycle, and one LED change.
+    job._cycle_deadline = module.time() + 2.0
+    job._record_once()
+    assert events == ["dark", "scan"]
+    assert len(led_changes) == 1
+
+    # without time for both, the refresh waits for a later cycle.
+    events.clear()
+    job._cycle_deadline = module.time() + 0.5
+    job._record_once()
+    assert events == ["scan"]
+
+    job._background_recorded_at = module.time()
+    events.clear()
+    job._cycle_deadline = None
+    job._record_once()
+    assert events == ["scan"]
+
+
+def test_detected_flicker_replans_integration_over_whole_periods(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    job._flicker_aware = True
+    detections = [100, None, 0]
+    monkeypatch.setattr(module, "detect_mains_flicker", lambda sensor: detections.pop(0))
+
+    assert job.flicker_check_is_due() is True
+    job.check_flicker()
+    assert job.flicker_hz == 100
+    assert job.sensor.astep == 3596
+    assert job.flicker_check_is_due() is False
+
+    # an inconclusive detection keeps the current integration
+    job.check_flicker()
+    assert job.sensor.astep == 3596
+
+    job.check_flicker()
+    assert job.flicker_hz == 0
+    assert job.sensor.astep == 999
+
+
+def test_async_acquisition_publishes_the_burst_and_the_sweep(plugin_module, monkeypatch) -> None:
+    led_utils = importlib.import_module("pioreactor.actions.led_intensity")
+    module = plugin_module
+    job = _build_job(module)
+    job.unit, job.experiment, job.pub_client = "unit1", "exp1", None
+    job._background_noise = [0.0] * 8
+    job._band_filters = {}
+    job._excitation_states = [{"A": 50.0}]
+    job.sensor._channels = [100] * 8
+    monkeypatch.setattr(led_utils, "led_intensity", lambda state, **kwargs: True)
+    monkeypatch.setattr(led_utils, "local_intermittent_storage", lambda name: _EmptyCache())
+
+    job.initialize_async_acquisition()
+    try:
+        job._acquisition.run(job.acquire_all_bands())
+    finally:
+        job._acquisition.stop()
+
+    assert job.spectrum.bands[415] == pytest.approx(job.excitation_sweep.scans[0].bands[415])
+    assert job.spectrum.bands[415] > 0
+
+
+def test_saturated_bands_are_flagged_and_kept_out_of_the_filter(plugin_module) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    job._background_noise = [0.0] * 8
+    job._band_filters = {band: module.KalmanFilter1D(1e-9, 1e-8) for band in (415, 680)}
+    job.sensor._channels = [100] * 7 + [2**16 - 1]
+
+    job.record_all_bands()
+
+    assert job.spectrum.flags == {680: module.SATURATED}
+    assert job.band_415_filtered is not None
+    assert not hasattr(job, "band_680_filtered")
+    assert any("saturated" in warning for warning in job.logger.warnings)
+
+
+def test_flagged_scan_is_not_recorded_as_the_blank(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    job = _build_job(module)
+    job.experiment = "exp1"
+    saved: dict[str, dict[int, float]] = {}
+    monkeypatch.setattr(module, "save_blank", lambda experiment, bands: saved.update({experiment: bands}))
+    job._background_noise = [0.0] * 8
+
+    job.set_record_blank(True)
+    job.sensor._channels = [100] * 7 + [2**16 - 1]
+    job.record_all_bands()
+
+    assert saved == {}
+    assert job.record_blank is True
+    assert any("blank" in warning for warning in job.logger.warnings)
+
+    job.sensor._channels = [100] * 8
+    job.record_all_bands()
+
+    assert set(saved) == {"exp1"}
+    assert job.record_blank is False
+
+
+def test_recording_a_blank_restarts_the_filters_from_the_next_scan(plugin_module, monkeypatch) -> None:
+    module = plugin_module
+    monkeypatch.setattr(module, "save_blank", lambda experiment, bands: None)
+    job = _build_job(module)
+    job.experiment = "exp"
+    job._background_noise = [0.0] * 8
+    job._band_filters = {415: module.KalmanFilter1D(1e-9, 1e-8)}
+    job.sensor._channels = [100] * 8
+    job.record_all_bands()
+
+    job.record_blank = True
+    job.record_all_bands()
+    job.sensor._channels = [5000] * 8
+    job.record_all_bands()
+
+    # without a reset, the filter would still be close to the old sample's reading.
+    assert job.band_415_filtered == pytest.approx(job.band_415)
+
+
+def test_plain_average_clears_rejected_samples(plugin_module) -> None:
+    job = _build_job(plugin_module)
+    job.combine_scans([[1000] * 8, [1002] * 8, [998] * 8, [1000] * 7 + [9000]])
+
+    assert job.combine_scans([[1000] * 8, [1002] * 8]) == [1001.0] * 8
+    assert job.rejected_samples == 0
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+
+import pytest
+
+SQL = (Path(__file__).parent.parent / "spectrometer_reading_plugin" / "additional_sql.sql").read_text(encoding="utf-8")
+
+
+@pytest.fixture()
+def db():
+    with sqlite3.connect(":memory:") as db:
+        yield db
+
+
+def _install(db: sqlite3.Connection) -> None:
+    # how Pioreactor applies additional_sql.sql, on every install
+    with db:
+        db.executescript(SQL)
+
+
+def test_rows_inserted_into_the_view_read_back_with_original_columns(db) -> None:
+    _install(db)
+    db.execute(
+        "INSERT INTO as7341_spectrum_readings_all (experiment, pioreactor_unit, timestamp, reading, band) VALUES (?, ?, ?, ?, ?)",
+        ("exp1", "unit1", "2026-01-01T00:00:00.500Z", 0.25, 415),
+    )
+    db.execute(
+        "INSERT INTO as7341_spectrum_readings_all (experiment, pioreactor_unit, timestamp, reading, band) VALUES (?, ?, ?, ?, ?)",
+        ("exp1", "unit1", "2026-01-01T00:00:00.500Z", 0.5, 445),
+    )
+
+    assert db.execute("SELECT * FROM as7341_spectrum_readings_all ORDER BY band").fetchall() == [
+        ("exp1", "unit1", "2026-01-01T00:00:00.500Z", 0.25, 415, 0),
+        ("exp1", "unit1", "2026-01-01T00:00:00.500Z", 0.5, 445, 0),
+    ]
+    assert db.execute("SELECT reading FROM as7341_spectrum_readings_445").fetchall() == [(0.5,)]
+    assert db.execute("SELECT experiment_id, band, unit_id, timestamp_ms FROM as7341_spectrum_readings_compact").fetchall() == [
+        (1, 415, 1, int(datetime(2026, 1, 1, 0, 0, 0, 500000, tzinfo=timezone.utc).timestamp() * 1000)),
+        (1, 445, 1, int(datetime(2026, 1, 1, 0, 0, 0, 500000, tzinfo=timezone.utc).timestamp() * 1000)),
+    ]
+
+
+def test_install_migrates_the_original_table_and_can_be_repeated(db) -> None:
+    db.executescript(
+        """
+        CREATE TABLE as7341_spectrum_readings (
+            experiment TEXT NOT NULL, pioreactor_unit TEXT NOT NULL, timestamp TEXT NOT NULL, reading REAL, band INT
+        );
+        CREATE VIEW as7341_spectrum_readings_415 AS SELECT * FROM as7341_spectrum_readings WHERE band=415;
+        INSERT INTO as7341_spectrum_readings VALUES ('exp1', 'unit1', '2026-01-01T00:00:00.000Z', 0.1, 415);
+        INSERT INTO as7341_spectrum_readings VALUES ('exp1', 'unit2', '2026-01-01T00:00:05.000Z', 0.2, 415);
+        INSERT INTO as7341_spectrum_readings VALUES ('exp2', 'unit1', '2026-01-01T00:00:10.000Z', 0.3, 680);
+        """
+    )
+
+    _install(db)
+    _install(db)
+
+    assert db.execute("SELECT pioreactor_unit, reading FROM as7341_spectrum_readings_415 ORDER BY timestamp").fetchall() == [
+        ("unit1", 0.1),
+        ("unit2", 0.2),
+    ]
+    assert db.execute("SELECT experiment FROM as7341_spectrum_readings_680").fetchall() == [("exp2",)]
+    assert db.execute("SELECT count(*) FROM as7341_experiments").fetchone() == (2,)
+    assert db.execute("SELECT name FROM sqlite_master WHERE name = 'as7341_spectrum_readings'").fetchall() == []
+
+
+def test_absorbance_shares_lookup_tables_with_readings(db) -> None:
+    _install(db)
+    for table, reading in (("as7341_spectrum_readings_all", 0.25), ("as7341_absorbance_readings_all", 0.6)):
+        db.execute(
+            f"INSERT INTO {table} (experiment, pioreactor_unit, timestamp, reading, band) VALUES (?, ?, ?, ?, ?)",
+            ("exp1", "unit1", "2026-01-01T00:00:00.500Z", reading, 415),
+        )
+
+    assert db.execute("SELECT * FROM as7341_absorbance_readings_all").fetchall() == [
+        ("exp1", "unit1", "2026-01-01T00:00:00.500Z", 0.6, 415, 0)
+    ]
+    assert db.execute("SELECT count(*) FROM as7341_units").fetchone() == (1,)
+
+
+def test_only_flagged_readings_store_flags(db) -> None:
+    _install(db)
+    for band, flags in ((415, 0), (680, 1)):
+        for table in ("as7341_spectrum_readings_all", "as7341_absorbance_readings_all"):
+            db.execute(
+                f"INSERT INTO {table} (experiment, pioreactor_unit, timestamp, reading, band, flags) VALUES (?, ?, ?, ?, ?, ?)",
+                ("exp1", "unit1", "2026-01-01T00:00:00.500Z", 0.5, band, flags),
+            )
+
+    assert db.execute("SELECT band, flags FROM as7341_spectrum_flags_compact").fetchall() == [(680, 1)]
+    assert db.execute("SELECT band, flags FROM as7341_spectrum_readings_all ORDER BY band").fetchall() == [(415, 0), (680, 1)]
+    assert db.execute("SELECT band, flags FROM as7341_absorbance_readings_all ORDER BY band").fetchall() == [(415, 0), (680, 1)]
+    assert db.execute("SELECT flags FROM as7341_spectrum_readings_680").fetchall() == [(1,)]
+
+
+def test_excitation_readings_are_tagged_with_their_led_state(db) -> None:
+    _install(db)
+    db.executemany(
+        "INSERT INTO as7341_excitation_readings_all (experiment, pioreactor_unit, timestamp, excitation, reading, band) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("exp1", "unit1", "2026-01-01T00:00:00.500Z", "A:50", 0.1, 415),
+            ("exp1", "unit1", "2026-01-01T00:00:01.000Z", "A:25,B:25", 0.2, 415),
+            ("exp1", "unit1", "2026-01-01T00:00:05.500Z", "A:50", 0.3, 415),
+        ],
+    )
+
+    assert db.execute("SELECT excitation, reading FROM as7341_excitation_readings_all ORDER BY timestamp").fetchall() == [
+        ("A:50", 0.1),
+        ("A:25,B:25", 0.2),
+        ("A:50", 0.3),
+    ]
+    assert db.execute("SELECT count(*) FROM as7341_excitations").fetchone() == (2,)
+
+
+def test_install_fills_the_chart_series_from_existing_readings_once(db) -> None:
+    _install(db)
+    db.executemany(
+        "INSERT INTO as7341_spectrum_readings_all (experiment, pioreactor_unit, timestamp, reading, band) VALUES (?, ?, ?, ?, ?)",
+        [
+            ("exp1", "unit1", f"2026-01-01T00:00:{second:02d}.000Z", reading, 415)
+            for second, reading in ((0, 0.1), (5, 0.9), (10, 0.2))
+        ]
+        + [("exp1", "unit1", "2026-01-01T00:01:00.000Z", 0.3, 415)],
+    )
+
+    _install(db)
+    _install(db)
+
+    assert db.execute("SELECT timestamp, reading FROM as7341_spectrum_chart_415 ORDER BY timestamp").fetchall() == [
+        ("2026-01-01T00:00:05.000Z", 0.9),
+        ("2026-01-01T00:01:00.000Z", 0.3),
+    ]
+
+
+def test_charts_read_the_finest_level_with_few_enough_points(db) -> None:
+    _install(db)
+
+    def insert(level: int, minutes: range) -> None:
+        db.executemany(
+            "INSERT INTO as7341_spectrum_chart_all (experiment, pioreactor_unit, timestamp, reading, band, level) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    "exp1",
+                    "unit1",
+                    datetime.fromtimestamp(60 * minute, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                    0.1,
+                    415,
+                    level,
+                )
+                for minute in minutes
+            ],
+        )
+
+    insert(0, range(2000))
+    insert(1, range(0, 2000, 8))
+    assert db.execute("SELECT count(*), min(level), max(level) FROM as7341_spectrum_chart_415").fetchone() == (2000, 0, 0)
+
+    insert(0, range(2000, 2001))
+    assert db.execute("SELECT count(*), min(level), max(level) FROM as7341_spectrum_chart_415").fetchone() == (250, 1, 1)
+
+
+def test_scans_are_paired_with_the_latest_od_reading_of_each_channel(db) -> None:
+    # Pioreactor's own table, which exists on the leader before plugins are installed
+    db.executescript(
+        """
+        CREATE TABLE od_readings (
+            experiment TEXT NOT NULL, pioreactor_unit TEXT NOT NULL, timestamp TEXT NOT NULL, od_reading REAL NOT NULL, angle INTEGER NOT NULL, channel INTEGER NOT NULL
+        );
+        CREATE INDEX od_readings_ix ON od_readings (experiment, pioreactor_unit, channel, timestamp);
+        INSERT INTO od_readings VALUES ('exp1', 'unit1', '2026-01-01T00:00:00.000Z', 0.10, 90, 2);
+        INSERT INTO od_readings VALUES ('exp1', 'unit1', '2026-01-01T00:00:05.000Z', 0.11, 90, 2);
+        INSERT INTO od_readings VALUES ('exp1', 'unit1', '2026-01-01T00:00:05.000Z', 0.50, 135, 1);
+        INSERT INTO od_readings VALUES ('exp1', 'unit1', '2026-01-01T00:00:10.000Z', 0.12, 90, 2);
+        INSERT INTO od_readings VALUES ('exp1', 'unit2', '2026-01-01T00:00:06.000Z', 0.90, 90, 2);
+        """
+    )
+    _install(db)
+    for unit, timestamp in (
+        ("unit1", "2026-01-01T00:00:07.500Z"),
+        ("unit1", "2026-01-01T00:00:02.500Z"),
+        ("unit3", "2026-01-01T00:00:07.500Z"),
+    ):
+        db.execute(
+            "INSERT INTO as7341_spectrum_readings_all (experiment, pioreactor_unit, timestamp, reading, band) VALUES (?, ?, ?, ?, ?)",
+            ("exp1", unit, timestamp, 0.25, 415),
+        )
+        db.execute(
+            "INSERT INTO as7341_spectrum_od_all (experiment, pioreactor_unit, timestamp) VALUES (?, ?, ?)",
+            ("exp1", unit, timestamp),
+        )
+
+    assert db.execute(
+        "SELECT pioreactor_unit, timestamp, od_channel, od_angle, od_timestamp, od_reading FROM as7341_spectrum_readings_with_od ORDER BY pioreactor_unit, timestamp, od_channel"
+    ).fetchall() == [
+        ("unit1", "2026-01-01T00:00:02.500Z", 2, 90, "2026-01-01T00:00:00.000Z", 0.10),
+        ("unit1", "2026-01-01T00:00:07.500Z", 1, 135, "2026-01-01T00:00:05.000Z", 0.50),
+        ("unit1", "2026-01-01T00:00:07.500Z", 2, 90, "2026-01-01T00:00:05.000Z", 0.11),
+        ("unit3", "2026-01-01T00:00:07.500Z", None, None, None, None),
+    ]